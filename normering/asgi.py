@@ -5,6 +5,21 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
+
+Forsiden, afdelings-, team- og klassesiderne er async views (se skole.views),
+der henter uafhængige nøgletal samtidig og ikke holder en worker optaget,
+mens de venter på databasen. Kør dem under en ASGI-server, fx::
+
+    uvicorn normering.asgi:application --workers 4
+
+Under ASGI får hver request sin egen tråd til ORM-kaldene og dermed sin egen
+databaseforbindelse, som lukkes efter requesten. Django 5.0 har ingen
+indbygget forbindelsespulje, så ved PostgreSQL bør en pulje som PgBouncer
+stå foran databasen; puljens størrelse sættes dér og bør mindst svare til
+antal workers gange forventede samtidige requests pr. worker.
+
+Workers deler ikke hukommelse, så navigationen og de cachede fragmenter kræver
+en fælles cache (CACHE_BACKEND i normering/settings.py).
 """
 
 import os
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -19,13 +20,21 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.0/howto/deployment/checklist/
 
+# Produktion konfigureres med miljøvariabler; uden dem kører projektet som
+# før med DEBUG og en lokal SQLite-database.
+
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = "django-insecure-*2r62r8ohh5)4exq+#)9hzllnkracq#lx8v*%^2(t@x_aw30gm"
+SECRET_KEY = os.environ.get(
+    "DJANGO_SECRET_KEY",
+    "django-insecure-*2r62r8ohh5)4exq+#)9hzllnkracq#lx8v*%^2(t@x_aw30gm",
+)
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get("DJANGO_DEBUG", "1") == "1"
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [
+    host for host in os.environ.get("DJANGO_ALLOWED_HOSTS", "").split(",") if host
+]
 
 
 # Application definition
@@ -39,6 +48,7 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     # 3rd party
     "django_browser_reload",
+    "django_filters",
     # my apps
     "skole",
     "sliders",
@@ -80,10 +90,77 @@ WSGI_APPLICATION = "normering.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
+# DB_ENGINE=postgresql kræver psycopg ("pip install psycopg[binary]").
+# DB_CONN_MAX_AGE holder forbindelserne åbne mellem requests (sekunder, 0 =
+# luk efter hver request). Under ASGI (normering.asgi) kører hver
+# sync_to_async-kaldt view i sin egen tråd med sin egen forbindelse, og
+# persistente forbindelser hober sig op i stedet for at blive genbrugt, så
+# standarden er 0, og genbrugen overlades til PgBouncer. Står PgBouncer i
+# transaktionstilstand foran PostgreSQL, skal DB_PGBOUNCER=1 slå server-side
+# cursors fra. DB_CONN_MAX_AGE=60 giver kun mening under WSGI uden PgBouncer.
+DB_ENGINE = os.environ.get("DB_ENGINE", "sqlite")
+
+if DB_ENGINE == "postgresql":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("DB_NAME", "normering"),
+            "USER": os.environ.get("DB_USER", ""),
+            "PASSWORD": os.environ.get("DB_PASSWORD", ""),
+            "HOST": os.environ.get("DB_HOST", ""),
+            "PORT": os.environ.get("DB_PORT", ""),
+            "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", "0")),
+            "CONN_HEALTH_CHECKS": True,
+            "DISABLE_SERVER_SIDE_CURSORS": os.environ.get("DB_PGBOUNCER") == "1",
+        }
+    }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("DB_NAME", BASE_DIR / "db.sqlite3"),
+            "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", "0")),
+            "OPTIONS": {
+                # Sekunder en skrivning venter på en lås før "database is locked"
+                "timeout": int(os.environ.get("DB_SQLITE_TIMEOUT", "20")),
+            },
+        }
+    }
+
+# Sættes på hver ny SQLite-forbindelse (se skole.signals.sqlite_pragmas). WAL
+# lader læsere og én skriver arbejde samtidig, busy_timeout venter på låse i
+# stedet for at fejle, og mmap_size læser databasefilen via hukommelsen.
+SQLITE_PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "busy_timeout": 1000 * int(os.environ.get("DB_SQLITE_TIMEOUT", "20")),
+    "mmap_size": int(os.environ.get("DB_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+# Navigationen og de cachede fragmenter invalideres ved at tælle en version op
+# i cachen (se skole.cache). Det virker kun på tværs af workers, hvis de deler
+# cachen, så den lokale hukommelsescache er kun standard med DEBUG.
+# CACHE_BACKEND=redis kræver redis ("pip install redis") og
+# CACHE_LOCATION=redis://host:6379/0; memcached kræver pymemcache og
+# CACHE_LOCATION=host:11211; database kræver "manage.py createcachetable".
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "locmem" if DEBUG else "database")
+CACHE_BACKENDS = {
+    "locmem": ("django.core.cache.backends.locmem.LocMemCache", ""),
+    "database": ("django.core.cache.backends.db.DatabaseCache", "django_cache"),
+    "redis": ("django.core.cache.backends.redis.RedisCache", "redis://127.0.0.1:6379"),
+    "memcached": (
+        "django.core.cache.backends.memcached.PyMemcacheCache",
+        "127.0.0.1:11211",
+    ),
+}
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "BACKEND": CACHE_BACKENDS[CACHE_BACKEND][0],
+        "LOCATION": os.environ.get("CACHE_LOCATION", CACHE_BACKENDS[CACHE_BACKEND][1]),
     }
 }
 
@@ -129,6 +206,24 @@ STATICFILES_DIRS = [
 
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# Bootstrap, jQuery, htmx, ikoner og skrifttyper ligger i static/vendor, så
+# siderne kun henter fra vores egen server. I produktion får filerne et hash
+# af indholdet i navnet ved collectstatic, og der skrives gzip- og
+# brotli-udgaver ved siden af. WhiteNoise serverer dem med den komprimerede
+# udgave, browseren beder om, og markerer filer med hash i navnet som
+# "immutable" med en max-age på ti år, da nyt indhold altid giver et nyt navn.
+if not DEBUG:
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index("django.middleware.security.SecurityMiddleware") + 1,
+        "whitenoise.middleware.WhiteNoiseMiddleware",
+    )
+    STORAGES = {
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {
+            "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"
+        },
+    }
+
 # Media files (uploads)
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR / "media"
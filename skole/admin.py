@@ -1,5 +1,32 @@
+"""
+Admin for skole-modellerne.
+
+Ændringslisterne henter de relaterede objekter, de viser, med
+list_select_related og tæller med annoteringer, så en side altid koster det
+samme antal forespørgsler. Fremmednøgler og mange-til-mange-felter vælges med
+autocomplete i stedet for en liste med alle rækker, og det fulde antal rækker
+tælles ikke ved søgning og filtrering (show_full_result_count).
+
+Masseopdateringerne (flyt elever til en anden klasse, skift takst) er én
+UPDATE. Da update() springer save() og signalerne over, opdaterer handlingerne
+selv budgetoversigterne, de cachede fragmenter og søgeindekset. Oprykningen til
+et nyt skoleår på skolelisten står skole.rollover for; den viser først, hvad
+der vil ske, og kører først, når det nye skoleår er valgt og bekræftet.
+"""
+
+from datetime import date
+
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME, ActionForm
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.db import transaction
+from django.db.models import Count, Q
+from django.template.response import TemplateResponse
+from django.urls import reverse
 
+from . import search
+from .rollover import rollover
 from .models import (
     Department,
     EmploymentCategory,
@@ -7,37 +34,331 @@ from .models import (
     School,
     SchoolClass,
     SchoolFee,
+    SchoolYear,
     Staff,
     Student,
     Team,
 )
+from .signals import schoolclasses_changed
+from .workload import annotate_workload
 
-# Register your models here.
 
-mods = [
-    School,
-    Department,
-    Team,
-    SchoolClass,
-    Lesson,
-    Staff,
-    SchoolFee,
-    EmploymentCategory,
-]
+class BaseAdmin(admin.ModelAdmin):
+    list_per_page = 50
+    show_full_result_count = False
+
+
+class RolloverForm(forms.Form):
+    school_year = forms.ModelChoiceField(
+        SchoolYear.objects.all(), label="Nyt skoleår", empty_label=None
+    )
+
+
+@admin.register(School)
+class SchoolAdmin(BaseAdmin):
+    list_display = ("name", "school_year", "num_departments")
+    list_select_related = ("school_year",)
+    search_fields = ("^name",)
+    actions = ("preview_rollover", "rollover_school_year")
+
+    def get_queryset(self, request):
+        return (
+            super().get_queryset(request).annotate(num_departments=Count("departments"))
+        )
+
+    @admin.display(description="Afdelinger", ordering="num_departments")
+    def num_departments(self, school):
+        return school.num_departments
+
+    def _rollover(self, request, queryset, dry_run, school_year=None):
+        report = rollover(
+            queryset.order_by().values("pk"), dry_run=dry_run, school_year=school_year
+        )
+        if dry_run:
+            prefix, archived = "Tørkørsel: ville rykke", "ville arkivere"
+        else:
+            prefix, archived = "Rykkede", "arkiverede"
+        self.message_user(
+            request,
+            f"{prefix} {len(report.promoted)} klasser og {report.students} elever "
+            f"op og {archived} {len(report.archived)} klasser.",
+        )
+        if report.skipped:
+            names = ", ".join(change.name for change in report.skipped)
+            self.message_user(
+                request,
+                f"Sprunget over, da navnet ikke starter med klassetrinnet: {names}",
+                "warning",
+            )
+        if report.refused:
+            names = ", ".join(str(school) for school in report.refused)
+            self.message_user(
+                request,
+                f"Allerede rykket op til {school_year}, så intet er ændret: {names}",
+                "warning",
+            )
+
+    @admin.action(description="Vis oprykning til nyt skoleår (uden at gemme)")
+    def preview_rollover(self, request, queryset):
+        self._rollover(request, queryset, dry_run=True)
+
+    @admin.action(description="Ryk klasserne op til nyt skoleår")
+    def rollover_school_year(self, request, queryset):
+        # Som Djangos "Slet valgte": første POST viser en bekræftelsesside med
+        # ændringerne, og først den bekræftede POST (med "post") ryker op
+        form = RolloverForm(request.POST if request.POST.get("post") else None)
+        if form.is_valid():
+            self._rollover(
+                request,
+                queryset,
+                dry_run=False,
+                school_year=form.cleaned_data["school_year"],
+            )
+            return None
+        return TemplateResponse(
+            request,
+            "admin/skole/school/rollover_confirmation.html",
+            {
+                **self.admin_site.each_context(request),
+                "title": "Ryk klasserne op til nyt skoleår",
+                "opts": self.model._meta,
+                "queryset": queryset,
+                "form": form,
+                "report": rollover(queryset.order_by().values("pk"), dry_run=True),
+                "action_checkbox_name": ACTION_CHECKBOX_NAME,
+            },
+        )
+
+
+@admin.register(Department)
+class DepartmentAdmin(BaseAdmin):
+    list_display = ("name", "school", "num_teams")
+    list_select_related = ("school",)
+    list_filter = ("school",)
+    search_fields = ("^name",)
+    autocomplete_fields = ("school",)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(num_teams=Count("teams"))
+
+    @admin.display(description="Teams", ordering="num_teams")
+    def num_teams(self, department):
+        return department.num_teams
+
+
+@admin.register(Team)
+class TeamAdmin(BaseAdmin):
+    list_display = ("name", "department", "num_classes")
+    list_select_related = ("department",)
+    list_filter = ("department",)
+    search_fields = ("^name",)
+    autocomplete_fields = ("department",)
+
+    def get_queryset(self, request):
+        return (
+            super().get_queryset(request).annotate(num_classes=Count("schoolclasses"))
+        )
+
+    @admin.display(description="Klasser", ordering="num_classes")
+    def num_classes(self, team):
+        return team.num_classes
+
 
-for mod in mods:
-    admin.site.register(mod)
+@admin.register(SchoolClass)
+class SchoolClassAdmin(BaseAdmin):
+    list_display = ("name", "team", "class_group", "num_students", "cost")
+    # Elevtal og lønforbrug læses fra den denormaliserede ClassBudgetSummary
+    list_select_related = ("team", "budget_summary")
+    list_filter = ("class_group", "team__department", "archived")
+    search_fields = ("^name",)
+    autocomplete_fields = ("team", "class_teachers")
+    ordering = ("team__department__name", "class_number", "name")
 
+    def get_queryset(self, request):
+        # Også de arkiverede afgangsklasser (se skole.rollover)
+        return SchoolClass.all_objects.order_by(*self.get_ordering(request))
 
-class StudentAdmin(admin.ModelAdmin):
+    def get_search_results(self, request, queryset, search_term):
+        queryset, may_have_duplicates = super().get_search_results(
+            request, queryset, search_term
+        )
+        # Autocomplete til fremmednøglerne (lektioner, elever) må kun tilbyde
+        # klasser, som feltet accepterer
+        if request.path == reverse(f"{self.admin_site.name}:autocomplete"):
+            queryset = queryset.filter(archived=False)
+        return queryset, may_have_duplicates
+
+    @staticmethod
+    def _summary(schoolclass):
+        try:
+            return schoolclass.budget_summary
+        except SchoolClass.budget_summary.RelatedObjectDoesNotExist:
+            return None
+
+    @admin.display(description="Elever", ordering="budget_summary__num_students")
+    def num_students(self, schoolclass):
+        summary = self._summary(schoolclass)
+        return summary.num_students if summary else 0
+
+    @admin.display(description="Lønforbrug", ordering="budget_summary__cost")
+    def cost(self, schoolclass):
+        summary = self._summary(schoolclass)
+        return summary.cost if summary else 0
+
+
+@admin.register(Lesson)
+class LessonAdmin(BaseAdmin):
+    # Antal lærere og pris er gemt på lektionen; lærerne hentes kun til
+    # Lesson.__str__, som afkrydsningsfeltet for hver række bruger
+    list_display = ("subject", "schoolclass", "classroom", "teacher_count", "cost")
+    list_select_related = ("schoolclass",)
+    list_filter = ("subject",)
+    search_fields = ("^subject", "^classroom", "^schoolclass__name")
+    autocomplete_fields = ("schoolclass", "teachers")
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related("teachers")
+
+
+@admin.register(Staff)
+class StaffAdmin(BaseAdmin):
     list_display = (
         "name",
-        "schoolclass",
-        "age",
-    )  # Tilføj 'age' til listen over felter, der vises
+        "employment_category",
+        "employment_grade",
+        "lessons",
+        "utilization",
+    )
+    list_select_related = ("employment_category",)
+    list_filter = ("employment_category",)
+    search_fields = ("^name",)
+    autocomplete_fields = ("employment_category",)
+
+    def get_queryset(self, request):
+        return annotate_workload(super().get_queryset(request))
+
+    @admin.display(description="Lektioner", ordering="lessons")
+    def lessons(self, staff):
+        return staff.lessons
+
+    @admin.display(description="Udnyttelse (%)", ordering="utilization")
+    def utilization(self, staff):
+        return "" if staff.utilization is None else round(staff.utilization)
+
+
+@admin.register(SchoolFee)
+class SchoolFeeAdmin(BaseAdmin):
+    list_display = ("level", "name", "amount", "num_students")
+    list_display_links = ("level", "name")
+    search_fields = ("^name",)
+
+    def get_queryset(self, request):
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(
+                num_students=Count(
+                    "student", filter=Q(student__schoolclass__archived=False)
+                )
+            )
+        )
+
+    @admin.display(description="Elever", ordering="num_students")
+    def num_students(self, fee):
+        return fee.num_students
+
+
+@admin.register(EmploymentCategory)
+class EmploymentCategoryAdmin(BaseAdmin):
+    list_display = ("name", "type", "price_pr_lesson", "num_staff")
+    search_fields = ("^name",)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(num_staff=Count("staff_members"))
+
+    @admin.display(description="Ansatte", ordering="num_staff")
+    def num_staff(self, category):
+        return category.num_staff
+
+
+@admin.register(SchoolYear)
+class SchoolYearAdmin(BaseAdmin):
+    list_display = ("name", "start_date", "end_date")
+    search_fields = ("^name",)
+
+
+class StudentActionForm(ActionForm):
+    """Handlingsformularen på elevlisten med målet for masseopdateringerne."""
+
+    schoolclass = forms.ModelChoiceField(
+        SchoolClass.objects.all(),
+        required=False,
+        label="Klasse",
+        widget=AutocompleteSelect(Student._meta.get_field("schoolclass"), admin.site),
+    )
+    school_fee = forms.ModelChoiceField(
+        SchoolFee.objects.all(), required=False, label="Takst"
+    )
+
+
+@admin.register(Student)
+class StudentAdmin(BaseAdmin):
+    list_display = ("name", "schoolclass", "school_fee", "date_of_birth", "age")
+    list_select_related = ("schoolclass", "school_fee")
+    list_filter = ("school_fee", "schoolclass__team__department")
+    search_fields = ("^name",)
+    autocomplete_fields = ("schoolclass", "school_fee")
     readonly_fields = (
         "age",
     )  # Gør 'age' til et skrivebeskyttet felt i detaljevisningen
+    action_form = StudentActionForm
+    actions = ("move_to_schoolclass", "change_school_fee")
+
+    @admin.display(description="Alder", ordering="-date_of_birth")
+    def age(self, student):
+        # Hele år regnet fra fødselsdatoen; Student.age (timesince) er for dyr
+        # til en hel liste
+        if not student.date_of_birth:
+            return "N/A"
+        today, born = date.today(), student.date_of_birth
+        return (
+            today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+        )
+
+    def _target(self, request, field):
+        form = self.action_form(request.POST)
+        form.fields["action"].choices = self.get_action_choices(request)
+        if form.is_valid() and form.cleaned_data[field]:
+            return form.cleaned_data[field]
+        self.message_user(
+            request, f"Vælg {form.fields[field].label.lower()} først.", "warning"
+        )
+        return None
 
+    @admin.action(description="Flyt valgte elever til klassen")
+    def move_to_schoolclass(self, request, queryset):
+        schoolclass = self._target(request, "schoolclass")
+        if schoolclass is None:
+            return
+        with transaction.atomic():
+            pks = list(queryset.values_list("pk", flat=True))
+            previous = set(
+                queryset.order_by().values_list("schoolclass_id", flat=True).distinct()
+            )
+            count = Student.objects.filter(pk__in=pks).update(schoolclass=schoolclass)
+            schoolclasses_changed(previous | {schoolclass.pk})
+            search.update_context(Student, pks, schoolclass.name)
+        self.message_user(request, f"{count} elever flyttet til {schoolclass}.")
 
-admin.site.register(Student, StudentAdmin)
+    @admin.action(description="Giv valgte elever taksten")
+    def change_school_fee(self, request, queryset):
+        school_fee = self._target(request, "school_fee")
+        if school_fee is None:
+            return
+        with transaction.atomic():
+            class_ids = set(
+                queryset.order_by().values_list("schoolclass_id", flat=True).distinct()
+            )
+            count = queryset.update(school_fee=school_fee)
+            schoolclasses_changed(class_ids)
+        self.message_user(request, f"{count} elever har fået taksten {school_fee}.")
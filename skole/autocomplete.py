@@ -0,0 +1,102 @@
+"""
+Opslag til typeahead-felterne i formularerne (se skole.widgets).
+
+Klasser og ansatte slås op i søgeindekset (skole.search), hvor et præfiks er
+et intervalopslag på (kind, token), og der hentes højst LIMIT resultater. Har
+indekset ingen indgange af slagsen (fx før det er bygget), slås navnet op
+direkte i modellen i stedet.
+Takster er en lille tabel med én række pr. takstniveau og slås op direkte.
+Etiketterne til de allerede valgte objekter hentes kun for de valgte id'er.
+"""
+
+from dataclasses import dataclass
+
+from django.db.models import Q
+
+from . import search
+from .models import SchoolFee, SearchEntry
+
+LIMIT = 10
+
+
+def _label(label, context):
+    return f"{label} ({context})" if context else label
+
+
+@dataclass(frozen=True)
+class IndexSource:
+    """Objekter fra søgeindekset af slagsen `kind`."""
+
+    kind: str
+
+    def _from_model(self, limit=None, **lookup):
+        source = search.SOURCES[self.kind]
+        objects = (
+            source.model.objects.filter(**lookup)
+            .select_related(*source.select_related)
+            .order_by("name")[:limit]
+        )
+        return [
+            (obj.pk, _label(source.label(obj), source.context(obj))) for obj in objects
+        ]
+
+    def _indexed(self):
+        return SearchEntry.objects.filter(kind=self.kind).exists()
+
+    def lookup(self, query, limit):
+        results = [
+            (entry.object_id, _label(entry.label, entry.context))
+            for entry in search.lookup(self.kind, query, limit)
+        ]
+        if results or not query.strip() or self._indexed():
+            return results
+        return self._from_model(limit, name__istartswith=query.strip())
+
+    def labels(self, pks):
+        labels = {
+            entry.object_id: _label(entry.label, entry.context)
+            for entry in SearchEntry.objects.filter(kind=self.kind, object_id__in=pks)
+        }
+        missing = set(pks) - set(labels)
+        if missing:
+            labels.update(self._from_model(pk__in=missing))
+        return labels
+
+
+class SchoolFeeSource:
+    def lookup(self, query, limit):
+        query = query.strip()
+        if not query:
+            return []
+        condition = Q(name__istartswith=query)
+        if query.isdigit():
+            condition |= Q(level=int(query))
+        return [
+            (fee.pk, str(fee)) for fee in SchoolFee.objects.filter(condition)[:limit]
+        ]
+
+    def labels(self, pks):
+        return {fee.pk: str(fee) for fee in SchoolFee.objects.filter(pk__in=pks)}
+
+
+SOURCES = {
+    "schoolclass": IndexSource("schoolclass"),
+    "staff": IndexSource("staff"),
+    "schoolfee": SchoolFeeSource(),
+}
+
+
+def _ids(values):
+    return [int(value) for value in values if str(value).isdigit()]
+
+
+def lookup(kind, query, limit=LIMIT):
+    """[(id, etiket), ...] for højst `limit` objekter, der matcher `query`."""
+    return SOURCES[kind].lookup(query, limit)
+
+
+def selected(kind, values):
+    """[(id, etiket), ...] for de valgte id'er i den givne rækkefølge."""
+    pks = _ids(values)
+    labels = SOURCES[kind].labels(pks) if pks else {}
+    return [(pk, labels[pk]) for pk in pks if pk in labels]
@@ -0,0 +1,484 @@
+"""
+Beregning af klassernes økonomi (indtægt fra takster mod lønudgift til lektioner).
+
+Resultaterne er uforanderlige objekter, så de kan deles mellem views og andre
+kaldere uden at nogen af dem kan ændre tallene undervejs.
+"""
+
+import asyncio
+from collections import defaultdict
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import ClassBudgetSummary, Lesson, SchoolClass, Student, Team
+
+
+def usage(income, cost):
+    """Returnér (overskud, forbrugs-%) for en given indtægt og udgift."""
+    surplus = 0
+    percentage_used = 0
+    if income and cost and income > 0 and cost > 0:
+        surplus = int(income - cost)
+        percentage_used = round((cost / income) * 100, 1)
+    return surplus, percentage_used
+
+
+def percentage(cost, income):
+    """Forbrugs-% af indtægten, eller 0 hvis der ingen indtægt er."""
+    return round((cost / income) * 100, 1) if income > 0 else 0
+
+
+@dataclass(frozen=True)
+class TeacherLessons:
+    """Lektioner i en klasse grupperet pr. lærer, fag og lokale."""
+
+    teacher_name: str
+    employment_category: str
+    subject: str
+    classroom: str
+    price_per_lesson: Decimal
+    total_lessons_per_teacher: int
+    total_price: Decimal
+
+
+@dataclass(frozen=True)
+class ClassBudget:
+    """Økonomisk øjebliksbillede af én klasse."""
+
+    schoolclass: SchoolClass
+    students: tuple
+    lessons: tuple
+    total_hours: tuple
+    total_sum: int
+    total_lessons_in_class: int
+    total_school_fee: Decimal
+    total_price_for_class: Decimal
+    surplus: int
+    percentage_used: Decimal
+
+    @property
+    def num_students(self):
+        return len(self.students)
+
+    @classmethod
+    def for_class(cls, class_id):
+        """
+        Byg budgettet for klassen med tre forespørgsler uanset antallet af
+        elever, lærere og lektioner. Rejser SchoolClass.DoesNotExist.
+        """
+        schoolclass = class_with_totals(class_id).get()
+        return cls.from_rows(
+            schoolclass, class_students(class_id), lesson_rows(class_id)
+        )
+
+    @classmethod
+    async def afor_class(cls, class_id):
+        """Som for_class, men de tre forespørgsler køres samtidig."""
+        schoolclass, students, rows = await asyncio.gather(
+            class_with_totals(class_id).aget(),
+            alist(class_students(class_id)),
+            alist(lesson_rows(class_id)),
+        )
+        return cls.from_rows(schoolclass, students, rows)
+
+    @classmethod
+    def from_rows(cls, schoolclass, students, rows):
+        """Beregn budgettet i ét gennemløb af allerede hentede rækker."""
+        students = tuple(students)
+        total_school_fee = sum(
+            (student.school_fee.amount for student in students if student.school_fee),
+            Decimal(0),
+        )
+
+        lessons = []
+        total_hours = defaultdict(int)
+        for row in rows:
+            price = row["price_per_lesson"] or Decimal(0)
+            count = row["total_lessons_per_teacher"]
+            lesson = TeacherLessons(
+                teacher_name=row["teacher_name"] or "",
+                employment_category=row["employment_category"] or "",
+                subject=row["subject"],
+                classroom=row["classroom"],
+                price_per_lesson=price,
+                total_lessons_per_teacher=count,
+                total_price=count * price,
+            )
+            lessons.append(lesson)
+            total_hours[lesson.employment_category] += count
+
+        # Lesson.cost er allerede summen af lærernes priser pr. lektion
+        total_price_for_class = schoolclass.total_cost or Decimal(0)
+        surplus, percentage_used = usage(total_school_fee, total_price_for_class)
+
+        return cls(
+            schoolclass=schoolclass,
+            students=students,
+            lessons=tuple(lessons),
+            total_hours=tuple(total_hours.items()),
+            total_sum=sum(total_hours.values()),
+            total_lessons_in_class=schoolclass.total_lessons_in_class,
+            total_school_fee=total_school_fee,
+            total_price_for_class=total_price_for_class,
+            surplus=surplus,
+            percentage_used=percentage_used,
+        )
+
+
+def refresh_lesson_costs(**lookup):
+    """
+    Genberegn Lesson.cost og Lesson.teacher_count for lektionerne, der matcher
+    `lookup` (fx ``pk__in=[...]`` eller ``teachers=staff``), med én UPDATE.
+    """
+    teachings = (
+        Lesson.teachers.through.objects.filter(lesson_id=OuterRef("pk"))
+        .values("lesson_id")
+        .order_by()
+    )
+    cost = teachings.annotate(
+        cost=Sum("staff__employment_category__price_pr_lesson")
+    ).values("cost")
+    count = teachings.annotate(count=Count("id")).values("count")
+    return Lesson.objects.filter(**lookup).update(
+        cost=Coalesce(
+            Subquery(cost),
+            Value(Decimal(0)),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+        teacher_count=Coalesce(Subquery(count), 0),
+    )
+
+
+def class_with_totals(class_id):
+    return (
+        SchoolClass.objects.select_related("team__department")
+        .annotate(
+            total_lessons_in_class=Count("lessons"),
+            total_cost=Sum("lessons__cost"),
+        )
+        .filter(pk=class_id)
+    )
+
+
+def class_students(class_id):
+    return Student.objects.filter(schoolclass_id=class_id).select_related("school_fee")
+
+
+def lesson_rows(class_id):
+    """Klassens lektioner grupperet pr. lærer, kategori, fag og lokale."""
+    return (
+        Lesson.objects.filter(schoolclass_id=class_id)
+        .values(
+            "subject",
+            "classroom",
+            teacher_name=F("teachers__name"),
+            employment_category=F("teachers__employment_category__name"),
+            price_per_lesson=F("teachers__employment_category__price_pr_lesson"),
+        )
+        .annotate(total_lessons_per_teacher=Count("id"))
+        .order_by("teacher_name", "subject")
+    )
+
+
+@dataclass(frozen=True)
+class ClassSummary:
+    """Nøgletal for én klasse i en team-, afdelings- eller skoleoversigt."""
+
+    schoolclass: SchoolClass
+    num_students: int
+    sum_school_fee: Decimal
+    sum_school_fee_amount: int
+    num_lessons: int
+    hours_by_category: tuple
+    total_price_for_class: Decimal
+    surplus: int
+    percentage_used: Decimal
+
+
+@dataclass(frozen=True)
+class TeamBudget:
+    """Økonomi for alle klasser i et team samt teamets totaler."""
+
+    team: Team
+    classes: tuple
+    num_students: int
+    school_fee: Decimal
+    school_fee_amount: int
+    num_lessons: int
+    total_hours: tuple
+    total_price_for_team: Decimal
+    surplus: Decimal
+    percentage_used: Decimal
+
+    @classmethod
+    def for_team(cls, team_id):
+        """
+        Byg teamets budget med et fast antal forespørgsler, uanset hvor mange
+        klasser, elever og lektioner teamet har. Rejser Team.DoesNotExist.
+        """
+        team = Team.objects.select_related("department").get(pk=team_id)
+        # Via teamets relation peger schoolclass.team på `team` uden ekstra opslag
+        schoolclasses = team.schoolclasses.all()
+        return cls.from_figures(team, schoolclasses, class_figures(team_id=team_id))
+
+    @classmethod
+    async def afor_team(cls, team_id):
+        """Som for_team, men teamet, klasserne og nøgletallene hentes samtidig."""
+        team, schoolclasses, figures = await asyncio.gather(
+            Team.objects.select_related("department").aget(pk=team_id),
+            alist(SchoolClass.objects.filter(team_id=team_id)),
+            aclass_figures(team_id=team_id),
+        )
+        for schoolclass in schoolclasses:
+            schoolclass.team = team
+        return cls.from_figures(team, schoolclasses, figures)
+
+    @classmethod
+    def from_figures(cls, team, schoolclasses, figures):
+        classes = []
+        total_hours = defaultdict(int)
+        for schoolclass in schoolclasses:
+            summary = summarize_class(schoolclass, figures.get(schoolclass.pk))
+            classes.append(summary)
+            for category, hours in summary.hours_by_category:
+                total_hours[category] += hours
+
+        school_fee = sum((c.sum_school_fee for c in classes), Decimal(0))
+        total_price_for_team = sum(
+            (c.total_price_for_class for c in classes), Decimal(0)
+        )
+        return cls(
+            team=team,
+            classes=tuple(classes),
+            num_students=sum(c.num_students for c in classes),
+            school_fee=school_fee,
+            school_fee_amount=sum(c.sum_school_fee_amount for c in classes),
+            num_lessons=sum(c.num_lessons for c in classes),
+            total_hours=tuple(sorted(total_hours.items())),
+            total_price_for_team=total_price_for_team,
+            surplus=school_fee - total_price_for_team,
+            percentage_used=percentage(total_price_for_team, school_fee),
+        )
+
+
+def class_figures(**lookup):
+    """
+    Saml nøgletal pr. klasse for alle klasser, der matcher `lookup`
+    (fx ``team_id=3`` eller ``pk__in=[1, 2]``), med tre grupperede
+    forespørgsler. Returnerer en dict med klassens id som nøgle. Udgiften er
+    summen af Lesson.cost; fordelingen pr. personalekategori kommer fra lærerne.
+    """
+    return _merge_figures(*_figure_queries(lookup))
+
+
+async def aclass_figures(**lookup):
+    """Som class_figures, men de tre forespørgsler køres samtidig."""
+    rows = await asyncio.gather(*(alist(q) for q in _figure_queries(lookup)))
+    return _merge_figures(*rows)
+
+
+async def alist(queryset):
+    """Hent et queryset som en liste fra async kode."""
+    return [row async for row in queryset]
+
+
+def _figure_queries(lookup):
+    """(elever, lektioner, lærertimer) grupperet pr. klasse; se class_figures."""
+    # Som SchoolClass.objects: arkiverede klasser regnes ikke med
+    lookup = {f"schoolclass__{key}": value for key, value in lookup.items()}
+    lookup["schoolclass__archived"] = False
+    students = (
+        Student.objects.filter(**lookup)
+        .values("schoolclass_id")
+        .annotate(
+            num_students=Count("id"),
+            sum_school_fee=Sum("school_fee__amount"),
+            sum_school_fee_amount=Sum("school_fee__level"),
+        )
+        .order_by()
+    )
+    lessons = (
+        Lesson.objects.filter(**lookup)
+        .values("schoolclass_id")
+        .annotate(num_lessons=Count("id"), cost=Sum("cost"))
+        .order_by()
+    )
+    teachings = (
+        Lesson.teachers.through.objects.filter(
+            **{f"lesson__{key}": value for key, value in lookup.items()}
+        )
+        .values(
+            schoolclass_id=F("lesson__schoolclass_id"),
+            category=F("staff__employment_category__name"),
+        )
+        .annotate(
+            hours=Count("id"),
+            cost=Sum("staff__employment_category__price_pr_lesson"),
+        )
+        .order_by()
+    )
+    return students, lessons, teachings
+
+
+def _merge_figures(students, lessons, teachings):
+    figures = defaultdict(
+        lambda: {
+            "num_students": 0,
+            "sum_school_fee": Decimal(0),
+            "sum_school_fee_amount": 0,
+            "num_lessons": 0,
+            "cost": Decimal(0),
+            "hours_by_category": {},
+            "cost_by_category": {},
+        }
+    )
+    for row in students:
+        entry = figures[row["schoolclass_id"]]
+        entry["num_students"] = row["num_students"]
+        entry["sum_school_fee"] = row["sum_school_fee"] or Decimal(0)
+        entry["sum_school_fee_amount"] = row["sum_school_fee_amount"] or 0
+    for row in lessons:
+        entry = figures[row["schoolclass_id"]]
+        entry["num_lessons"] = row["num_lessons"]
+        entry["cost"] = row["cost"] or Decimal(0)
+    for row in teachings:
+        entry = figures[row["schoolclass_id"]]
+        entry["hours_by_category"][row["category"]] = row["hours"]
+        entry["cost_by_category"][row["category"]] = row["cost"]
+    return dict(figures)
+
+
+def summarize_class(schoolclass, figures=None):
+    """Lav et ClassSummary ud fra en klasse og dens tal fra class_figures()."""
+    if figures is None:
+        figures = class_figures(pk=schoolclass.pk).get(schoolclass.pk, {})
+    income = figures.get("sum_school_fee", Decimal(0))
+    cost = figures.get("cost", Decimal(0))
+    surplus, percentage_used = usage(income, cost)
+    return ClassSummary(
+        schoolclass=schoolclass,
+        num_students=figures.get("num_students", 0),
+        sum_school_fee=income,
+        sum_school_fee_amount=figures.get("sum_school_fee_amount", 0),
+        num_lessons=figures.get("num_lessons", 0),
+        hours_by_category=tuple(sorted(figures.get("hours_by_category", {}).items())),
+        total_price_for_class=cost,
+        surplus=surplus,
+        percentage_used=percentage_used,
+    )
+
+
+def refresh_class_summaries(class_ids=None):
+    """
+    Genberegn ClassBudgetSummary for de givne klasser, eller for alle klasser
+    hvis `class_ids` er None. Klasser, der ikke (længere) findes, springes over.
+    Returnerer antallet af opdaterede rækker.
+    """
+    if class_ids is None:
+        class_ids = list(SchoolClass.objects.order_by().values_list("pk", flat=True))
+        figures = class_figures()
+    else:
+        class_ids = list(
+            SchoolClass.objects.filter(pk__in=set(class_ids))
+            .order_by()
+            .values_list("pk", flat=True)
+        )
+        figures = class_figures(pk__in=class_ids) if class_ids else {}
+
+    summaries = []
+    for class_id in class_ids:
+        entry = figures.get(class_id, {})
+        income = entry.get("sum_school_fee", Decimal(0))
+        cost = entry.get("cost", Decimal(0))
+        summaries.append(
+            ClassBudgetSummary(
+                schoolclass_id=class_id,
+                num_students=entry.get("num_students", 0),
+                school_fee=income,
+                num_lessons=entry.get("num_lessons", 0),
+                hours_by_category=entry.get("hours_by_category", {}),
+                cost_by_category=entry.get("cost_by_category", {}),
+                cost=cost,
+                surplus=income - cost,
+                percentage_used=percentage(cost, income),
+            )
+        )
+
+    ClassBudgetSummary.objects.bulk_create(
+        summaries,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=["schoolclass"],
+        update_fields=[
+            "num_students",
+            "school_fee",
+            "num_lessons",
+            "hours_by_category",
+            "cost_by_category",
+            "cost",
+            "surplus",
+            "percentage_used",
+            "updated_at",
+        ],
+    )
+    return len(summaries)
+
+
+@dataclass(frozen=True)
+class BudgetRollup:
+    """Summen af en række klassebudgetter, fx for et team eller en skole."""
+
+    group: object
+    num_classes: int
+    num_students: int
+    school_fee: Decimal
+    num_lessons: int
+    hours_by_category: tuple
+    cost_by_category: tuple
+    cost: Decimal
+    surplus: Decimal
+    percentage_used: Decimal
+
+    @classmethod
+    def from_summaries(cls, group, summaries):
+        hours = defaultdict(int)
+        costs = defaultdict(Decimal)
+        num_students = num_lessons = 0
+        school_fee = cost = Decimal(0)
+        for summary in summaries:
+            num_students += summary.num_students
+            num_lessons += summary.num_lessons
+            school_fee += summary.school_fee
+            cost += summary.cost
+            for category, value in summary.hours_by_category.items():
+                hours[category] += value
+            for category, value in summary.cost_by_category.items():
+                costs[category] += Decimal(value)
+        return cls(
+            group=group,
+            num_classes=len(summaries),
+            num_students=num_students,
+            school_fee=school_fee,
+            num_lessons=num_lessons,
+            hours_by_category=tuple(sorted(hours.items())),
+            cost_by_category=tuple(sorted(costs.items())),
+            cost=cost,
+            surplus=school_fee - cost,
+            percentage_used=percentage(cost, school_fee),
+        )
+
+
+def rollup(summaries, group_by):
+    """
+    Gruppér klassebudgetter med `group_by` (en funktion fra ClassBudgetSummary
+    til gruppens objekt) og returnér (rækker pr. gruppe, total).
+    """
+    summaries = list(summaries)
+    groups = {}
+    for summary in summaries:
+        groups.setdefault(group_by(summary), []).append(summary)
+    rows = [BudgetRollup.from_summaries(group, rows) for group, rows in groups.items()]
+    return rows, BudgetRollup.from_summaries(None, summaries)
@@ -0,0 +1,48 @@
+"""
+Versionsnøgler til Djangos cache.
+
+Data caches under en nøgle, der indeholder en versionstæller. I stedet for at
+slette de gamle nøgler tælles versionen op, så alle læsere automatisk skifter
+til en ny nøgle, og de gamle værdier udløber af sig selv.
+
+Tællerne skal ligge i en cache, som alle workers deler (se CACHES i
+normering/settings.py); ellers ser de andre processer aldrig en optælling.
+"""
+
+import time
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def version_key(name):
+    return f"version:{name}"
+
+
+def get_version(name):
+    """Returnér den aktuelle version for `name`."""
+    # Startværdien er tidsbaseret, så en udløbet tæller ikke genbruger gamle nøgler
+    return cache.get_or_set(version_key(name), time.time_ns, None)
+
+
+async def aget_version(name):
+    """get_version() fra async kode; databasecachen må ikke kaldes synkront dér."""
+    return await cache.aget_or_set(version_key(name), time.time_ns, None)
+
+
+def bump_version(name):
+    """Gør alle værdier cachet under den nuværende version af `name` forældede."""
+    try:
+        cache.incr(version_key(name))
+    except ValueError:
+        cache.set(version_key(name), time.time_ns(), None)
+
+
+def bump_version_on_commit(name):
+    """
+    Tæl versionen op, når den aktuelle transaktion er committet. Tælles den op
+    før, kan en samtidig læser nå at cache de gamle data under den nye version,
+    og ruller transaktionen tilbage, er optællingen forgæves.
+    """
+    transaction.on_commit(partial(bump_version, name))
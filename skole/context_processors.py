@@ -1,28 +1,69 @@
-from django.db.models import IntegerField, Value
-from django.db.models.functions import Cast
-from django.db.models import Case, When, F
-from .models import School, Department, Team, SchoolClass
+from django.core.cache import cache
 
+from .cache import get_version
+from .models import Department, School, SchoolClass, Team
 
-def global_context(request):
-    all_schools = School.objects.all()
-    all_departments = Department.objects.all().order_by(
-        "name"
-    )  # Sorter afdelinger alfabetisk
-    all_teams = Team.objects.all().order_by(
-        "department__name", "name"
-    )  # Sorter teams efter afdeling og derefter alfabetisk indenfor afdeling
-
-    all_schoolclasses = SchoolClass.objects.annotate(
-        class_number=Cast(
-            Case(When(name__regex=r"^\d+", then=F("name")), default=Value("0")),
-            IntegerField(),
+NAVBAR_VERSION = "navbar"
+
+
+def navbar_tree():
+    """
+    Byg navigationens træ af skoler, afdelinger, teams og klasser som simple
+    dicts. Træet caches, indtil en af modellerne ændres (se skole.signals).
+    """
+    key = f"navbar:{get_version(NAVBAR_VERSION)}"
+    tree = cache.get(key)
+    if tree is not None:
+        return tree
+
+    all_schoolclasses = [
+        {"id": pk, "name": name, "team_id": team_id}
+        for pk, name, team_id in SchoolClass.objects.values_list(
+            "pk", "name", "team_id"
+        )
+    ]
+    # Sorter teams efter afdeling og derefter alfabetisk indenfor afdeling
+    all_teams = [
+        {"id": pk, "name": name, "department_id": department_id, "schoolclasses": []}
+        for pk, name, department_id in Team.objects.order_by(
+            "department__name", "name"
+        ).values_list("pk", "name", "department_id")
+    ]
+    # Sorter afdelinger alfabetisk
+    all_departments = [
+        {"id": pk, "name": name, "school_id": school_id, "teams": []}
+        for pk, name, school_id in Department.objects.order_by("name").values_list(
+            "pk", "name", "school_id"
         )
-    ).order_by("team__department__name", "class_number", "name")
+    ]
+    all_schools = [
+        {"id": pk, "name": name}
+        for pk, name in School.objects.values_list("pk", "name")
+    ]
 
-    return {
+    teams_by_id = {team["id"]: team for team in all_teams}
+    for schoolclass in all_schoolclasses:
+        teams_by_id[schoolclass["team_id"]]["schoolclasses"].append(schoolclass)
+    departments_by_id = {department["id"]: department for department in all_departments}
+    for team in all_teams:
+        departments_by_id[team["department_id"]]["teams"].append(team)
+
+    tree = {
         "all_schools": all_schools,
         "all_departments": all_departments,
         "all_teams": all_teams,
         "all_schoolclasses": all_schoolclasses,
     }
+    cache.set(key, tree, None)
+    return tree
+
+
+def global_context(request):
+    match = getattr(request, "resolver_match", None)
+    if match is not None and "admin" in match.namespaces:
+        return {}
+
+    # Gem træet på requesten, så flere renderinger i samme request genbruger det
+    if not hasattr(request, "_navbar_tree"):
+        request._navbar_tree = navbar_tree()
+    return request._navbar_tree
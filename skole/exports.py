@@ -0,0 +1,256 @@
+"""
+Eksport af budgetter og lister til CSV og XLSX.
+
+Rækkerne produceres af generatorer, som henter data med
+``.iterator(chunk_size=...)``, og CSV sendes med StreamingHttpResponse, så
+selv en eksport af hele kommunen holder et fladt hukommelsesforbrug. Under
+ASGI ville Django samle en synkron iterator helt op før afsendelsen, så der
+får svaret en asynkron iterator, som henter CHUNK_SIZE rækker ad gangen i en
+tråd. Tallene beregnes med de samme funktioner som klasse- og teamsiderne
+bruger.
+"""
+
+import csv
+import tempfile
+from decimal import Decimal
+from itertools import chain, islice
+
+from asgiref.sync import sync_to_async
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+from .budget import ClassBudget, TeamBudget, class_figures, summarize_class
+from .models import EmploymentCategory, Lesson, SchoolClass, Student
+
+CHUNK_SIZE = 2000
+FORMATS = ("csv", "xlsx")
+
+
+class Echo:
+    """Et 'filobjekt', der bare returnerer det skrevne, til csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    # Decimalkomma, så tallene læses som tal i et dansk regneark
+    if isinstance(value, (Decimal, float)):
+        return str(value).replace(".", ",")
+    return value
+
+
+def csv_response(filename, header, rows):
+    writer = csv.writer(Echo(), delimiter=";")
+    lines = (
+        writer.writerow([_csv_value(value) for value in row])
+        for row in chain([header], rows)
+    )
+    response = StreamingHttpResponse(
+        chain(["\ufeff"], lines), content_type="text/csv; charset=utf-8"
+    )
+    response["Content-Disposition"] = content_disposition_header(
+        as_attachment=True, filename=f"{filename}.csv"
+    )
+    return response
+
+
+def xlsx_response(filename, header, rows):
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ValueError("Eksport til XLSX kræver pakken openpyxl.")
+
+    # write_only-tilstand skriver rækkerne direkte til en midlertidig fil
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    for row in chain([header], rows):
+        sheet.append(row)
+    file = tempfile.TemporaryFile()
+    workbook.save(file)
+    file.seek(0)
+    return FileResponse(
+        file,
+        as_attachment=True,
+        filename=f"{filename}.xlsx",
+        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
+
+
+async def _async_chunks(iterator, size):
+    # Generatorerne bruger databasen, så de skal køre i en tråd og ikke i
+    # event loopet
+    take = sync_to_async(lambda: list(islice(iterator, size)))
+    while chunk := await take():
+        for item in chunk:
+            yield item
+
+
+def export_response(fmt, filename, header, rows, asynchronous=False):
+    if fmt == "xlsx":
+        response = xlsx_response(filename, header, rows)
+        # Filen er allerede skrevet; den sendes i FileResponses egne blokke
+        size = 1
+    else:
+        response = csv_response(filename, header, rows)
+        size = CHUNK_SIZE
+    if asynchronous:
+        response.streaming_content = _async_chunks(
+            iter(response.streaming_content), size
+        )
+    return response
+
+
+def class_budget_rows(class_id):
+    """Klassens lektioner pr. lærer efterfulgt af klassens totaler."""
+    budget = ClassBudget.for_class(class_id)
+    header = [
+        "Personale",
+        "Kategori",
+        "Fag",
+        "Lokale",
+        "Lektioner",
+        "Beløb pr. lektion",
+        "Beløb samlet",
+    ]
+
+    def rows():
+        for lesson in budget.lessons:
+            yield [
+                lesson.teacher_name,
+                lesson.employment_category,
+                lesson.subject,
+                lesson.classroom,
+                lesson.total_lessons_per_teacher,
+                lesson.price_per_lesson,
+                lesson.total_price,
+            ]
+        yield []
+        yield ["Elever", budget.num_students]
+        yield ["Lektioner", budget.total_lessons_in_class]
+        yield ["Indtægt", budget.total_school_fee]
+        yield ["Udgifter", budget.total_price_for_class]
+        yield ["Overskud", budget.surplus]
+        yield ["Forbrugs-%", budget.percentage_used]
+
+    return budget.schoolclass.name, header, rows()
+
+
+def _class_summary_header(categories):
+    return [
+        "Afdeling",
+        "Team",
+        "Klasse",
+        "Elever",
+        "Indtægt",
+        "Lektioner",
+        *(f"Timer {category}" for category in categories),
+        "Udgift",
+        "Overskud",
+        "Forbrugs-%",
+    ]
+
+
+def _class_summary_row(summary, categories):
+    hours = dict(summary.hours_by_category)
+    schoolclass = summary.schoolclass
+    return [
+        schoolclass.team.department.name,
+        schoolclass.team.name,
+        schoolclass.name,
+        summary.num_students,
+        summary.sum_school_fee,
+        summary.num_lessons,
+        *(hours.get(category, 0) for category in categories),
+        summary.total_price_for_class,
+        summary.surplus,
+        summary.percentage_used,
+    ]
+
+
+def team_budget_rows(team_id):
+    """En række pr. klasse i teamet efterfulgt af teamets totaler."""
+    budget = TeamBudget.for_team(team_id)
+    categories = list(EmploymentCategory.objects.values_list("name", flat=True))
+    total_hours = dict(budget.total_hours)
+
+    def rows():
+        for summary in budget.classes:
+            yield _class_summary_row(summary, categories)
+        yield [
+            "I alt",
+            "",
+            "",
+            budget.num_students,
+            budget.school_fee,
+            budget.num_lessons,
+            *(total_hours.get(category, 0) for category in categories),
+            budget.total_price_for_team,
+            budget.surplus,
+            budget.percentage_used,
+        ]
+
+    return budget.team.name, _class_summary_header(categories), rows()
+
+
+def classes_budget_rows(name, **lookup):
+    """
+    En række pr. klasse, der matcher `lookup` (fx ``team__department_id=2``),
+    beregnet som på teamsiden.
+    """
+    categories = list(EmploymentCategory.objects.values_list("name", flat=True))
+    figures = class_figures(**lookup)
+    schoolclasses = (
+        SchoolClass.objects.filter(**lookup)
+        .select_related("team__department")
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    rows = (
+        _class_summary_row(
+            summarize_class(schoolclass, figures.get(schoolclass.pk, {})), categories
+        )
+        for schoolclass in schoolclasses
+    )
+    return name, _class_summary_header(categories), rows
+
+
+def student_rows():
+    header = ["Navn", "Afdeling", "Team", "Klasse", "Klassetrin", "Fødselsdato"]
+    header += ["Takstniveau", "Takst", "Beløb"]
+    students = Student.objects.select_related(
+        "schoolclass__team__department", "school_fee"
+    ).iterator(chunk_size=CHUNK_SIZE)
+    rows = (
+        [
+            student.name,
+            student.schoolclass.team.department.name,
+            student.schoolclass.team.name,
+            student.schoolclass.name,
+            student.age_number,
+            student.date_of_birth,
+            student.school_fee.level if student.school_fee else "",
+            student.school_fee.name if student.school_fee else "",
+            student.school_fee.amount if student.school_fee else "",
+        ]
+        for student in students
+    )
+    return "elever", header, rows
+
+
+def lesson_rows():
+    header = ["Klasse", "Fag", "Lokale", "Lærere"]
+    lessons = (
+        Lesson.objects.select_related("schoolclass")
+        .prefetch_related("teachers")
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    rows = (
+        [
+            lesson.schoolclass.name,
+            lesson.subject,
+            lesson.classroom,
+            ", ".join(teacher.name for teacher in lesson.teachers.all()),
+        ]
+        for lesson in lessons
+    )
+    return "lektioner", header, rows
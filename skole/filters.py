@@ -0,0 +1,135 @@
+"""
+Filtre til listevisningerne (django-filter).
+
+Filtrene er lighedsopslag eller intervaller på fremmednøgler og indekserede
+kolonner (se Meta.indexes på modellerne), så et filtreret udtræk kan bruge et
+indeks i stedet for at scanne hele tabellen. Navnefilteret er et præfiks uden
+hensyn til store og små bogstaver og skal derfor kombineres med de andre
+filtre på store tabeller. Klasser og lærere vælges med typeahead-felterne fra
+skole.widgets i stedet for en <select> med alle rækker.
+"""
+
+from datetime import date
+
+import django_filters
+from django import forms
+
+from . import workload
+from .widgets import TypeaheadSelect
+from .models import (
+    Department,
+    EmploymentCategory,
+    Lesson,
+    SchoolClass,
+    Staff,
+    Student,
+    Team,
+)
+
+
+def _select(queryset, label, field_name):
+    return django_filters.ModelChoiceFilter(
+        queryset=queryset,
+        field_name=field_name,
+        label=label,
+        widget=forms.Select(attrs={"class": "form-control"}),
+    )
+
+
+def _typeahead(queryset, label, field_name, kind):
+    return django_filters.ModelChoiceFilter(
+        queryset=queryset,
+        field_name=field_name,
+        label=label,
+        widget=TypeaheadSelect(kind),
+    )
+
+
+def _text(label, field_name, lookup_expr="exact"):
+    return django_filters.CharFilter(
+        field_name=field_name,
+        lookup_expr=lookup_expr,
+        label=label,
+        widget=forms.TextInput(attrs={"class": "form-control"}),
+    )
+
+
+def _number(label, **kwargs):
+    return django_filters.NumberFilter(
+        label=label, widget=forms.NumberInput(attrs={"class": "form-control"}), **kwargs
+    )
+
+
+class StudentFilter(django_filters.FilterSet):
+    name = _text("Navn begynder med", "name", "istartswith")
+    schoolclass = _typeahead(
+        SchoolClass.objects.all(), "Klasse", "schoolclass", "schoolclass"
+    )
+    team = _select(Team.objects.all(), "Team", "schoolclass__team")
+    department = _select(
+        Department.objects.all(), "Afdeling", "schoolclass__team__department"
+    )
+    fee_level = _number("Takstniveau", field_name="school_fee__level")
+    born_from = _number(
+        "Født fra år", method="filter_born_from", min_value=1900, max_value=2100
+    )
+    born_to = _number(
+        "Født til år", method="filter_born_to", min_value=1900, max_value=2100
+    )
+
+    class Meta:
+        model = Student
+        fields = []
+
+    # Fødselsår omsættes til et datointerval, så indekset på date_of_birth kan
+    # bruges (et opslag på __year ville skulle beregne året for hver række)
+    def filter_born_from(self, queryset, name, value):
+        return queryset.filter(date_of_birth__gte=date(int(value), 1, 1))
+
+    def filter_born_to(self, queryset, name, value):
+        return queryset.filter(date_of_birth__lte=date(int(value), 12, 31))
+
+
+class StaffFilter(django_filters.FilterSet):
+    name = _text("Navn begynder med", "name", "istartswith")
+    employment_category = _select(
+        EmploymentCategory.objects.all(), "Personalekategori", "employment_category"
+    )
+    employment_grade = _number("Timetal", field_name="employment_grade")
+
+    class Meta:
+        model = Staff
+        fields = []
+
+
+class LessonFilter(django_filters.FilterSet):
+    schoolclass = _typeahead(
+        SchoolClass.objects.all(), "Klasse", "schoolclass", "schoolclass"
+    )
+    subject = _text("Fag", "subject")
+    classroom = _text("Lokale", "classroom")
+    teacher = _typeahead(Staff.objects.all(), "Lærer", "teachers", "staff")
+
+    class Meta:
+        model = Lesson
+        fields = []
+
+
+class WorkloadFilter(django_filters.FilterSet):
+    name = _text("Navn begynder med", "name", "istartswith")
+    employment_category = _select(
+        EmploymentCategory.objects.all(), "Personalekategori", "employment_category"
+    )
+    allocation = django_filters.ChoiceFilter(
+        choices=workload.ALLOCATION_CHOICES,
+        label="Belægning",
+        method="filter_allocation",
+        widget=forms.Select(attrs={"class": "form-control"}),
+    )
+
+    class Meta:
+        model = Staff
+        fields = []
+
+    def filter_allocation(self, queryset, name, value):
+        return workload.filter_allocation(queryset, value)
@@ -2,6 +2,7 @@
 from django import forms
 
 from .models import SchoolClass
+from .widgets import TypeaheadSelect, TypeaheadSelectMultiple
 
 
 class SchoolClassForm(forms.ModelForm):
@@ -11,7 +12,7 @@ class SchoolClassForm(forms.ModelForm):
         widgets = {
             "name": forms.TextInput(attrs={"class": "form-control"}),
             "team": forms.Select(attrs={"class": "form-control"}),
-            "class_teachers": forms.SelectMultiple(attrs={"class": "form-control"}),
+            "class_teachers": TypeaheadSelectMultiple("staff"),
             "class_group": forms.Select(attrs={"class": "form-control"}),
             "age_number": forms.NumberInput(attrs={"class": "form-control"}),
         }
@@ -147,14 +148,14 @@ class LessonForm(forms.ModelForm):
         model = Lesson
         fields = ["schoolclass", "subject", "classroom", "teachers"]
         widgets = {
-            "schoolclass": forms.Select(attrs={"class": "form-control"}),
+            "schoolclass": TypeaheadSelect("schoolclass"),
             "subject": forms.TextInput(
                 attrs={"class": "form-control", "placeholder": "Indtast fag"}
             ),
             "classroom": forms.TextInput(
                 attrs={"class": "form-control", "placeholder": "Indtast lokale"}
             ),
-            "teachers": forms.SelectMultiple(attrs={"class": "form-control"}),
+            "teachers": TypeaheadSelectMultiple("staff"),
         }
         labels = {
             "schoolclass": "Klasse",
@@ -204,12 +205,12 @@ class StudentForm(forms.ModelForm):
             "name": forms.TextInput(
                 attrs={"class": "form-control", "placeholder": "Indtast elevens navn"}
             ),
-            "schoolclass": forms.Select(attrs={"class": "form-control"}),
+            "schoolclass": TypeaheadSelect("schoolclass"),
             "age_number": forms.NumberInput(attrs={"class": "form-control"}),
             "date_of_birth": forms.DateInput(
                 attrs={"class": "form-control", "type": "date"}
             ),
-            "school_fee": forms.Select(attrs={"class": "form-control"}),
+            "school_fee": TypeaheadSelect("schoolfee"),
         }
         labels = {
             "name": "Elevens Navn",
@@ -218,3 +219,165 @@ class StudentForm(forms.ModelForm):
             "date_of_birth": "Fødselsdato",
             "school_fee": "Takst",
         }
+
+
+class ImportForm(forms.Form):
+    KIND_CHOICES = [
+        ("students", "Elever"),
+        ("staff", "Ansatte"),
+        ("schoolclasses", "Klasser"),
+        ("lessons", "Lektioner"),
+    ]
+
+    kind = forms.ChoiceField(
+        choices=KIND_CHOICES,
+        label="Type",
+        widget=forms.Select(attrs={"class": "form-control"}),
+    )
+    file = forms.FileField(
+        label="Fil (CSV eller XLSX)",
+        widget=forms.ClearableFileInput(attrs={"class": "form-control-file"}),
+    )
+    dry_run = forms.BooleanField(
+        label="Tørkørsel (vis ændringer uden at gemme)", required=False, initial=True
+    )
+
+
+# Redigering af en klasses elever og lektioner som en tabel. Hver række er en
+# almindelig formular med objektets id; kun de ændrede rækker gemmes, med én
+# bulk_update pr. model. Valgmulighederne hentes én gang for hele tabellen.
+
+SMALL = {"class": "form-control form-control-sm"}
+
+
+class RowIdField(forms.IntegerField):
+    """Rækkens id. Det vælger objektet og tæller aldrig som en ændring."""
+
+    widget = forms.HiddenInput
+
+    def has_changed(self, initial, data):
+        return False
+
+
+class GridRowForm(forms.Form):
+    id = RowIdField()
+
+    def __init__(self, *args, choices=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name, field_choices in (choices or {}).items():
+            self.fields[name].choices = field_choices
+
+
+class StudentRowForm(GridRowForm):
+    name = forms.CharField(max_length=100, label="Navn", widget=forms.TextInput(SMALL))
+    age_number = forms.IntegerField(
+        required=False, label="Klassetrin", widget=forms.NumberInput(SMALL)
+    )
+    school_fee = forms.TypedChoiceField(
+        coerce=int,
+        required=False,
+        empty_value=None,
+        label="Takst",
+        widget=forms.Select(attrs=SMALL),
+    )
+    schoolclass = forms.TypedChoiceField(
+        coerce=int, label="Klasse", widget=forms.Select(attrs=SMALL)
+    )
+
+
+class LessonRowForm(GridRowForm):
+    subject = forms.CharField(
+        max_length=100, label="Fag", widget=forms.TextInput(SMALL)
+    )
+    classroom = forms.CharField(
+        max_length=100, label="Lokale", widget=forms.TextInput(SMALL)
+    )
+
+
+class BaseGridFormSet(forms.BaseFormSet):
+    """
+    Én formular pr. objekt i `objects`. `choices` er {feltnavn: [(id, navn)]}
+    og deles af alle rækker. save() gemmer de ændrede rækker med én
+    bulk_update og returnerer de ændrede objekter.
+    """
+
+    model = None
+
+    def __init__(self, data=None, *, objects, choices=None, **kwargs):
+        self.objects = {obj.pk: obj for obj in objects}
+        self.choices = choices or {}
+        # Bruges kun til antallet af rækker og rækkefølgen i en tom tabel; en
+        # indsendt række får startværdierne for objektet med rækkens id
+        initial = [{"id": obj.pk, **self.initial_for(obj)} for obj in objects]
+        super().__init__(data, initial=initial, **kwargs)
+
+    def initial_for(self, obj):
+        fields = self.form.base_fields
+        return {
+            name: getattr(obj, self.model._meta.get_field(name).attname)
+            for name in fields
+            if name != "id"
+        }
+
+    def row_id(self, index):
+        """Id'et på række nr. `index`: det indsendte eller objektets."""
+        if not self.is_bound:
+            return self.initial[index]["id"]
+        try:
+            return int(self.data.get(f"{self.add_prefix(index)}-id"))
+        except (TypeError, ValueError):
+            return None
+
+    def get_form_kwargs(self, index):
+        kwargs = {"choices": self.choices}
+        if index is not None:
+            # Rækker kan være tilføjet eller slettet, siden tabellen blev hentet,
+            # så startværdierne findes ud fra id'et og ikke rækkens nummer
+            obj = self.objects.get(self.row_id(index))
+            kwargs["initial"] = {"id": obj.pk, **self.initial_for(obj)} if obj else {}
+        return kwargs
+
+    def clean(self):
+        ids = [form.cleaned_data.get("id") for form in self.forms]
+        if any(pk not in self.objects for pk in ids) or len(set(ids)) != len(ids):
+            raise forms.ValidationError(
+                "Tabellen er ændret siden den blev hentet. Hent siden igen."
+            )
+
+    def save(self):
+        changed, fields = [], set()
+        for form in self.forms:
+            if not form.has_changed():
+                continue
+            obj = self.objects[form.cleaned_data["id"]]
+            for name in form.changed_data:
+                setattr(
+                    obj,
+                    self.model._meta.get_field(name).attname,
+                    form.cleaned_data[name],
+                )
+                fields.add(name)
+            changed.append(obj)
+        if changed:
+            self.model.objects.bulk_update(changed, sorted(fields))
+        return changed
+
+    def changed_pks(self, *names):
+        """Id'erne på rækkerne, hvor mindst ét af felterne `names` er ændret."""
+        return [
+            form.cleaned_data["id"]
+            for form in self.forms
+            if set(form.changed_data) & set(names)
+        ]
+
+
+class StudentGridFormSet(BaseGridFormSet):
+    model = Student
+
+
+class LessonGridFormSet(BaseGridFormSet):
+    model = Lesson
+
+
+StudentGrid = forms.formset_factory(StudentRowForm, formset=StudentGridFormSet, extra=0)
+LessonGrid = forms.formset_factory(LessonRowForm, formset=LessonGridFormSet, extra=0)
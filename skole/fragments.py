@@ -0,0 +1,113 @@
+"""
+Versionstællere til de cachede skabelonfragmenter på klasse-, team- og
+afdelingssiderne.
+
+Hver klasse, hvert team, hver afdeling og hver skole har sin egen tæller (se
+skole.cache), og fragmenterne caches med ``{% cache %}`` under objektets id og
+tæller. Når en klasses data ændres, tælles klassens tæller op sammen med
+dens forældres (team, afdeling, skole), hvis totaler også ændres; alle andre
+sider serveres fortsat fra cachen. Et nyt navn på et team eller en afdeling
+vises desuden i brødkrummerne på siderne under det, så dér tælles også
+børnenes tællere op.
+"""
+
+from functools import partial
+from operator import getitem
+
+from asgiref.sync import async_to_sync
+from django.utils.functional import SimpleLazyObject
+
+from .cache import aget_version, bump_version, get_version
+from .models import Department, SchoolClass, Team
+
+# Cachetid for fragmenterne; tællerne sørger for, at de ikke bliver forældede
+TIMEOUT = 24 * 60 * 60
+
+SCHOOLCLASS_FRAGMENTS = (
+    "schoolclass_header",
+    "schoolclass_totals",
+    "schoolclass_students",
+    "schoolclass_lessons",
+)
+TEAM_FRAGMENTS = ("team_header", "team_classes", "team_summary")
+DEPARTMENT_FRAGMENTS = ("department_header", "department_teams")
+
+
+def version_name(kind, pk):
+    return f"fragments:{kind}:{pk}"
+
+
+def fragment_version(kind, pk):
+    return get_version(version_name(kind, pk))
+
+
+async def afragment_version(kind, pk):
+    return await aget_version(version_name(kind, pk))
+
+
+def lazy_context(aload, names):
+    """
+    Konteksten til en side af cachede fragmenter. Værdierne hentes med
+    coroutinen `aload` første gang, skabelonen bruger en af dem, dvs. kun når
+    et fragment mangler i cachen i det øjeblik, det renderes. Skabelonen
+    renderes i en tråd (se views.arender), så `aload` køres med async_to_sync.
+    """
+    loaded = SimpleLazyObject(async_to_sync(aload))
+    return {name: SimpleLazyObject(partial(getitem, loaded, name)) for name in names}
+
+
+def _ids(values):
+    return {pk for pk in values if pk is not None}
+
+
+def changed(class_ids=(), team_ids=(), department_ids=(), school_ids=()):
+    """
+    Tæl tællerne op for objekterne og alle deres forældre. Forældre til
+    objekter, der er slettet, skal gives direkte.
+    """
+    class_ids = _ids(class_ids)
+    team_ids = _ids(team_ids)
+    department_ids = _ids(department_ids)
+    school_ids = _ids(school_ids)
+    # Kun de givne id'er slås op; forældre fundet via en klasse er allerede fulde
+    given_teams, given_departments = set(team_ids), set(department_ids)
+    for team_id, department_id, school_id in SchoolClass.objects.filter(
+        pk__in=class_ids
+    ).values_list("team_id", "team__department_id", "team__department__school_id"):
+        team_ids.add(team_id)
+        department_ids.add(department_id)
+        school_ids.add(school_id)
+    for department_id, school_id in Team.objects.filter(pk__in=given_teams).values_list(
+        "department_id", "department__school_id"
+    ):
+        department_ids.add(department_id)
+        school_ids.add(school_id)
+    school_ids.update(
+        Department.objects.filter(pk__in=given_departments).values_list(
+            "school_id", flat=True
+        )
+    )
+
+    for kind, pks in [
+        ("schoolclass", class_ids),
+        ("team", team_ids),
+        ("department", department_ids),
+        ("school", school_ids),
+    ]:
+        for pk in pks:
+            bump_version(version_name(kind, pk))
+
+
+def renamed(team_ids=(), department_ids=()):
+    """Tæl også tællerne op for klasserne og teamene under de omdøbte objekter."""
+    teams = Team.objects.filter(pk__in=team_ids) | Team.objects.filter(
+        department__in=department_ids
+    )
+    team_ids = set(teams.values_list("pk", flat=True))
+    changed(
+        class_ids=SchoolClass.objects.filter(team__in=team_ids).values_list(
+            "pk", flat=True
+        ),
+        team_ids=team_ids,
+        department_ids=department_ids,
+    )
@@ -0,0 +1,446 @@
+"""
+Masseimport af elever, ansatte, klasser og lektioner fra CSV eller XLSX.
+
+Hver række valideres med modellens eksisterende ModelForm (uden
+fremmednøglerne), og fremmednøgler slås op efter navn i ordbøger, der bygges
+én gang pr. import. Rækkerne skrives med bulk_create i bidder, hver i sin egen
+transaktion, så en import af tusindvis af rækker kun koster et par
+forespørgsler pr. bid.
+"""
+
+import csv
+import io
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from functools import partial
+from itertools import islice
+
+from django.db import transaction
+from django.forms import modelform_factory
+
+from . import fragments, search
+from .budget import refresh_class_summaries, refresh_lesson_costs
+from .cache import bump_version_on_commit
+from .context_processors import NAVBAR_VERSION
+from .forms import LessonForm, SchoolClassForm, StaffForm, StudentForm
+from .models import (
+    EmploymentCategory,
+    Lesson,
+    SchoolClass,
+    SchoolFee,
+    Staff,
+    Student,
+    Team,
+)
+
+NEW = "ny"
+EXISTS = "findes"
+ERROR = "fejl"
+
+
+class RowError(Exception):
+    pass
+
+
+@dataclass
+class ImportReport:
+    """Resultatet af en import: antal rækker og status/fejl pr. linje."""
+
+    dry_run: bool
+    created: int = 0
+    existing: int = 0
+    rows: list = field(default_factory=list)
+    errors: list = field(default_factory=list)
+
+    def add(self, line, status, label):
+        self.rows.append((line, status, label))
+        if status == NEW:
+            self.created += 1
+        elif status == EXISTS:
+            self.existing += 1
+
+    def add_error(self, line, message):
+        self.rows.append((line, ERROR, message))
+        self.errors.append((line, message))
+
+
+def read_rows(file, filename):
+    """
+    Læs rækker fra en CSV- eller XLSX-fil som (linjenummer, dict) med
+    kolonnenavne i små bogstaver. Rækkerne læses løbende, ikke alle på én gang.
+    """
+    if filename.lower().endswith(".xlsx"):
+        yield from _read_xlsx(file)
+    else:
+        yield from _read_csv(file)
+
+
+def _read_csv(file):
+    if isinstance(file, io.TextIOBase):
+        text = file
+    else:
+        text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    sample = text.read(4096)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(text, dialect)
+    header = [column.strip().lower() for column in next(reader, [])]
+    for line, values in enumerate(reader, start=2):
+        if any(value.strip() for value in values):
+            yield line, dict(zip(header, (value.strip() for value in values)))
+
+
+def _read_xlsx(file):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("Import af XLSX-filer kræver pakken openpyxl.")
+
+    sheet = load_workbook(file, read_only=True, data_only=True).active
+    rows = sheet.iter_rows(values_only=True)
+    header = [str(column or "").strip().lower() for column in next(rows, ())]
+    for line, values in enumerate(rows, start=2):
+        values = ["" if value is None else value for value in values]
+        if any(str(value).strip() for value in values):
+            yield line, {
+                column: value.strip() if isinstance(value, str) else value
+                for column, value in zip(header, values)
+            }
+
+
+def unique_lookup(pairs):
+    """Byg en ordbog fra navn til id; navne, der findes flere gange, mappes til None."""
+    lookup = {}
+    for name, pk in pairs:
+        lookup[name] = None if name in lookup else pk
+    return lookup
+
+
+class BaseImporter:
+    model = None
+    form_class = None
+    # Felter, der valideres af formularen. Fremmednøgler slås op separat.
+    form_fields = ()
+    # Må samme nøgle forekomme flere gange (fx én lektion pr. ugentlig time)?
+    # Så er existing_keys() en Counter, og kun rækkerne ud over dem, der
+    # allerede findes, oprettes
+    repeated_keys = False
+
+    def __init__(self, dry_run=False, chunk_size=1000):
+        self.dry_run = dry_run
+        self.chunk_size = chunk_size
+        self.form = modelform_factory(
+            self.model, form=self.form_class, fields=self.form_fields
+        )
+        self.defaults = {
+            f.name: f.get_default()
+            for f in self.model._meta.concrete_fields
+            if f.name in self.form_fields and f.has_default()
+        }
+
+    def load_lookups(self):
+        """Hent de opslagstabeller, importen skal bruge (én forespørgsel hver)."""
+
+    def existing_keys(self):
+        """
+        Naturlige nøgler for rækker, der allerede findes i databasen (med
+        antal, hvis repeated_keys). Hver importer har også en key(instance),
+        der giver et nyt objekts nøgle.
+        """
+        return set()
+
+    def resolve(self, instance, row):
+        """Sæt fremmednøgler på `instance` ud fra rækken. Rejser RowError."""
+
+    def write(self, instances):
+        """Skriv en bid af nye objekter. Kaldes inde i en transaktion."""
+        self.model.objects.bulk_create(instances)
+
+    def after_write(self, instances):
+        """Opdater afledte data, som signalerne ellers ville have opdateret."""
+
+    def lookup(self, table, name, label):
+        if name in (None, ""):
+            raise RowError(f"{label} mangler")
+        name = str(name).strip()
+        if name not in table:
+            raise RowError(f"{label} '{name}' findes ikke")
+        if table[name] is None:
+            raise RowError(f"{label} '{name}' er ikke entydigt")
+        return table[name]
+
+    def build(self, row):
+        data = {
+            name: (
+                self.defaults[name]
+                if row.get(name) in (None, "") and name in self.defaults
+                else row.get(name, "")
+            )
+            for name in self.form_fields
+        }
+        form = self.form(data)
+        if not form.is_valid():
+            raise RowError(
+                "; ".join(
+                    f"{name}: {' '.join(errors)}"
+                    for name, errors in form.errors.items()
+                )
+            )
+        instance = form.save(commit=False)
+        self.resolve(instance, row)
+        return instance
+
+    def run(self, rows):
+        report = ImportReport(dry_run=self.dry_run)
+        self.load_lookups()
+        seen = self.existing_keys()
+        rows = iter(rows)
+        while chunk := list(islice(rows, self.chunk_size)):
+            instances = []
+            for line, row in chunk:
+                try:
+                    instance = self.build(row)
+                except RowError as error:
+                    report.add_error(line, str(error))
+                    continue
+                key = self.key(instance)
+                label = ", ".join(str(value) for value in row.values() if value)
+                if self.repeated_keys:
+                    if seen[key] > 0:
+                        seen[key] -= 1
+                        report.add(line, EXISTS, label)
+                        continue
+                elif key in seen:
+                    report.add(line, EXISTS, label)
+                    continue
+                else:
+                    seen.add(key)
+                report.add(line, NEW, label)
+                instances.append(instance)
+            if instances and not self.dry_run:
+                with transaction.atomic():
+                    self.write(instances)
+                    self.after_write(instances)
+        return report
+
+
+class SchoolClassLookupMixin:
+    """
+    Finder klassen i kolonnen "schoolclass". Klassenavne som "3A" går igen på
+    tværs af skoler og teams, så den valgfri kolonne "team" afgrænser
+    opslaget til klasserne i teamet med det navn.
+    """
+
+    def load_schoolclasses(self):
+        rows = list(
+            SchoolClass.objects.order_by().values_list("name", "team__name", "pk")
+        )
+        self.schoolclasses = unique_lookup((name, pk) for name, _, pk in rows)
+        by_team = defaultdict(list)
+        for name, team, pk in rows:
+            by_team[team].append((name, pk))
+        self.schoolclasses_by_team = {
+            team: unique_lookup(pairs) for team, pairs in by_team.items()
+        }
+
+    def resolve_schoolclass(self, row):
+        team = str(row.get("team") or "").strip()
+        if not team:
+            return self.lookup(self.schoolclasses, row.get("schoolclass"), "Klasse")
+        if team not in self.schoolclasses_by_team:
+            raise RowError(f"Team '{team}' findes ikke eller har ingen klasser")
+        return self.lookup(
+            self.schoolclasses_by_team[team],
+            row.get("schoolclass"),
+            f"Klasse i team '{team}'",
+        )
+
+
+class StudentImporter(SchoolClassLookupMixin, BaseImporter):
+    """
+    Kolonner: name, schoolclass, team (valgfri), age_number, date_of_birth,
+    school_fee (takstniveau).
+    """
+
+    model = Student
+    form_class = StudentForm
+    form_fields = ("name", "age_number", "date_of_birth")
+
+    def load_lookups(self):
+        self.load_schoolclasses()
+        self.fees = {}
+        for level, pk in SchoolFee.objects.values_list("level", "pk"):
+            self.fees.setdefault(str(level), pk)
+        # Samme standardtakst som Student.save() ville slå op for hver elev
+        self.default_fee = self.fees.get(str(Student.DEFAULT_FEE_LEVEL))
+
+    def existing_keys(self):
+        return set(Student.objects.order_by().values_list("name", "schoolclass_id"))
+
+    def key(self, instance):
+        return (instance.name, instance.schoolclass_id)
+
+    def resolve(self, instance, row):
+        instance.schoolclass_id = self.resolve_schoolclass(row)
+        level = row.get("school_fee")
+        if level in (None, ""):
+            instance.school_fee_id = self.default_fee
+        else:
+            instance.school_fee_id = self.lookup(self.fees, level, "Takstniveau")
+
+    def after_write(self, instances):
+        class_ids = {student.schoolclass_id for student in instances}
+        refresh_class_summaries(class_ids)
+        transaction.on_commit(partial(fragments.changed, class_ids=class_ids))
+        search.index_objects(Student, [student.pk for student in instances])
+
+
+class StaffImporter(BaseImporter):
+    """Kolonner: name, employment_category, employment_grade."""
+
+    model = Staff
+    form_class = StaffForm
+    form_fields = ("name", "employment_grade")
+
+    def load_lookups(self):
+        self.categories = unique_lookup(
+            EmploymentCategory.objects.values_list("name", "pk")
+        )
+
+    def existing_keys(self):
+        return set(Staff.objects.order_by().values_list("name", flat=True))
+
+    def key(self, instance):
+        return instance.name
+
+    def resolve(self, instance, row):
+        instance.employment_category_id = self.lookup(
+            self.categories, row.get("employment_category"), "Personalekategori"
+        )
+
+    def after_write(self, instances):
+        # Lærernes navne står på klassesiderne
+        class_ids = set(
+            Lesson.objects.filter(teachers__in=instances)
+            .order_by()
+            .values_list("schoolclass_id", flat=True)
+            .distinct()
+        )
+        transaction.on_commit(partial(fragments.changed, class_ids=class_ids))
+        search.index_objects(Staff, [staff.pk for staff in instances])
+
+
+class TeacherListMixin:
+    """Løser en ;-separeret liste af lærernavne i kolonnen `teachers_column`."""
+
+    teachers_column = None
+
+    def load_staff(self):
+        self.staff = unique_lookup(Staff.objects.order_by().values_list("name", "pk"))
+
+    def resolve_teachers(self, instance, row):
+        names = str(row.get(self.teachers_column) or "").split(";")
+        instance._teacher_ids = [
+            self.lookup(self.staff, name, "Ansat") for name in names if name.strip()
+        ]
+
+    def write_teachers(self, instances, through, column):
+        through.objects.bulk_create(
+            [
+                through(**{column: instance.pk, "staff_id": staff_id})
+                for instance in instances
+                for staff_id in instance._teacher_ids
+            ],
+            ignore_conflicts=True,
+        )
+
+
+class SchoolClassImporter(TeacherListMixin, BaseImporter):
+    """Kolonner: name, team, class_group, age_number, class_teachers (;-separeret)."""
+
+    model = SchoolClass
+    form_class = SchoolClassForm
+    form_fields = ("name", "class_group", "age_number")
+    teachers_column = "class_teachers"
+
+    def load_lookups(self):
+        self.teams = unique_lookup(Team.objects.order_by().values_list("name", "pk"))
+        self.load_staff()
+
+    def existing_keys(self):
+        return set(SchoolClass.objects.order_by().values_list("name", "team_id"))
+
+    def key(self, instance):
+        return (instance.name, instance.team_id)
+
+    def resolve(self, instance, row):
+        instance.team_id = self.lookup(self.teams, row.get("team"), "Team")
+        # bulk_create kalder ikke SchoolClass.save()
+        instance.class_number = SchoolClass.parse_class_number(instance.name)
+        self.resolve_teachers(instance, row)
+
+    def write(self, instances):
+        SchoolClass.objects.bulk_create(instances)
+        self.write_teachers(
+            instances, SchoolClass.class_teachers.through, "schoolclass_id"
+        )
+
+    def after_write(self, instances):
+        class_ids = {schoolclass.pk for schoolclass in instances}
+        refresh_class_summaries(class_ids)
+        transaction.on_commit(partial(fragments.changed, class_ids=class_ids))
+        bump_version_on_commit(NAVBAR_VERSION)
+        search.index_objects(SchoolClass, [schoolclass.pk for schoolclass in instances])
+
+
+class LessonImporter(SchoolClassLookupMixin, TeacherListMixin, BaseImporter):
+    """Kolonner: schoolclass, team (valgfri), subject, classroom, teachers (;-separeret)."""
+
+    model = Lesson
+    form_class = LessonForm
+    form_fields = ("subject", "classroom")
+    teachers_column = "teachers"
+
+    def load_lookups(self):
+        self.load_schoolclasses()
+        self.load_staff()
+
+    # Hver lektion er én ugentlig time, så ens rækker er almindelige
+    repeated_keys = True
+
+    def existing_keys(self):
+        return Counter(
+            Lesson.objects.order_by().values_list(
+                "schoolclass_id", "subject", "classroom"
+            )
+        )
+
+    def key(self, instance):
+        return (instance.schoolclass_id, instance.subject, instance.classroom)
+
+    def resolve(self, instance, row):
+        instance.schoolclass_id = self.resolve_schoolclass(row)
+        self.resolve_teachers(instance, row)
+
+    def write(self, instances):
+        Lesson.objects.bulk_create(instances)
+        self.write_teachers(instances, Lesson.teachers.through, "lesson_id")
+
+    def after_write(self, instances):
+        # Lærerne er skrevet med bulk_create, så m2m-signalerne er ikke sendt
+        refresh_lesson_costs(pk__in=[lesson.pk for lesson in instances])
+        class_ids = {lesson.schoolclass_id for lesson in instances}
+        refresh_class_summaries(class_ids)
+        transaction.on_commit(partial(fragments.changed, class_ids=class_ids))
+        search.index_objects(Lesson, [lesson.pk for lesson in instances])
+
+
+IMPORTERS = {
+    "students": StudentImporter,
+    "staff": StaffImporter,
+    "schoolclasses": SchoolClassImporter,
+    "lessons": LessonImporter,
+}
@@ -0,0 +1,85 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from skole import benchmark
+from skole.synthetic import Scale, generate
+
+
+class Command(BaseCommand):
+    help = (
+        "Mål antal forespørgsler, SQL-tid og samlet tid for alle sider ved flere "
+        "datamængder. Kører mod en midlertidig testdatabase."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scales",
+            default="1,3",
+            help="Kommasepareret liste af faktorer på standardskalaen (standard: 1,3).",
+        )
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help=f"Gem målingerne som ny baseline i {benchmark.BASELINE_PATH}.",
+        )
+
+    def handle(self, *args, scales, save_baseline, **options):
+        try:
+            factors = [int(factor) for factor in scales.split(",")]
+        except ValueError:
+            raise CommandError("--scales skal være heltal adskilt af komma")
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = {}
+            for factor in factors:
+                call_command("flush", interactive=False, verbosity=0)
+                data = generate(Scale().scaled(factor))
+                results[f"x{factor}"] = benchmark.run(data)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.report(results)
+        if save_baseline:
+            benchmark.save_baseline(results)
+            self.stdout.write(self.style.SUCCESS("Baseline gemt."))
+            return
+
+        problems = []
+        measurements = list(results.values())
+        for small, large in zip(measurements, measurements[1:]):
+            for key, before, after in benchmark.growing_routes(small, large):
+                problems.append(
+                    f"{key}: {before} -> {after} forespørgsler ved mere data"
+                )
+        for scale, key, before, after in benchmark.regressions(
+            results, benchmark.load_baseline()
+        ):
+            problems.append(f"{key} ({scale}): {before} -> {after} siden baseline")
+        for scale, measurements in results.items():
+            for key, measurement in measurements.items():
+                if measurement.status >= 400:
+                    problems.append(f"{key} ({scale}): status {measurement.status}")
+        if problems:
+            raise CommandError("\n".join(problems))
+        self.stdout.write(self.style.SUCCESS("Ingen regressioner."))
+
+    def report(self, results):
+        scales = list(results)
+        keys = list(results[scales[0]])
+        width = max(len(key) for key in keys)
+        header = "".join(f"{scale:>28}" for scale in scales)
+        self.stdout.write(f"{'Rute':<{width}}{header}")
+        self.stdout.write(
+            f"{'':<{width}}" + "  foresp.   sql ms  i alt ms" * len(scales)
+        )
+        for key in keys:
+            columns = "".join(
+                f"{m.queries:>9}{m.sql_ms:>9.1f}{m.total_ms:>10.1f}"
+                for m in (results[scale][key] for scale in scales)
+            )
+            self.stdout.write(f"{key:<{width}}{columns}")
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from skole.importers import ERROR, IMPORTERS, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Importér elever, ansatte, klasser eller lektioner fra en CSV- eller XLSX-fil."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(IMPORTERS))
+        parser.add_argument("path")
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Valider og vis hvilke rækker der ville blive oprettet, uden at gemme.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, kind, path, dry_run, chunk_size, **options):
+        importer = IMPORTERS[kind](dry_run=dry_run, chunk_size=chunk_size)
+        try:
+            with open(path, "rb") as file:
+                report = importer.run(read_rows(file, path))
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+
+        for line, status, label in report.rows:
+            if status == ERROR:
+                self.stderr.write(f"Linje {line}: {label}")
+            elif options["verbosity"] > 1:
+                self.stdout.write(f"Linje {line}: [{status}] {label}")
+
+        prefix = "Tørkørsel: ville oprette" if dry_run else "Oprettede"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{prefix} {report.created} rækker, "
+                f"{report.existing} fandtes i forvejen, {len(report.errors)} fejl."
+            )
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from skole.search import rebuild
+
+
+class Command(BaseCommand):
+    help = "Genopbyg søgeindekset for elever, ansatte, klasser, teams og lektioner."
+
+    def handle(self, *args, **options):
+        count = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Indekserede {count} objekter."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from skole.budget import refresh_class_summaries
+
+
+class Command(BaseCommand):
+    help = "Genberegn klassebudgetterne (ClassBudgetSummary) for alle klasser."
+
+    def handle(self, *args, **options):
+        count = refresh_class_summaries()
+        self.stdout.write(self.style.SUCCESS(f"Opdaterede {count} klassebudgetter."))
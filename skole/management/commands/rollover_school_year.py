@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from skole.models import School, SchoolYear
+from skole.rollover import FINAL_CLASS_NUMBER, PROMOTE, rollover
+
+
+class Command(BaseCommand):
+    help = (
+        "Ryk alle klasser og elever et klassetrin op til et nyt skoleår og "
+        "arkivér afgangsklasserne."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--school",
+            type=int,
+            help="Kun skolen med dette id (standard: alle skoler).",
+        )
+        parser.add_argument(
+            "--school-year",
+            help=(
+                "Navnet på det nye skoleår, fx 2026/27. Skoler, der allerede er "
+                "rykket op til det, springes over."
+            ),
+        )
+        parser.add_argument(
+            "--final-class-number",
+            type=int,
+            default=FINAL_CLASS_NUMBER,
+            help=(
+                "Klassetrinnet, hvor klasserne går ud og arkiveres "
+                f"(standard: {FINAL_CLASS_NUMBER})."
+            ),
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Vis hvad der ville ske med hver klasse, uden at gemme.",
+        )
+
+    def handle(
+        self, *args, school, school_year, final_class_number, dry_run, **options
+    ):
+        schools = None
+        if school is not None:
+            schools = School.objects.filter(pk=school)
+            if not schools.exists():
+                raise CommandError(f"Skolen {school} findes ikke")
+        if school_year is not None:
+            try:
+                school_year = SchoolYear.objects.get(name=school_year)
+            except SchoolYear.DoesNotExist:
+                raise CommandError(f"Skoleåret {school_year} findes ikke")
+
+        report = rollover(
+            schools,
+            final_class_number=final_class_number,
+            dry_run=dry_run,
+            school_year=school_year,
+        )
+        for refused in report.refused:
+            self.stdout.write(
+                self.style.WARNING(f"{refused} er allerede rykket op til {school_year}")
+            )
+        for change in report.changes:
+            if change.action == PROMOTE:
+                self.stdout.write(
+                    f"{change.name} -> {change.new_name} ({change.new_group})"
+                )
+            else:
+                self.stdout.write(f"{change.name}: {change.action}")
+
+        if dry_run:
+            prefix, archived = "Tørkørsel: ville rykke", "ville arkivere"
+        else:
+            prefix, archived = "Rykkede", "arkiverede"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{prefix} {len(report.promoted)} klasser og {report.students} "
+                f"elever op, {archived} {len(report.archived)} klasser, "
+                f"{len(report.skipped)} sprunget over."
+            )
+        )
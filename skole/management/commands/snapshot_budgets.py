@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from skole.models import School, SchoolYear
+from skole.snapshots import take_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Gem et øjebliksbillede af budgettet, taksterne og lektionspriserne for "
+        "hver skole i et skoleår."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("school_year", help='Skoleårets navn, fx "2025/26".')
+        parser.add_argument(
+            "--school",
+            type=int,
+            help="Kun skolen med dette id (standard: alle skoler).",
+        )
+
+    def handle(self, *args, school_year, school, **options):
+        try:
+            year = SchoolYear.objects.get(name=school_year)
+        except SchoolYear.DoesNotExist:
+            raise CommandError(f"Skoleåret {school_year!r} findes ikke")
+
+        schools = School.objects.all()
+        if school is not None:
+            schools = schools.filter(pk=school)
+            if not schools.exists():
+                raise CommandError(f"Skolen {school} findes ikke")
+
+        for obj in schools:
+            take_snapshot(obj, year)
+            self.stdout.write(f"{obj.name}: øjebliksbillede for {year} gemt.")
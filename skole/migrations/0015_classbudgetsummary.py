@@ -0,0 +1,73 @@
+# Generated by Django 5.0.6 on 2026-10-18 07:56
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("skole", "0014_alter_lesson_options_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ClassBudgetSummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("num_students", models.IntegerField(default=0)),
+                (
+                    "school_fee",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                ("num_lessons", models.IntegerField(default=0)),
+                (
+                    "hours_by_category",
+                    models.JSONField(
+                        default=dict,
+                        encoder=django.core.serializers.json.DjangoJSONEncoder,
+                    ),
+                ),
+                (
+                    "cost_by_category",
+                    models.JSONField(
+                        default=dict,
+                        encoder=django.core.serializers.json.DjangoJSONEncoder,
+                    ),
+                ),
+                (
+                    "cost",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                (
+                    "surplus",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                (
+                    "percentage_used",
+                    models.DecimalField(decimal_places=1, default=0, max_digits=7),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "schoolclass",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="budget_summary",
+                        to="skole.schoolclass",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Klassebudget",
+                "verbose_name_plural": "Klassebudgetter",
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0.6 on 2026-10-18 07:59
+
+import re
+
+from django.db import migrations, models
+
+
+def backfill_class_number(apps, schema_editor):
+    SchoolClass = apps.get_model("skole", "SchoolClass")
+    schoolclasses = list(SchoolClass.objects.only("pk", "name"))
+    for schoolclass in schoolclasses:
+        match = re.match(r"\d+", schoolclass.name or "")
+        schoolclass.class_number = int(match.group(0)) if match else 0
+    SchoolClass.objects.bulk_update(schoolclasses, ["class_number"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("skole", "0015_classbudgetsummary"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="schoolclass",
+            options={
+                "ordering": ["team__department__name", "class_number", "name"],
+                "verbose_name": "Skoleklasse",
+                "verbose_name_plural": "Skoleklasser",
+            },
+        ),
+        migrations.AddField(
+            model_name="schoolclass",
+            name="class_number",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="schoolclass",
+            index=models.Index(
+                fields=["team", "class_number", "name"],
+                name="schoolclass_team_number_idx",
+            ),
+        ),
+        migrations.RunPython(backfill_class_number, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("skole", "0016_schoolclass_class_number"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="lesson",
+            index=models.Index(
+                fields=["schoolclass", "subject", "classroom"],
+                name="lesson_class_subject_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="lesson",
+            index=models.Index(fields=["subject"], name="lesson_subject_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="lesson",
+            index=models.Index(fields=["classroom"], name="lesson_classroom_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="schoolfee",
+            index=models.Index(fields=["level"], name="schoolfee_level_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="staff",
+            index=models.Index(fields=["name"], name="staff_name_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="staff",
+            index=models.Index(fields=["employment_grade"], name="staff_grade_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="student",
+            index=models.Index(fields=["name"], name="student_name_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="student",
+            index=models.Index(
+                fields=["schoolclass", "name"], name="student_class_name_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="student",
+            index=models.Index(fields=["date_of_birth"], name="student_birth_idx"),
+        ),
+    ]
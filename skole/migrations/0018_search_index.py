@@ -0,0 +1,82 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("skole", "0017_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("kind", models.CharField(max_length=20)),
+                ("object_id", models.IntegerField()),
+                ("label", models.CharField(max_length=200)),
+                ("context", models.CharField(blank=True, max_length=200)),
+                ("url", models.CharField(max_length=200)),
+            ],
+            options={
+                "verbose_name": "Søgeindgang",
+                "verbose_name_plural": "Søgeindgange",
+            },
+        ),
+        migrations.CreateModel(
+            name="SearchToken",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("kind", models.CharField(max_length=20)),
+                ("token", models.CharField(max_length=100)),
+            ],
+            options={
+                "verbose_name": "Søgeord",
+                "verbose_name_plural": "Søgeord",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="searchentry",
+            constraint=models.UniqueConstraint(
+                fields=("kind", "object_id"), name="searchentry_kind_object_unique"
+            ),
+        ),
+        migrations.AddField(
+            model_name="searchtoken",
+            name="entry",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="tokens",
+                to="skole.searchentry",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="searchtoken",
+            index=models.Index(
+                fields=["kind", "token", "entry"], name="searchtoken_kind_token_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="searchtoken",
+            index=models.Index(fields=["entry", "token"], name="searchtoken_entry_idx"),
+        ),
+    ]
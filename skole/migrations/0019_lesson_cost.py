@@ -0,0 +1,52 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:21
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_lesson_cost(apps, schema_editor):
+    Lesson = apps.get_model("skole", "Lesson")
+    teachings = (
+        Lesson.teachers.through.objects.filter(lesson_id=OuterRef("pk"))
+        .values("lesson_id")
+        .order_by()
+    )
+    Lesson.objects.update(
+        cost=Coalesce(
+            Subquery(
+                teachings.annotate(
+                    cost=Sum("staff__employment_category__price_pr_lesson")
+                ).values("cost")
+            ),
+            Value(Decimal(0)),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        ),
+        teacher_count=Coalesce(
+            Subquery(teachings.annotate(count=Count("id")).values("count")), 0
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("skole", "0018_search_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="lesson",
+            name="cost",
+            field=models.DecimalField(
+                decimal_places=2, default=0, editable=False, max_digits=12
+            ),
+        ),
+        migrations.AddField(
+            model_name="lesson",
+            name="teacher_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_lesson_cost, migrations.RunPython.noop),
+    ]
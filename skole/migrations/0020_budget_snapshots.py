@@ -0,0 +1,84 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:53
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("skole", "0019_lesson_cost"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SchoolYear",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=20, unique=True)),
+                ("start_date", models.DateField()),
+                ("end_date", models.DateField()),
+            ],
+            options={
+                "verbose_name": "Skoleår",
+                "verbose_name_plural": "Skoleår",
+                "ordering": ["-start_date"],
+            },
+        ),
+        migrations.CreateModel(
+            name="BudgetSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "data",
+                    models.JSONField(
+                        encoder=django.core.serializers.json.DjangoJSONEncoder
+                    ),
+                ),
+                (
+                    "school",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="budget_snapshots",
+                        to="skole.school",
+                    ),
+                ),
+                (
+                    "school_year",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="budget_snapshots",
+                        to="skole.schoolyear",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Budget-øjebliksbillede",
+                "verbose_name_plural": "Budget-øjebliksbilleder",
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["school", "school_year", "-created_at"],
+                        name="snapshot_school_year_idx",
+                    )
+                ],
+            },
+        ),
+    ]
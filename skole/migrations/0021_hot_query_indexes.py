@@ -0,0 +1,32 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("skole", "0020_budget_snapshots"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="staff",
+            index=models.Index(
+                fields=["employment_category", "name"], name="staff_category_name_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="student",
+            index=models.Index(
+                fields=["schoolclass", "school_fee"], name="student_class_fee_idx"
+            ),
+        ),
+        # Den automatiske lærertabel har kun (lesson_id, staff_id) samlet; en
+        # ansats lektioner (arbejdsbyrde, omkostningssignaler) slås op fra
+        # staff_id og kan med dette indeks læses uden at røre tabellen.
+        migrations.RunSQL(
+            "CREATE INDEX lesson_teachers_staff_lesson_idx "
+            "ON skole_lesson_teachers (staff_id, lesson_id)",
+            "DROP INDEX lesson_teachers_staff_lesson_idx",
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("skole", "0021_hot_query_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="schoolclass",
+            name="archived",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.0.6 on 2026-10-18 10:05
+
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, F, Sum
+
+
+def backfill_class_budget_summaries(apps, schema_editor):
+    SchoolClass = apps.get_model("skole", "SchoolClass")
+    Student = apps.get_model("skole", "Student")
+    Lesson = apps.get_model("skole", "Lesson")
+    ClassBudgetSummary = apps.get_model("skole", "ClassBudgetSummary")
+
+    # Samme tal som skole.budget.class_figures, men med de historiske modeller
+    figures = {
+        pk: {
+            "num_students": 0,
+            "school_fee": Decimal(0),
+            "num_lessons": 0,
+            "cost": Decimal(0),
+            "hours_by_category": {},
+            "cost_by_category": {},
+        }
+        for pk in SchoolClass.objects.filter(archived=False).values_list(
+            "pk", flat=True
+        )
+    }
+    for row in (
+        Student.objects.filter(schoolclass__archived=False)
+        .values("schoolclass_id")
+        .annotate(num_students=Count("id"), school_fee=Sum("school_fee__amount"))
+        .order_by()
+    ):
+        entry = figures[row["schoolclass_id"]]
+        entry["num_students"] = row["num_students"]
+        entry["school_fee"] = row["school_fee"] or Decimal(0)
+    for row in (
+        Lesson.objects.filter(schoolclass__archived=False)
+        .values("schoolclass_id")
+        .annotate(num_lessons=Count("id"), cost=Sum("cost"))
+        .order_by()
+    ):
+        entry = figures[row["schoolclass_id"]]
+        entry["num_lessons"] = row["num_lessons"]
+        entry["cost"] = row["cost"] or Decimal(0)
+    for row in (
+        Lesson.teachers.through.objects.filter(lesson__schoolclass__archived=False)
+        .values(
+            schoolclass_id=F("lesson__schoolclass_id"),
+            category=F("staff__employment_category__name"),
+        )
+        .annotate(
+            hours=Count("id"),
+            cost=Sum("staff__employment_category__price_pr_lesson"),
+        )
+        .order_by()
+    ):
+        entry = figures[row["schoolclass_id"]]
+        entry["hours_by_category"][row["category"]] = row["hours"]
+        entry["cost_by_category"][row["category"]] = row["cost"]
+
+    ClassBudgetSummary.objects.all().delete()
+    ClassBudgetSummary.objects.bulk_create(
+        [
+            ClassBudgetSummary(
+                schoolclass_id=pk,
+                num_students=entry["num_students"],
+                school_fee=entry["school_fee"],
+                num_lessons=entry["num_lessons"],
+                hours_by_category=entry["hours_by_category"],
+                cost_by_category=entry["cost_by_category"],
+                cost=entry["cost"],
+                surplus=entry["school_fee"] - entry["cost"],
+                percentage_used=(
+                    round(entry["cost"] / entry["school_fee"] * 100, 1)
+                    if entry["school_fee"] > 0
+                    else 0
+                ),
+            )
+            for pk, entry in figures.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("skole", "0022_schoolclass_archived"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            backfill_class_budget_summaries, migrations.RunPython.noop
+        ),
+    ]
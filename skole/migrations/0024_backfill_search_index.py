@@ -0,0 +1,106 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:40
+
+import re
+from itertools import islice
+from urllib.parse import urlencode
+
+from django.db import migrations
+
+CHUNK_SIZE = 1000
+
+# En kopi af kilderne i skole.search, som de så ud, da migrationen blev
+# skrevet, så migrationen ikke ændrer sig med dem: (model, tekst, etiket,
+# kontekst, link, select_related) pr. slags
+SOURCES = {
+    "student": (
+        "Student",
+        lambda student: student.name,
+        lambda student: student.name,
+        lambda student: student.schoolclass.name,
+        lambda student: f"/student/{student.pk}/",
+        ("schoolclass",),
+    ),
+    "staff": (
+        "Staff",
+        lambda staff: staff.name,
+        lambda staff: staff.name,
+        lambda staff: staff.employment_category.name,
+        lambda staff: f"/staff/?{urlencode({'name': staff.name})}",
+        ("employment_category",),
+    ),
+    "schoolclass": (
+        "SchoolClass",
+        lambda schoolclass: schoolclass.name,
+        lambda schoolclass: schoolclass.name,
+        lambda schoolclass: schoolclass.team.name,
+        lambda schoolclass: f"/schoolclass/{schoolclass.pk}/",
+        ("team",),
+    ),
+    "team": (
+        "Team",
+        lambda team: team.name,
+        lambda team: team.name,
+        lambda team: team.department.name,
+        lambda team: f"/team/{team.pk}/",
+        ("department",),
+    ),
+    "lesson": (
+        "Lesson",
+        lambda lesson: f"{lesson.subject} {lesson.classroom}",
+        lambda lesson: f"{lesson.subject}, {lesson.classroom}",
+        lambda lesson: lesson.schoolclass.name,
+        lambda lesson: f"/schoolclass/{lesson.schoolclass_id}/",
+        ("schoolclass",),
+    ),
+}
+
+
+def tokenize(text):
+    return re.findall(r"\w+", (text or "").casefold())
+
+
+def build_search_index(apps, schema_editor):
+    SearchEntry = apps.get_model("skole", "SearchEntry")
+    SearchToken = apps.get_model("skole", "SearchToken")
+
+    SearchToken.objects.all().delete()
+    SearchEntry.objects.all().delete()
+    for kind, (model_name, text, label, context, url, related) in SOURCES.items():
+        objects = (
+            apps.get_model("skole", model_name)
+            .objects.select_related(*related)
+            .order_by("pk")
+        )
+        if model_name == "SchoolClass":
+            objects = objects.filter(archived=False)
+        iterator = objects.iterator(chunk_size=CHUNK_SIZE)
+        while chunk := list(islice(iterator, CHUNK_SIZE)):
+            entries = SearchEntry.objects.bulk_create(
+                [
+                    SearchEntry(
+                        kind=kind,
+                        object_id=obj.pk,
+                        label=label(obj)[:200],
+                        context=context(obj)[:200],
+                        url=url(obj),
+                    )
+                    for obj in chunk
+                ]
+            )
+            SearchToken.objects.bulk_create(
+                [
+                    SearchToken(entry=entry, kind=kind, token=token[:100])
+                    for entry, obj in zip(entries, chunk)
+                    for token in set(tokenize(text(obj)))
+                ]
+            )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("skole", "0023_backfill_class_budget_summaries"),
+    ]
+
+    operations = [
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("skole", "0024_backfill_search_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="school",
+            name="school_year",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="schools",
+                to="skole.schoolyear",
+                verbose_name="Skoleår",
+            ),
+        ),
+    ]
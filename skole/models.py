@@ -2,6 +2,7 @@ import re
 from collections import defaultdict
 from datetime import datetime
 
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils.timesince import timesince
 
@@ -10,6 +11,16 @@ from .managers import SchoolClassManager
 
 class School(models.Model):
     name = models.CharField(max_length=100)
+    # Skoleåret, klasserne senest er rykket op til (se skole.rollover)
+    school_year = models.ForeignKey(
+        "SchoolYear",
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="schools",
+        verbose_name="Skoleår",
+    )
 
     def __str__(self):
         return self.name
@@ -79,12 +90,48 @@ class Staff(models.Model):
         """
         Beregn det samlede antal lektioner, alle medarbejdere i denne kategori har undervist i en bestemt klasse.
         """
-        return cls.objects.filter(taught_lessons__schoolclass=schoolclass).count()
+        return cls.total_lessons_taught_in_classes([schoolclass]).get(
+            getattr(schoolclass, "pk", schoolclass), 0
+        )
+
+    @classmethod
+    def total_lessons_taught_in_classes(cls, schoolclasses):
+        """Som total_lessons_taught_in_class for mange klasser: {klasse-id: antal}."""
+        rows = (
+            cls.taught_lessons.through.objects.filter(
+                lesson__schoolclass__in=schoolclasses
+            )
+            .values("lesson__schoolclass")
+            .annotate(count=models.Count("pk"))
+            .order_by()
+        )
+        return {row["lesson__schoolclass"]: row["count"] for row in rows}
+
+    @classmethod
+    def lessons_taught_by(cls, staff_members):
+        """Antal lektioner, hver af de ansatte underviser i: {ansat-id: antal}."""
+        rows = (
+            cls.taught_lessons.through.objects.filter(
+                staff__in=staff_members, lesson__schoolclass__archived=False
+            )
+            .values("staff")
+            .annotate(count=models.Count("pk"))
+            .order_by()
+        )
+        return {row["staff"]: row["count"] for row in rows}
 
     class Meta:
         verbose_name = "Ansat"
         verbose_name_plural = "Ansatte"
         ordering = ["name"]
+        indexes = [
+            models.Index(fields=["name"], name="staff_name_idx"),
+            models.Index(fields=["employment_grade"], name="staff_grade_idx"),
+            # Liste filtreret på kategori og sorteret efter navn
+            models.Index(
+                fields=["employment_category", "name"], name="staff_category_name_idx"
+            ),
+        ]
 
 
 from collections import Counter
@@ -112,20 +159,52 @@ class SchoolClass(models.Model):
         max_length=20, choices=AGE_GROUP_CHOICES, default=DEFAULT_AGE_GROUP
     )
     age_number = models.IntegerField(blank=True, null=True)
+    # Klassetrinnet fra starten af navnet ("10A" -> 10), gemt så der kan sorteres
+    # på det med et indeks i stedet for et regex pr. række
+    class_number = models.IntegerField(default=0, editable=False)
+    # Sat af oprykningen (skole.rollover) på afgangsklasser
+    archived = models.BooleanField(default=False, editable=False)
 
     objects = SchoolClassManager()  # Brug den brugerdefinerede manager
+    all_objects = models.Manager()  # Også arkiverede klasser
 
-    def get_class_number(self):
-        match = re.match(r"(\d+)", self.name)
+    @staticmethod
+    def parse_class_number(name):
+        match = re.match(r"\d+", name or "")
         return int(match.group(0)) if match else 0
 
+    def get_class_number(self):
+        return self.class_number
+
+    def save(self, *args, **kwargs):
+        self.class_number = self.parse_class_number(self.name)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "name" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "class_number"}
+        super().save(*args, **kwargs)
+
     def total_lessons_per_category(self):
-        total_lessons_by_category = Counter()
-        for lesson in self.lessons.all():
-            for teacher in lesson.teachers.all():
-                category = teacher.employment_category.name
-                total_lessons_by_category[category] += 1
-        return total_lessons_by_category
+        return SchoolClass.lessons_per_category([self]).get(self.pk, Counter())
+
+    @classmethod
+    def lessons_per_category(cls, schoolclasses):
+        """
+        Lærerlektioner pr. personalekategori for mange klasser med én
+        forespørgsel: {klasse-id: Counter({kategorinavn: antal})}.
+        """
+        rows = (
+            Lesson.teachers.through.objects.filter(
+                lesson__schoolclass__in=schoolclasses
+            )
+            .values("lesson__schoolclass", "staff__employment_category__name")
+            .annotate(count=models.Count("pk"))
+            .order_by()
+        )
+        result = defaultdict(Counter)
+        for row in rows:
+            category = row["staff__employment_category__name"]
+            result[row["lesson__schoolclass"]][category] += row["count"]
+        return dict(result)
 
     def __str__(self):
         return self.name
@@ -133,7 +212,13 @@ class SchoolClass(models.Model):
     class Meta:
         verbose_name = "Skoleklasse"
         verbose_name_plural = "Skoleklasser"
-        ordering = ["team__department__name", "name"]
+        ordering = ["team__department__name", "class_number", "name"]
+        indexes = [
+            models.Index(
+                fields=["team", "class_number", "name"],
+                name="schoolclass_team_number_idx",
+            ),
+        ]
 
 
 class StudentInSchoolManager(models.Manager):
@@ -160,6 +245,12 @@ class Lesson(models.Model):
     subject = models.CharField(max_length=100)  # fag
     classroom = models.CharField(max_length=100)  # lokale
     teachers = models.ManyToManyField(Staff, related_name="taught_lessons")
+    # Summen af lærernes pris pr. lektion og antallet af lærere. Holdes
+    # opdateret af skole.budget.refresh_lesson_costs via signalerne.
+    cost = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, editable=False
+    )
+    teacher_count = models.IntegerField(default=0, editable=False)
 
     def __str__(self):
         teachers_names = ", ".join([teacher.name for teacher in self.teachers.all()])
@@ -169,6 +260,14 @@ class Lesson(models.Model):
         verbose_name = "Lektion"
         verbose_name_plural = "Lektioner"
         ordering = ["schoolclass__name", "subject", "classroom"]
+        indexes = [
+            models.Index(
+                fields=["schoolclass", "subject", "classroom"],
+                name="lesson_class_subject_idx",
+            ),
+            models.Index(fields=["subject"], name="lesson_subject_idx"),
+            models.Index(fields=["classroom"], name="lesson_classroom_idx"),
+        ]
 
 
 class SchoolFee(models.Model):
@@ -184,6 +283,7 @@ class SchoolFee(models.Model):
         verbose_name = "Takst"
         verbose_name_plural = "Takster"
         ordering = ["level", "name"]
+        indexes = [models.Index(fields=["level"], name="schoolfee_level_idx")]
 
 
 class Student(models.Model):
@@ -233,3 +333,146 @@ class Student(models.Model):
         verbose_name = "Elev"
         verbose_name_plural = "Elever"
         ordering = ["name"]
+        indexes = [
+            models.Index(fields=["name"], name="student_name_idx"),
+            models.Index(fields=["schoolclass", "name"], name="student_class_name_idx"),
+            # Takstsummen pr. klasse (budget.class_figures) læses fra indekset
+            models.Index(
+                fields=["schoolclass", "school_fee"], name="student_class_fee_idx"
+            ),
+            models.Index(fields=["date_of_birth"], name="student_birth_idx"),
+        ]
+
+
+class ClassBudgetSummary(models.Model):
+    """
+    Denormaliseret budget pr. klasse, så oversigter over afdelinger og skoler
+    kan læses uden at joine lektioner og lærere. Holdes opdateret af signaler
+    i skole.signals.
+    """
+
+    schoolclass = models.OneToOneField(
+        SchoolClass, on_delete=models.CASCADE, related_name="budget_summary"
+    )
+    num_students = models.IntegerField(default=0)
+    school_fee = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    num_lessons = models.IntegerField(default=0)
+    hours_by_category = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    cost_by_category = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    cost = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    surplus = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    percentage_used = models.DecimalField(max_digits=7, decimal_places=1, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Budget for {self.schoolclass_id}"
+
+    class Meta:
+        verbose_name = "Klassebudget"
+        verbose_name_plural = "Klassebudgetter"
+
+
+class SearchEntry(models.Model):
+    """
+    Et søgbart objekt i søgeindekset (se skole.search). Tekst, kontekst og
+    link gemmes, så et søgeresultat kan vises uden opslag i de egentlige tabeller.
+    """
+
+    kind = models.CharField(max_length=20)
+    object_id = models.IntegerField()
+    label = models.CharField(max_length=200)
+    context = models.CharField(max_length=200, blank=True)
+    url = models.CharField(max_length=200)
+
+    def __str__(self):
+        return f"{self.kind}: {self.label}"
+
+    class Meta:
+        verbose_name = "Søgeindgang"
+        verbose_name_plural = "Søgeindgange"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind", "object_id"], name="searchentry_kind_object_unique"
+            ),
+        ]
+
+
+class SearchToken(models.Model):
+    """
+    Et normaliseret ord fra en SearchEntry. Slagsen gemmes også her, så en
+    præfikssøgning er ét intervalopslag i indekset (kind, token).
+    """
+
+    entry = models.ForeignKey(
+        SearchEntry, on_delete=models.CASCADE, related_name="tokens", db_index=False
+    )
+    kind = models.CharField(max_length=20)
+    token = models.CharField(max_length=100)
+
+    def __str__(self):
+        return self.token
+
+    class Meta:
+        verbose_name = "Søgeord"
+        verbose_name_plural = "Søgeord"
+        indexes = [
+            models.Index(
+                fields=["kind", "token", "entry"], name="searchtoken_kind_token_idx"
+            ),
+            models.Index(fields=["entry", "token"], name="searchtoken_entry_idx"),
+        ]
+
+
+class SchoolYear(models.Model):
+    """Et skoleår eller en anden budgetperiode, fx "2025/26"."""
+
+    name = models.CharField(max_length=20, unique=True)
+    start_date = models.DateField()
+    end_date = models.DateField()
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name = "Skoleår"
+        verbose_name_plural = "Skoleår"
+        ordering = ["-start_date"]
+
+
+class BudgetSnapshot(models.Model):
+    """
+    Frosset budget for én skole i ét skoleår (se skole.snapshots). Klassernes
+    tal, takster og personalekategoriernes priser gemmes som én JSON-klump
+    med en liste pr. kolonne, så en sammenligning kun læser én række pr. år.
+    Øjebliksbilleder ændres aldrig; et nyt tages i stedet.
+    """
+
+    school = models.ForeignKey(
+        School, on_delete=models.CASCADE, related_name="budget_snapshots"
+    )
+    school_year = models.ForeignKey(
+        SchoolYear, on_delete=models.PROTECT, related_name="budget_snapshots"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Et budget-øjebliksbillede kan ikke ændres")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return (
+            f"{self.school_id} {self.school_year_id} {self.created_at:%Y-%m-%d %H:%M}"
+        )
+
+    class Meta:
+        verbose_name = "Budget-øjebliksbillede"
+        verbose_name_plural = "Budget-øjebliksbilleder"
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["school", "school_year", "-created_at"],
+                name="snapshot_school_year_idx",
+            ),
+        ]
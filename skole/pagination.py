@@ -0,0 +1,138 @@
+"""
+Keyset-paginering (seek): næste side hentes med et WHERE på sorteringsnøglen
+fra sidste række i stedet for OFFSET, så hver side koster det samme, uanset hvor
+langt man er nået, og der ikke er brug for en COUNT over hele tabellen.
+
+Sorteringen er querysettets (eller modellens Meta.ordering) med pk til sidst,
+så nøglen er entydig. Der kan også sorteres på annoteringer; et filter på et
+aggregat bliver til HAVING. Nøglen fra sidste række sendes til klienten som en
+signeret markør.
+"""
+
+from dataclasses import dataclass
+from functools import reduce
+from operator import and_, or_
+
+from django.core import signing
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+
+SALT = "skole.pagination"
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class KeysetPage:
+    object_list: list
+    cursor: str | None  # markør til næste side, None på sidste side
+
+    @property
+    def has_next(self):
+        return self.cursor is not None
+
+
+def _field(model, path):
+    field = None
+    for name in path.split("__"):
+        field = model._meta.pk if name == "pk" else model._meta.get_field(name)
+        model = field.related_model
+    return field
+
+
+def ordering_keys(queryset):
+    """Sorteringen som [(felt, faldende, kan_være_null)] med pk til sidst."""
+    ordering = queryset.query.order_by or queryset.model._meta.ordering
+    keys = []
+    for item in ordering:
+        if not isinstance(item, str):
+            raise ValueError(
+                "Keyset-paginering understøtter kun feltnavne i sorteringen"
+            )
+        path = item.lstrip("-")
+        if path in ("pk", "id"):
+            continue
+        # Annoteringer (fx aggregater) behandles som felter, der kan være NULL
+        null = path in queryset.query.annotations or _field(queryset.model, path).null
+        keys.append((path, item.startswith("-"), null))
+    keys.append(("pk", False, False))
+    return keys
+
+
+def _order_by(keys):
+    # NULL sorteres eksplicit først (stigende) / sidst (faldende), så filteret
+    # nedenfor giver samme resultat på alle databaser
+    return [
+        (
+            (F(path).desc(nulls_last=True) if desc else F(path).asc(nulls_first=True))
+            if null
+            else f"-{path}" if desc else path
+        )
+        for path, desc, null in keys
+    ]
+
+
+def _after(path, desc, value):
+    if value is None:
+        # NULL står først i stigende og sidst i faldende rækkefølge
+        return Q(**{f"{path}__isnull": False}) if not desc else Q(pk__in=[])
+    if desc:
+        return Q(**{f"{path}__lt": value}) | Q(**{f"{path}__isnull": True})
+    return Q(**{f"{path}__gt": value})
+
+
+def _equal(path, value):
+    if value is None:
+        return Q(**{f"{path}__isnull": True})
+    return Q(**{path: value})
+
+
+def seek(queryset, keys, values):
+    """Filtrér til rækkerne, der kommer efter `values` i sorteringen `keys`."""
+    conditions = []
+    for i, ((path, desc, _), value) in enumerate(zip(keys, values)):
+        before = [_equal(p, v) for (p, _, _), v in zip(keys[:i], values[:i])]
+        conditions.append(reduce(and_, before, _after(path, desc, value)))
+    return queryset.filter(reduce(or_, conditions))
+
+
+def encode_cursor(values):
+    return signing.dumps(values, salt=SALT, compress=True, serializer=_Serializer)
+
+
+def decode_cursor(cursor):
+    try:
+        return signing.loads(cursor, salt=SALT, serializer=_Serializer)
+    except signing.BadSignature:
+        raise InvalidCursor(cursor)
+
+
+class _Serializer(signing.JSONSerializer):
+    # Sorteringsnøgler kan være decimaltal og datoer
+    def dumps(self, obj):
+        return DjangoJSONEncoder(separators=(",", ":")).encode(obj).encode("latin-1")
+
+
+def paginate(queryset, cursor=None, page_size=50):
+    """Hent siden efter `cursor` (eller første side) som en KeysetPage."""
+    keys = ordering_keys(queryset)
+    queryset = queryset.annotate(
+        **{f"keyset_{i}": F(path) for i, (path, _, _) in enumerate(keys)}
+    ).order_by(*_order_by(keys))
+    if cursor:
+        values = decode_cursor(cursor)
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise InvalidCursor(cursor)
+        queryset = seek(queryset, keys, values)
+
+    object_list = list(queryset[: page_size + 1])
+    next_cursor = None
+    if len(object_list) > page_size:
+        object_list = object_list[:page_size]
+        last = object_list[-1]
+        next_cursor = encode_cursor(
+            [getattr(last, f"keyset_{i}") for i in range(len(keys))]
+        )
+    return KeysetPage(object_list, next_cursor)
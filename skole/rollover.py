@@ -0,0 +1,206 @@
+"""
+Oprykning til et nyt skoleår.
+
+Alle klasser rykker et klassetrin op: "3A" bliver til "4A", class_number og
+age_number tælles op, og class_group skifter ved overgangene mellem
+indskoling, mellemtrin og udskoling. Elevernes age_number tælles op, og
+afgangsklasserne (klassetrin FINAL_CLASS_NUMBER og derover) arkiveres i
+stedet, så de ikke længere vises.
+
+Oprykningen er tre UPDATE-sætninger (elever, afgangsklasser, klasser) i én
+transaktion, og det nye navn og den nye gruppe beregnes i databasen. Klasser,
+hvis navn ikke starter med klassetrinnet (fx "Modtageklassen"), kan ikke
+omdøbes og springes over. En tørkørsel henter de samme udtryk med én SELECT
+og viser, hvad der ville ske, uden at skrive noget. Da update() springer
+save() og signalerne over, opdateres budgetoversigterne, søgeindekset, de
+cachede fragmenter og navigationen til sidst.
+
+Gives et skoleår, gemmes det på skolerne (School.school_year), og skoler, der
+allerede er rykket op til det skoleår, springes over, så samme oprykning ikke
+kan køres to gange.
+"""
+
+from dataclasses import dataclass, field
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Case, CharField, F, Value, When
+from django.db.models.functions import Cast, Concat, Length, Substr
+
+from . import fragments, search
+from .cache import bump_version_on_commit
+from .context_processors import NAVBAR_VERSION
+from .models import ClassBudgetSummary, School, SchoolClass, Student
+
+# Sidste klassetrin i folkeskolen; klasser på dette trin (eller derover) går ud
+FINAL_CLASS_NUMBER = 9
+# Sidste klassetrin i hver gruppe; trinnene derover er udskoling
+LAST_CLASS_NUMBER = ((3, SchoolClass.IND), (6, SchoolClass.MEL))
+
+PROMOTE = "rykkes op"
+ARCHIVE = "arkiveres"
+SKIP = "springes over"
+
+
+@dataclass(frozen=True)
+class ClassChange:
+    pk: int
+    name: str
+    new_name: str
+    class_group: str
+    new_group: str
+    action: str
+
+
+@dataclass
+class RolloverReport:
+    """Resultatet af en oprykning: ændringen pr. klasse og antal elever."""
+
+    dry_run: bool
+    changes: list = field(default_factory=list)
+    students: int = 0
+    # Skoler, der allerede er rykket op til det givne skoleår
+    refused: list = field(default_factory=list)
+
+    def _ids(self, action):
+        return [change.pk for change in self.changes if change.action == action]
+
+    @property
+    def promoted(self):
+        return self._ids(PROMOTE)
+
+    @property
+    def archived(self):
+        return self._ids(ARCHIVE)
+
+    @property
+    def skipped(self):
+        return [change for change in self.changes if change.action == SKIP]
+
+
+def _class_number_text():
+    return Cast("class_number", CharField())
+
+
+def _new_name():
+    """Navnet med klassetrinnet udskiftet: "3A" -> "4A", "9 x" -> "10 x"."""
+    return Concat(
+        Cast(F("class_number") + 1, CharField()),
+        Substr("name", Length(_class_number_text()) + 1),
+        output_field=CharField(),
+    )
+
+
+def _new_group():
+    # Udtrykkene i en UPDATE ser de gamle værdier, så der sammenlignes med det
+    # gamle klassetrin
+    return Case(
+        *(
+            When(class_number__lt=last, then=Value(group))
+            for last, group in LAST_CLASS_NUMBER
+        ),
+        default=Value(SchoolClass.UDS),
+        output_field=CharField(),
+    )
+
+
+def _to_promote(schoolclasses, final_class_number):
+    return schoolclasses.filter(
+        class_number__lt=final_class_number, name__startswith=_class_number_text()
+    )
+
+
+def _action(final_class_number):
+    return Case(
+        When(class_number__gte=final_class_number, then=Value(ARCHIVE)),
+        When(name__startswith=_class_number_text(), then=Value(PROMOTE)),
+        default=Value(SKIP),
+        output_field=CharField(),
+    )
+
+
+def preview(schoolclasses, final_class_number=FINAL_CLASS_NUMBER):
+    """Ændringen for hver af klasserne i `schoolclasses`, hentet med én SELECT."""
+    rows = schoolclasses.annotate(
+        new_name=_new_name(),
+        new_group=_new_group(),
+        action=_action(final_class_number),
+    ).values_list(
+        "pk", "name", "new_name", "class_group", "new_group", "action", named=True
+    )
+    return [
+        ClassChange(
+            pk=row.pk,
+            name=row.name,
+            new_name=row.new_name if row.action == PROMOTE else row.name,
+            class_group=row.class_group,
+            new_group=row.new_group if row.action == PROMOTE else row.class_group,
+            action=row.action,
+        )
+        for row in rows
+    ]
+
+
+def rollover(
+    schools=None, final_class_number=FINAL_CLASS_NUMBER, dry_run=False, school_year=None
+):
+    """
+    Ryk klasserne på skolerne (alle skoler, hvis `schools` er None) et
+    klassetrin op til `school_year`. Returnerer en RolloverReport.
+    """
+    schoolclasses = SchoolClass.objects.all()
+    if schools is not None:
+        schoolclasses = schoolclasses.filter(team__department__school__in=schools)
+
+    with transaction.atomic():
+        refused = []
+        if school_year is not None:
+            selected = School.objects.select_for_update()
+            if schools is not None:
+                selected = selected.filter(pk__in=schools)
+            refused = list(selected.filter(school_year=school_year))
+            schoolclasses = schoolclasses.exclude(
+                team__department__school__in=[school.pk for school in refused]
+            )
+        report = RolloverReport(
+            dry_run=dry_run,
+            changes=preview(schoolclasses, final_class_number),
+            refused=refused,
+        )
+        to_promote = _to_promote(schoolclasses, final_class_number)
+        students = Student.objects.filter(schoolclass__in=to_promote)
+        if dry_run:
+            report.students = students.count()
+            return report
+
+        if school_year is not None:
+            selected.exclude(school_year=school_year).update(school_year=school_year)
+        # Rækkefølgen betyder noget: efter oprykningen ville en 8. klasse
+        # være en afgangsklasse, og eleverne findes ud fra klassernes gamle trin
+        report.students = students.update(age_number=F("age_number") + 1)
+        schoolclasses.filter(class_number__gte=final_class_number).update(archived=True)
+        to_promote.update(
+            name=_new_name(),
+            class_number=F("class_number") + 1,
+            age_number=F("age_number") + 1,
+            class_group=_new_group(),
+        )
+
+        promoted, archived = report.promoted, report.archived
+        # Arkiverede klasser indgår ikke længere i budgetterne eller søgningen
+        ClassBudgetSummary.objects.filter(schoolclass__in=archived).delete()
+        search.remove_objects(SchoolClass, archived)
+        search.index_objects(SchoolClass, promoted)
+        search.refresh_class_context(promoted)
+        # De arkiverede klasser findes ikke længere for fragments.changed, så
+        # deres teams gives direkte
+        team_ids = set(
+            SchoolClass.all_objects.filter(pk__in=archived).values_list(
+                "team_id", flat=True
+            )
+        )
+        transaction.on_commit(
+            partial(fragments.changed, class_ids=promoted, team_ids=team_ids)
+        )
+        bump_version_on_commit(NAVBAR_VERSION)
+    return report
@@ -0,0 +1,282 @@
+"""
+Søgning på tværs af organisationen.
+
+Indekset er to almindelige tabeller: SearchEntry (ét søgbart objekt med tekst,
+kontekst og link) og SearchToken (de normaliserede ord). En præfikssøgning er
+et intervalopslag på indekset (kind, token) (``token >= 'ann' AND token <
+'ann\\uffff'``), som virker ens på SQLite og PostgreSQL. Søgningen styres af
+det længste søgeord, og de øvrige ord tjekkes pr. fundet objekt via indekset
+(entry, token), så den kan stoppe, så snart der er nok resultater. Finder
+søgningen intet, prøves ord fra indekset, der ligner søgeordet (én eller to
+tastefejl), i stedet.
+
+Indekset bygges første gang af migration 0024, holdes opdateret af signalerne
+i skole.signals og kan genopbygges med ``manage.py rebuild_search_index``.
+"""
+
+import re
+from dataclasses import dataclass
+from itertools import islice
+from urllib.parse import urlencode
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q, Subquery
+from django.urls import reverse
+
+from .models import (
+    Lesson,
+    SchoolClass,
+    SearchEntry,
+    SearchToken,
+    Staff,
+    Student,
+    Team,
+)
+
+CHUNK_SIZE = 1000
+# Antal resultater pr. slags objekt
+MAX_RESULTS = 10
+# Antal kandidatord, der hentes til stavekontrollen pr. søgeord
+MAX_CANDIDATES = 2000
+
+
+@dataclass(frozen=True)
+class Source:
+    model: type
+    heading: str
+    text: object  # funktion fra objekt til den søgbare tekst
+    label: object
+    context: object
+    url: object
+    select_related: tuple = ()
+
+
+SOURCES = {
+    "student": Source(
+        Student,
+        "Elever",
+        text=lambda student: student.name,
+        label=lambda student: student.name,
+        context=lambda student: student.schoolclass.name,
+        url=lambda student: reverse("student_detail", args=[student.pk]),
+        select_related=("schoolclass",),
+    ),
+    "staff": Source(
+        Staff,
+        "Ansatte",
+        text=lambda staff: staff.name,
+        label=lambda staff: staff.name,
+        context=lambda staff: staff.employment_category.name,
+        url=lambda staff: f"{reverse('staff_list')}?{urlencode({'name': staff.name})}",
+        select_related=("employment_category",),
+    ),
+    "schoolclass": Source(
+        SchoolClass,
+        "Klasser",
+        text=lambda schoolclass: schoolclass.name,
+        label=lambda schoolclass: schoolclass.name,
+        context=lambda schoolclass: schoolclass.team.name,
+        url=lambda schoolclass: reverse("schoolclass_detail", args=[schoolclass.pk]),
+        select_related=("team",),
+    ),
+    "team": Source(
+        Team,
+        "Teams",
+        text=lambda team: team.name,
+        label=lambda team: team.name,
+        context=lambda team: team.department.name,
+        url=lambda team: reverse("team_detail", args=[team.pk]),
+        select_related=("department",),
+    ),
+    "lesson": Source(
+        Lesson,
+        "Lektioner",
+        text=lambda lesson: f"{lesson.subject} {lesson.classroom}",
+        label=lambda lesson: f"{lesson.subject}, {lesson.classroom}",
+        context=lambda lesson: lesson.schoolclass.name,
+        # Lektioner har ingen egen side; klassens side viser dem
+        url=lambda lesson: reverse("schoolclass_detail", args=[lesson.schoolclass_id]),
+        select_related=("schoolclass",),
+    ),
+}
+KINDS = {source.model: kind for kind, source in SOURCES.items()}
+
+
+def tokenize(text):
+    """Ord i små bogstaver, fx "Lokale B12" -> ["lokale", "b12"]."""
+    return re.findall(r"\w+", (text or "").casefold())
+
+
+def _chunks(iterable, size=CHUNK_SIZE):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def index_objects(model, pks):
+    """(Gen)indeksér objekterne med de givne id'er. Bruges af signaler og masseimport."""
+    kind = KINDS[model]
+    source = SOURCES[kind]
+    for chunk in _chunks(pks):
+        with transaction.atomic():
+            objects = list(
+                model.objects.filter(pk__in=chunk)
+                .select_related(*source.select_related)
+                .order_by()
+            )
+            SearchEntry.objects.filter(kind=kind, object_id__in=chunk).delete()
+            entries = SearchEntry.objects.bulk_create(
+                [
+                    SearchEntry(
+                        kind=kind,
+                        object_id=obj.pk,
+                        label=source.label(obj)[:200],
+                        context=source.context(obj)[:200],
+                        url=source.url(obj),
+                    )
+                    for obj in objects
+                ]
+            )
+            SearchToken.objects.bulk_create(
+                [
+                    SearchToken(entry=entry, kind=kind, token=token[:100])
+                    for entry, obj in zip(entries, objects)
+                    for token in set(tokenize(source.text(obj)))
+                ]
+            )
+
+
+def remove_objects(model, pks):
+    SearchEntry.objects.filter(kind=KINDS[model], object_id__in=pks).delete()
+
+
+def update_context(model, pks, context):
+    """Ret konteksten (fx klassens navn) på mange indgange med én UPDATE."""
+    SearchEntry.objects.filter(kind=KINDS[model], object_id__in=pks).update(
+        context=context[:200]
+    )
+
+
+def refresh_class_context(class_ids):
+    """
+    Sæt konteksten på elever og lektioner i klasserne til klassens nuværende
+    navn med én UPDATE pr. slags, fx efter at mange klasser er omdøbt på én gang.
+    """
+    for model in (Student, Lesson):
+        objects = model.objects.filter(schoolclass__in=class_ids)
+        SearchEntry.objects.filter(
+            kind=KINDS[model], object_id__in=objects.values("pk")
+        ).update(
+            context=Subquery(
+                objects.filter(pk=OuterRef("object_id")).values("schoolclass__name")[:1]
+            )
+        )
+
+
+def rebuild():
+    """Genopbyg hele indekset. Returnerer antal indekserede objekter."""
+    SearchToken.objects.all().delete()
+    SearchEntry.objects.all().delete()
+    count = 0
+    for source in SOURCES.values():
+        pks = source.model.objects.order_by("pk").values_list("pk", flat=True)
+        for chunk in _chunks(pks.iterator(chunk_size=CHUNK_SIZE)):
+            index_objects(source.model, chunk)
+            count += len(chunk)
+    return count
+
+
+def _term_filter(term):
+    """Et søgeord er enten et præfiks eller et sæt af hele ord (fra stavekontrollen)."""
+    if isinstance(term, str):
+        return Q(token__gte=term, token__lt=term + "\uffff")
+    return Q(token__in=term)
+
+
+def _sorted_terms(terms):
+    # Det længste præfiks er normalt det mest selektive
+    return sorted(
+        terms, key=lambda term: len(term) if isinstance(term, str) else 0, reverse=True
+    )
+
+
+def _entries(kind, terms, limit):
+    """Højst `limit` SearchEntry'er af slagsen `kind`, der matcher alle søgeord."""
+    first, *rest = terms
+    tokens = SearchToken.objects.filter(_term_filter(first), kind=kind)
+    for term in rest:
+        tokens = tokens.filter(
+            Exists(
+                SearchToken.objects.filter(_term_filter(term), entry=OuterRef("entry"))
+            )
+        )
+    ids = tokens.order_by().values("entry_id").distinct()[:limit]
+    return sorted(SearchEntry.objects.filter(pk__in=ids), key=lambda entry: entry.label)
+
+
+def _match(terms):
+    """[(overskrift, [SearchEntry, ...])] for hver slags objekt med et match."""
+    terms = _sorted_terms(terms)
+    results = []
+    for kind, source in SOURCES.items():
+        entries = _entries(kind, terms, MAX_RESULTS)
+        if entries:
+            results.append((source.heading, entries))
+    return results
+
+
+def lookup(kind, query, limit=MAX_RESULTS):
+    """
+    Som search(), men kun for én slags objekt og uden stavekontrol: højst
+    `limit` SearchEntry'er sorteret efter navn. Bruges af autocomplete.
+    """
+    terms = tokenize(query)
+    if not terms:
+        return []
+    return _entries(kind, _sorted_terms(terms), limit)
+
+
+def distance(a, b):
+    """Levenshtein-afstand mellem to korte ord."""
+    previous = list(range(len(b) + 1))
+    for i, x in enumerate(a, start=1):
+        current = [i]
+        for j, y in enumerate(b, start=1):
+            current.append(
+                min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (x != y))
+            )
+        previous = current
+    return previous[-1]
+
+
+def similar_tokens(term):
+    """Ord i indekset, hvis begyndelse ligger højst 1-2 tastefejl fra `term`."""
+    allowed = 1 if len(term) < 6 else 2
+    candidates = (
+        # kind__in, så opslaget kan bruge indekset (kind, token)
+        SearchToken.objects.filter(_term_filter(term[0]), kind__in=list(SOURCES))
+        .order_by()
+        .values_list("token", flat=True)
+        .distinct()[:MAX_CANDIDATES]
+    )
+    return {
+        token
+        for token in candidates
+        if min(distance(term, token[: len(term) + k]) for k in (-1, 0, 1)) <= allowed
+    }
+
+
+def search(query):
+    """
+    Søg efter objekter, hvor hvert ord i `query` er begyndelsen af et ord i
+    objektets tekst. Returnerer [(overskrift, [SearchEntry, ...]), ...].
+    """
+    terms = tokenize(query)
+    if not terms:
+        return []
+    results = _match(terms)
+    if not results:
+        corrected = [similar_tokens(term) for term in terms]
+        if all(corrected):
+            results = _match(corrected)
+    return results
@@ -0,0 +1,316 @@
+"""
+Signaler der holder afledte data opdateret:
+
+- Lesson.cost og Lesson.teacher_count, når en lektions lærere ændres, en
+  ansat skifter kategori eller slettes, eller en kategoris pris ændres. Det
+  sker straks (i samme transaktion), så klassebudgetterne nedenfor kan
+  summere de opdaterede lektioner.
+- ClassBudgetSummary, når elever, lektioner, lærere, personalekategorier eller
+  takster ændres. Genberegningen udskydes til transaktionen er committet, så en
+  klasse kun genberegnes når data er på plads (og ikke midt i en kaskadesletning).
+- Den cachede navigation, når skoler, afdelinger, teams eller klasser ændres.
+- Versionerne af de cachede fragmenter på klasse-, team- og afdelingssiderne
+  (skole.fragments), når en klasses data ændres, og for dens team, afdeling
+  og skole. Også udskudt til efter commit.
+- Søgeindekset (skole.search), når elever, ansatte, klasser, teams eller
+  lektioner ændres, og konteksten i søgeresultaterne, når det objekt, de hører
+  under, omdøbes.
+
+Derudover sættes settings.SQLITE_PRAGMAS på hver ny SQLite-forbindelse.
+"""
+
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from . import fragments, search
+from .budget import refresh_class_summaries, refresh_lesson_costs
+from .cache import bump_version_on_commit
+from .context_processors import NAVBAR_VERSION
+from .models import (
+    Department,
+    EmploymentCategory,
+    Lesson,
+    School,
+    SchoolClass,
+    SchoolFee,
+    Staff,
+    Student,
+    Team,
+)
+
+
+def schoolclasses_changed(class_ids):
+    """Planlæg genberegning af klassernes budget efter commit."""
+    class_ids = {class_id for class_id in class_ids if class_id is not None}
+    if class_ids:
+        transaction.on_commit(partial(refresh_class_summaries, class_ids))
+        transaction.on_commit(partial(fragments.changed, class_ids=class_ids))
+
+
+def classes_taught_by(**lookup):
+    return (
+        Lesson.objects.filter(**lookup)
+        .order_by()
+        .values_list("schoolclass_id", flat=True)
+        .distinct()
+    )
+
+
+@receiver(pre_save, sender=Student)
+@receiver(pre_save, sender=Lesson)
+def remember_previous_schoolclass(sender, instance, raw=False, **kwargs):
+    # Hvis en elev eller lektion flyttes, skal den gamle klasse også genberegnes
+    instance._previous_schoolclass_id = None
+    if instance.pk and not raw:
+        instance._previous_schoolclass_id = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list("schoolclass_id", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=Lesson)
+def student_or_lesson_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schoolclasses_changed(
+            [
+                instance.schoolclass_id,
+                getattr(instance, "_previous_schoolclass_id", None),
+            ]
+        )
+
+
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=Lesson)
+def student_or_lesson_deleted(sender, instance, **kwargs):
+    schoolclasses_changed([instance.schoolclass_id])
+
+
+@receiver(post_save, sender=SchoolClass)
+def schoolclass_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        schoolclasses_changed([instance.pk])
+
+
+@receiver(m2m_changed, sender=Lesson.teachers.through)
+def lesson_teachers_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("pre_add", "pre_remove", "pre_clear"):
+        return
+    if not reverse:
+        schoolclasses_changed([instance.schoolclass_id])
+    elif pk_set is not None:
+        schoolclasses_changed(classes_taught_by(pk__in=pk_set))
+    else:
+        schoolclasses_changed(classes_taught_by(teachers=instance))
+
+
+@receiver(m2m_changed, sender=Lesson.teachers.through)
+def lesson_teachers_cost(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear" and reverse:
+        # Efter en clear() kan lektionerne ikke længere findes via den ansatte
+        instance._cleared_lesson_ids = list(
+            instance.taught_lessons.values_list("pk", flat=True)
+        )
+    elif action in ("post_add", "post_remove", "post_clear"):
+        if not reverse:
+            refresh_lesson_costs(pk=instance.pk)
+        elif action == "post_clear":
+            refresh_lesson_costs(pk__in=instance._cleared_lesson_ids)
+        else:
+            refresh_lesson_costs(pk__in=pk_set)
+
+
+@receiver(post_save, sender=Staff)
+def staff_saved_cost(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_lesson_costs(teachers=instance)
+
+
+@receiver(pre_delete, sender=Staff)
+def staff_deleting_cost(sender, instance, **kwargs):
+    instance._taught_lesson_ids = list(
+        instance.taught_lessons.values_list("pk", flat=True)
+    )
+
+
+@receiver(post_delete, sender=Staff)
+def staff_deleted_cost(sender, instance, **kwargs):
+    refresh_lesson_costs(pk__in=getattr(instance, "_taught_lesson_ids", []))
+
+
+@receiver(post_save, sender=EmploymentCategory)
+def employment_category_saved_cost(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_lesson_costs(teachers__employment_category=instance)
+
+
+@receiver(post_save, sender=Staff)
+@receiver(pre_delete, sender=Staff)
+def staff_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schoolclasses_changed(classes_taught_by(teachers=instance))
+
+
+@receiver(post_save, sender=EmploymentCategory)
+def employment_category_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schoolclasses_changed(classes_taught_by(teachers__employment_category=instance))
+
+
+@receiver(post_save, sender=SchoolFee)
+@receiver(pre_delete, sender=SchoolFee)
+def school_fee_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schoolclasses_changed(
+            Student.objects.filter(school_fee=instance)
+            .order_by()
+            .values_list("schoolclass_id", flat=True)
+            .distinct()
+        )
+
+
+@receiver(post_save, sender=School)
+@receiver(post_save, sender=Department)
+@receiver(post_save, sender=Team)
+@receiver(post_save, sender=SchoolClass)
+@receiver(post_delete, sender=School)
+@receiver(post_delete, sender=Department)
+@receiver(post_delete, sender=Team)
+@receiver(post_delete, sender=SchoolClass)
+def organization_changed(sender, **kwargs):
+    bump_version_on_commit(NAVBAR_VERSION)
+
+
+# Feltet, der peger på forælderen i hierarkiet klasse -> team -> afdeling -> skole
+PARENT_FIELDS = {SchoolClass: "team_id", Team: "department_id", Department: "school_id"}
+
+
+@receiver(pre_save, sender=SchoolClass)
+@receiver(pre_save, sender=Team)
+@receiver(pre_save, sender=Department)
+def remember_previous_parent(sender, instance, raw=False, **kwargs):
+    # Flyttes objektet, skal den gamle forælders fragmenter også genrenderes
+    instance._previous_parent_id = None
+    if instance.pk and not raw:
+        instance._previous_parent_id = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list(PARENT_FIELDS[sender], flat=True)
+            .first()
+        )
+
+
+def _parents(instance):
+    return [
+        getattr(instance, PARENT_FIELDS[type(instance)]),
+        getattr(instance, "_previous_parent_id", None),
+    ]
+
+
+@receiver(post_save, sender=SchoolClass)
+@receiver(post_delete, sender=SchoolClass)
+def schoolclass_fragments(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(
+            partial(
+                fragments.changed, class_ids=[instance.pk], team_ids=_parents(instance)
+            )
+        )
+
+
+@receiver(post_save, sender=Team)
+def team_fragments_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(partial(fragments.renamed, team_ids=[instance.pk]))
+        transaction.on_commit(
+            partial(fragments.changed, department_ids=_parents(instance))
+        )
+
+
+@receiver(post_save, sender=Department)
+def department_fragments_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(partial(fragments.renamed, department_ids=[instance.pk]))
+        transaction.on_commit(partial(fragments.changed, school_ids=_parents(instance)))
+
+
+@receiver(post_delete, sender=Team)
+def team_fragments_deleted(sender, instance, **kwargs):
+    transaction.on_commit(
+        partial(fragments.changed, department_ids=[instance.department_id])
+    )
+
+
+@receiver(post_delete, sender=Department)
+def department_fragments_deleted(sender, instance, **kwargs):
+    transaction.on_commit(partial(fragments.changed, school_ids=[instance.school_id]))
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=Staff)
+@receiver(post_save, sender=SchoolClass)
+@receiver(post_save, sender=Team)
+@receiver(post_save, sender=Lesson)
+def searchable_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_objects(sender, [instance.pk])
+
+
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=Staff)
+@receiver(post_delete, sender=SchoolClass)
+@receiver(post_delete, sender=Team)
+@receiver(post_delete, sender=Lesson)
+def searchable_deleted(sender, instance, **kwargs):
+    search.remove_objects(sender, [instance.pk])
+
+
+@receiver(post_save, sender=SchoolClass)
+def schoolclass_renamed(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        for model in (Student, Lesson):
+            search.update_context(
+                model,
+                model.objects.filter(schoolclass=instance).values("pk"),
+                instance.name,
+            )
+
+
+@receiver(post_save, sender=Team)
+def team_renamed(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        search.update_context(
+            SchoolClass, instance.schoolclasses.values("pk"), instance.name
+        )
+
+
+@receiver(post_save, sender=Department)
+def department_renamed(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        search.update_context(Team, instance.teams.values("pk"), instance.name)
+
+
+@receiver(post_save, sender=EmploymentCategory)
+def employment_category_renamed(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        search.update_context(Staff, instance.staff_members.values("pk"), instance.name)
+
+
+@receiver(connection_created)
+def sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, "SQLITE_PRAGMAS", {}).items():
+            cursor.execute(f"PRAGMA {name} = {value}")
@@ -0,0 +1,194 @@
+"""
+Øjebliksbilleder af budgettet pr. skole og skoleår.
+
+Når en takst eller en lektionspris ændres, ændres alle budgettal beregnet fra
+de levende tabeller også. Et BudgetSnapshot fryser derfor klassernes tal
+sammen med de takster og priser, de er beregnet ud fra. Dataene gemmes
+kolonnevis (én liste pr. kolonne), hvilket er kompakt og hurtigt at læse
+tilbage, og en sammenligning mellem to år læser kun de to øjebliksbilleder.
+"""
+
+from dataclasses import dataclass, fields
+from decimal import Decimal
+
+from django.db import transaction
+
+from .budget import BudgetRollup, class_figures, rollup
+from .models import BudgetSnapshot, EmploymentCategory, SchoolClass, SchoolFee
+
+FORMAT_VERSION = 1
+
+
+@dataclass(frozen=True)
+class SnapshotClass:
+    """Én klasses tal fra et øjebliksbillede. Kan lægges sammen med rollup()."""
+
+    id: int
+    name: str
+    team: str
+    department: str
+    num_students: int
+    school_fee: Decimal
+    num_lessons: int
+    cost: Decimal
+    hours_by_category: dict
+    cost_by_category: dict
+
+
+CLASS_COLUMNS = [field.name for field in fields(SnapshotClass)]
+
+
+def _columns(rows, names):
+    """[(a, b), (c, d)] -> {navn1: [a, c], navn2: [b, d]}"""
+    rows = list(rows)
+    return {name: [row[i] for row in rows] for i, name in enumerate(names)}
+
+
+def _rows(columns, names):
+    return zip(*(columns[name] for name in names))
+
+
+@transaction.atomic
+def take_snapshot(school, school_year):
+    """Gem skolens budget, takster og priser, som de er nu, og returnér det."""
+    schoolclasses = SchoolClass.objects.filter(
+        team__department__school=school
+    ).select_related("team__department")
+    figures = class_figures(team__department__school=school)
+    classes = []
+    for schoolclass in schoolclasses:
+        entry = figures.get(schoolclass.pk, {})
+        classes.append(
+            (
+                schoolclass.pk,
+                schoolclass.name,
+                schoolclass.team.name,
+                schoolclass.team.department.name,
+                entry.get("num_students", 0),
+                entry.get("sum_school_fee", Decimal(0)),
+                entry.get("num_lessons", 0),
+                entry.get("cost", Decimal(0)),
+                entry.get("hours_by_category", {}),
+                entry.get("cost_by_category", {}),
+            )
+        )
+
+    data = {
+        "version": FORMAT_VERSION,
+        "classes": _columns(classes, CLASS_COLUMNS),
+        "fees": _columns(
+            SchoolFee.objects.order_by("level").values_list("level", "name", "amount"),
+            ["level", "name", "amount"],
+        ),
+        "categories": _columns(
+            EmploymentCategory.objects.order_by("name").values_list(
+                "name", "price_pr_lesson"
+            ),
+            ["name", "price_pr_lesson"],
+        ),
+    }
+    return BudgetSnapshot.objects.create(
+        school=school, school_year=school_year, data=data
+    )
+
+
+def snapshot_classes(snapshot):
+    """Klasserne i et øjebliksbillede som SnapshotClass-objekter."""
+    classes = []
+    for row in _rows(snapshot.data["classes"], CLASS_COLUMNS):
+        values = dict(zip(CLASS_COLUMNS, row))
+        # Beløb gemmes som tekst af DjangoJSONEncoder
+        values["school_fee"] = Decimal(values["school_fee"])
+        values["cost"] = Decimal(values["cost"])
+        classes.append(SnapshotClass(**values))
+    return classes
+
+
+def snapshot_prices(snapshot):
+    """({takstnavn: beløb}, {kategorinavn: pris pr. lektion}) fra et øjebliksbillede."""
+    fees = snapshot.data["fees"]
+    categories = snapshot.data["categories"]
+    return (
+        {
+            name or str(level): Decimal(amount)
+            for level, name, amount in _rows(fees, ["level", "name", "amount"])
+        },
+        {
+            name: Decimal(price)
+            for name, price in _rows(categories, ["name", "price_pr_lesson"])
+        },
+    )
+
+
+@dataclass(frozen=True)
+class Group:
+    """En afdeling i et øjebliksbillede; afdelingen findes måske ikke længere."""
+
+    name: str
+
+
+@dataclass(frozen=True)
+class ComparisonRow:
+    name: str
+    before: BudgetRollup | None
+    after: BudgetRollup | None
+
+    @property
+    def cost_change(self):
+        return (self.after.cost if self.after else 0) - (
+            self.before.cost if self.before else 0
+        )
+
+
+@dataclass(frozen=True)
+class PriceChange:
+    name: str
+    before: Decimal | None
+    after: Decimal | None
+
+
+@dataclass(frozen=True)
+class Comparison:
+    """Sammenligning af to øjebliksbilleder pr. afdeling."""
+
+    before: BudgetSnapshot
+    after: BudgetSnapshot
+    rows: tuple
+    total: ComparisonRow
+    fee_changes: tuple
+    price_changes: tuple
+
+
+def _price_changes(before, after):
+    return tuple(
+        PriceChange(name, before.get(name), after.get(name))
+        for name in sorted(before.keys() | after.keys())
+        if before.get(name) != after.get(name)
+    )
+
+
+def compare(before, after):
+    """Sammenlign to øjebliksbilleder afdeling for afdeling."""
+    departments = []
+    totals = []
+    for snapshot in (before, after):
+        rows, total = rollup(
+            snapshot_classes(snapshot), lambda row: Group(row.department)
+        )
+        departments.append({row.group.name: row for row in rows})
+        totals.append(total)
+
+    rows = tuple(
+        ComparisonRow(name, departments[0].get(name), departments[1].get(name))
+        for name in sorted(departments[0].keys() | departments[1].keys())
+    )
+    fees_before, prices_before = snapshot_prices(before)
+    fees_after, prices_after = snapshot_prices(after)
+    return Comparison(
+        before=before,
+        after=after,
+        rows=rows,
+        total=ComparisonRow("I alt", *totals),
+        fee_changes=_price_changes(fees_before, fees_after),
+        price_changes=_price_changes(prices_before, prices_after),
+    )
@@ -0,0 +1,220 @@
+"""
+Syntetiske testdata til benchmarks og regressionstests.
+
+Alt oprettes med bulk_create, så selv store datasæt kan bygges på få
+sekunder. Da bulk_create springer save() og signalerne over, sættes
+class_number direkte, og budgetoversigterne, navigationen, de cachede
+fragmenter og søgeindekset opdateres til sidst. Derudover tages et
+budget-øjebliksbillede pr. skole for hvert af to skoleår.
+"""
+
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from functools import partial
+
+from django.db import transaction
+
+from . import fragments, search
+from .budget import refresh_class_summaries, refresh_lesson_costs
+from .cache import bump_version_on_commit
+from .context_processors import NAVBAR_VERSION
+from .models import (
+    Department,
+    EmploymentCategory,
+    Lesson,
+    School,
+    SchoolClass,
+    SchoolFee,
+    Staff,
+    SchoolYear,
+    Student,
+    Team,
+)
+from .snapshots import take_snapshot
+
+CATEGORIES = (("Lærer", Decimal("500")), ("Pædagog", Decimal("300")))
+FEES = ((1, "Normal", Decimal("60000")), (2, "Specialklasse", Decimal("150000")))
+SUBJECTS = ("Dansk", "Matematik", "Engelsk", "Idræt", "Musik", "Natur/teknik")
+SCHOOL_YEARS = (("2024/25", date(2024, 8, 1)), ("2025/26", date(2025, 8, 1)))
+
+
+@dataclass(frozen=True)
+class Scale:
+    schools: int = 1
+    departments: int = 2  # pr. skole
+    teams: int = 2  # pr. afdeling
+    classes: int = 3  # pr. team
+    students: int = 10  # pr. klasse
+    lessons: int = 5  # pr. klasse
+    teachers: int = 2  # pr. lektion
+    staff: int = 20
+
+    def scaled(self, factor):
+        """En større udgave af samme skala, hvor alle antal ganges med `factor`."""
+        return Scale(**{name: value * factor for name, value in self.__dict__.items()})
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """Id'er på ét objekt af hver slags, til at bygge URL'er ud fra."""
+
+    school: int
+    department: int
+    team: int
+    schoolclass: int
+    student: int
+    lesson: int
+    staff: int
+    employment_category: int
+    school_fee: int
+
+
+def _bulk(model, objects):
+    return model.objects.bulk_create(objects, batch_size=500)
+
+
+@transaction.atomic
+def generate(scale=Scale()):
+    categories = _bulk(
+        EmploymentCategory,
+        [
+            EmploymentCategory(name=name, type=name, price_pr_lesson=price)
+            for name, price in CATEGORIES
+        ],
+    )
+    fees = _bulk(
+        SchoolFee,
+        [
+            SchoolFee(level=level, name=name, amount=amount)
+            for level, name, amount in FEES
+        ],
+    )
+    staff = _bulk(
+        Staff,
+        [
+            Staff(
+                name=f"Ansat {i + 1}",
+                employment_category=categories[i % len(categories)],
+            )
+            for i in range(max(scale.staff, scale.teachers))
+        ],
+    )
+    schools = _bulk(
+        School, [School(name=f"Skole {i + 1}") for i in range(scale.schools)]
+    )
+    departments = _bulk(
+        Department,
+        [
+            Department(name=f"{school.name} afdeling {i + 1}", school=school)
+            for school in schools
+            for i in range(scale.departments)
+        ],
+    )
+    teams = _bulk(
+        Team,
+        [
+            Team(name=f"{department.name} team {i + 1}", department=department)
+            for department in departments
+            for i in range(scale.teams)
+        ],
+    )
+    schoolclasses = _bulk(
+        SchoolClass,
+        [
+            SchoolClass(
+                name=f"{i % 10}{chr(65 + i // 10 % 26)} {team.pk}",
+                team=team,
+                age_number=i % 10,
+                class_number=i % 10,
+            )
+            for team in teams
+            for i in range(scale.classes)
+        ],
+    )
+    students = _bulk(
+        Student,
+        [
+            Student(
+                name=f"Elev {schoolclass.pk}-{i + 1}",
+                schoolclass=schoolclass,
+                age_number=schoolclass.age_number,
+                date_of_birth=date(2010, 1 + i % 12, 1 + i % 28),
+                school_fee=fees[0 if i % 20 else 1],
+            )
+            for schoolclass in schoolclasses
+            for i in range(scale.students)
+        ],
+    )
+    lessons = _bulk(
+        Lesson,
+        [
+            Lesson(
+                schoolclass=schoolclass,
+                subject=SUBJECTS[i % len(SUBJECTS)],
+                classroom=f"Lokale {i + 1}",
+            )
+            for schoolclass in schoolclasses
+            for i in range(scale.lessons)
+        ],
+    )
+    _bulk(
+        Lesson.teachers.through,
+        [
+            Lesson.teachers.through(
+                lesson_id=lesson.pk,
+                staff_id=staff[(n + i) % len(staff)].pk,
+            )
+            for n, lesson in enumerate(lessons)
+            for i in range(scale.teachers)
+        ],
+    )
+    _bulk(
+        SchoolClass.class_teachers.through,
+        [
+            SchoolClass.class_teachers.through(
+                schoolclass_id=schoolclass.pk, staff_id=staff[n % len(staff)].pk
+            )
+            for n, schoolclass in enumerate(schoolclasses)
+        ],
+    )
+
+    for i in range(0, len(lessons), 500):
+        refresh_lesson_costs(pk__in=[lesson.pk for lesson in lessons[i : i + 500]])
+    class_ids = {schoolclass.pk for schoolclass in schoolclasses}
+    refresh_class_summaries(class_ids)
+    transaction.on_commit(partial(fragments.changed, class_ids=class_ids))
+    bump_version_on_commit(NAVBAR_VERSION)
+    for model, objects in [
+        (Staff, staff),
+        (Team, teams),
+        (SchoolClass, schoolclasses),
+        (Student, students),
+        (Lesson, lessons),
+    ]:
+        search.index_objects(model, [obj.pk for obj in objects])
+
+    # Et budget-øjebliksbillede pr. skole og skoleår
+    for name, start in SCHOOL_YEARS:
+        year, _ = SchoolYear.objects.get_or_create(
+            name=name,
+            defaults={
+                "start_date": start,
+                "end_date": start.replace(year=start.year + 1),
+            },
+        )
+        for school in schools:
+            take_snapshot(school, year)
+
+    schoolclass = schoolclasses[0]
+    return Dataset(
+        school=schools[0].pk,
+        department=departments[0].pk,
+        team=teams[0].pk,
+        schoolclass=schoolclass.pk,
+        student=students[0].pk,
+        lesson=lessons[0].pk,
+        staff=staff[0].pk,
+        employment_category=categories[0].pk,
+        school_fee=fees[0].pk,
+    )
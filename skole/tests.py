@@ -1,3 +1,1388 @@
+import csv
+import importlib
+import io
+import re
+import tempfile
+from collections import Counter
+from decimal import Decimal
+from pathlib import Path
+
+from asgiref.sync import async_to_sync
+from django.apps import apps
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Sum
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from openpyxl import load_workbook
+
+from sliders import urls as slider_urls
+
+from . import autocomplete, benchmark, fragments
+from . import urls as skole_urls
+from .budget import ClassBudget, TeamBudget, class_figures, rollup, usage
+from .cache import get_version
+from .context_processors import NAVBAR_VERSION, navbar_tree
+from .forms import LessonForm
+from .importers import IMPORTERS, read_rows
+from .pagination import paginate
+from .rollover import rollover
+from .search import search
+from .snapshots import compare, snapshot_classes, take_snapshot
+from .models import (
+    BudgetSnapshot,
+    ClassBudgetSummary,
+    Department,
+    EmploymentCategory,
+    Lesson,
+    School,
+    SchoolClass,
+    SchoolFee,
+    SchoolYear,
+    SearchEntry,
+    Staff,
+    Student,
+    Team,
+)
+from .synthetic import Scale, generate
+
+
+class TeamBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        school = School.objects.create(name="Kløver-Skolen")
+        department = Department.objects.create(name="Afdeling 1", school=school)
+        cls.team = Team.objects.create(name="Team A", department=department)
+        cls.teacher_category = EmploymentCategory.objects.create(
+            name="Lærer", type="Lærer", price_pr_lesson=Decimal("500")
+        )
+        cls.pedagogue_category = EmploymentCategory.objects.create(
+            name="Pædagog", type="Pædagog", price_pr_lesson=Decimal("300")
+        )
+        cls.fee = SchoolFee.objects.create(
+            name="Normal", level=1, amount=Decimal("1000")
+        )
+        cls.teacher = Staff.objects.create(
+            name="Anne", employment_category=cls.teacher_category
+        )
+        cls.pedagogue = Staff.objects.create(
+            name="Bo", employment_category=cls.pedagogue_category
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def add_class(self, name, students=2, lessons=3):
+        schoolclass = SchoolClass.objects.create(name=name, team=self.team)
+        for i in range(students):
+            Student.objects.create(name=f"Elev {name}{i}", schoolclass=schoolclass)
+        for i in range(lessons):
+            lesson = Lesson.objects.create(
+                schoolclass=schoolclass, subject="Dansk", classroom=f"{i}"
+            )
+            lesson.teachers.add(self.teacher, self.pedagogue)
+        return schoolclass
+
+    def test_figures(self):
+        self.add_class("1A", students=2, lessons=3)
+        self.add_class("2A", students=1, lessons=1)
+
+        budget = TeamBudget.for_team(self.team.pk)
+
+        self.assertEqual(budget.num_students, 3)
+        self.assertEqual(budget.num_lessons, 4)
+        self.assertEqual(budget.school_fee, Decimal("3000"))
+        self.assertEqual(budget.total_hours, (("Lærer", 4), ("Pædagog", 4)))
+        self.assertEqual(budget.total_price_for_team, Decimal("3200"))
+        self.assertEqual(budget.surplus, Decimal("-200"))
+
+        first = budget.classes[0]
+        self.assertEqual(first.schoolclass.name, "1A")
+        self.assertEqual(first.total_price_for_class, Decimal("2400"))
+        self.assertEqual(first.hours_by_category, (("Lærer", 3), ("Pædagog", 3)))
+
+    def test_class_budget_matches_per_object_calculation(self):
+        schoolclass = self.add_class("1A", students=3, lessons=4)
+        self.add_class("2A", students=2, lessons=2)
+        Student.objects.filter(name="Elev 1A0").update(school_fee=self.fee)
+        extra = Lesson.objects.create(
+            schoolclass=schoolclass, subject="Idræt", classroom="Hal"
+        )
+        extra.teachers.add(self.teacher)
+
+        # Den oprindelige beregning: ét opslag pr. elev, lektion og lærer
+        income = sum(
+            (s.school_fee.amount for s in schoolclass.students.all() if s.school_fee),
+            Decimal(0),
+        )
+        hours = Counter()
+        cost = Decimal(0)
+        for lesson in schoolclass.lessons.all():
+            for teacher in lesson.teachers.all():
+                hours[teacher.employment_category.name] += 1
+                cost += teacher.employment_category.price_pr_lesson
+
+        with self.assertNumQueries(3):
+            budget = ClassBudget.for_class(schoolclass.pk)
+
+        self.assertEqual(budget.num_students, schoolclass.students.count())
+        self.assertEqual(budget.total_school_fee, income)
+        self.assertEqual(budget.total_price_for_class, cost)
+        self.assertEqual(dict(budget.total_hours), dict(hours))
+        self.assertEqual(budget.total_sum, sum(hours.values()))
+        self.assertEqual(budget.total_lessons_in_class, 5)
+        self.assertEqual((budget.surplus, budget.percentage_used), usage(income, cost))
+        self.assertEqual(sum(lesson.total_price for lesson in budget.lessons), cost)
+
+    def test_async_budgets_match(self):
+        schoolclass = self.add_class("1A", students=2, lessons=3)
+        self.add_class("2A", students=1, lessons=1)
+
+        self.assertEqual(
+            async_to_sync(TeamBudget.afor_team)(self.team.pk),
+            TeamBudget.for_team(self.team.pk),
+        )
+        self.assertEqual(
+            async_to_sync(ClassBudget.afor_class)(schoolclass.pk),
+            ClassBudget.for_class(schoolclass.pk),
+        )
+        with self.assertRaises(Team.DoesNotExist):
+            async_to_sync(TeamBudget.afor_team)(0)
+
+    def test_query_count_is_flat(self):
+        url = reverse("team_detail", args=[self.team.pk])
+        self.add_class("1A")
+
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url)
+
+        # Ændringerne tæller sidens fragmentversion op efter commit
+        with self.captureOnCommitCallbacks(execute=True):
+            for name in ("2A", "3A", "4A", "5A"):
+                self.add_class(name, students=10, lessons=15)
+
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(small), len(large))
+
+
+class ClassBudgetSummaryTests(TestCase):
+    def setUp(self):
+        self.data = generate(Scale(departments=2, teams=2, classes=2, lessons=2))
+
+    def summaries(self):
+        return {
+            row["schoolclass"]: row
+            for row in ClassBudgetSummary.objects.values(
+                "schoolclass",
+                "num_students",
+                "school_fee",
+                "num_lessons",
+                "hours_by_category",
+                "cost_by_category",
+                "cost",
+                "surplus",
+                "percentage_used",
+            )
+        }
+
+    def assertSummaryCurrent(self, class_id):
+        figures = class_figures(pk=class_id)[class_id]
+        summary = ClassBudgetSummary.objects.get(schoolclass=class_id)
+        self.assertEqual(
+            (
+                summary.num_students,
+                summary.school_fee,
+                summary.num_lessons,
+                summary.cost,
+                summary.hours_by_category,
+            ),
+            (
+                figures["num_students"],
+                figures["sum_school_fee"],
+                figures["num_lessons"],
+                figures["cost"],
+                figures["hours_by_category"],
+            ),
+        )
+
+    def test_signals_refresh_summary(self):
+        class_id = self.data.schoolclass
+        expensive = SchoolFee.objects.get(level=2)
+        extra = Staff.objects.exclude(taught_lessons__schoolclass=class_id).first()
+        lesson = Lesson.objects.filter(schoolclass=class_id).first()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            student = Student.objects.filter(schoolclass=class_id).first()
+            student.school_fee = expensive
+            student.save()
+        self.assertSummaryCurrent(class_id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            lesson.teachers.add(extra)
+        self.assertSummaryCurrent(class_id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            category = extra.employment_category
+            category.price_pr_lesson += 100
+            category.save()
+        self.assertSummaryCurrent(class_id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            lesson.delete()
+        self.assertSummaryCurrent(class_id)
+
+    def test_rollup_matches_recomputed_total(self):
+        summaries = ClassBudgetSummary.objects.select_related(
+            "schoolclass__team__department__school"
+        )
+        rows, total = rollup(summaries, lambda s: s.schoolclass.team.department)
+
+        figures = class_figures().values()
+        income = sum((f["sum_school_fee"] for f in figures), Decimal(0))
+        cost = sum((f["cost"] for f in figures), Decimal(0))
+        hours = Counter()
+        for f in figures:
+            hours.update(f["hours_by_category"])
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(total.num_classes, SchoolClass.objects.count())
+        self.assertEqual(total.num_students, Student.objects.count())
+        self.assertEqual(total.num_lessons, Lesson.objects.count())
+        self.assertEqual((total.school_fee, total.cost), (income, cost))
+        self.assertEqual(total.surplus, income - cost)
+        self.assertEqual(dict(total.hours_by_category), dict(hours))
+        self.assertEqual(sum(row.cost for row in rows), cost)
+
+    def test_backfill_migration(self):
+        before = self.summaries()
+        ClassBudgetSummary.objects.all().delete()
+        migration = importlib.import_module(
+            "skole.migrations.0023_backfill_class_budget_summaries"
+        )
+        migration.backfill_class_budget_summaries(apps, None)
+        self.assertEqual(self.summaries(), before)
+
+
+class NavbarCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.data = generate(Scale(departments=1, teams=2, classes=2, students=1))
+
+    def names(self):
+        return {
+            schoolclass["name"] for schoolclass in navbar_tree()["all_schoolclasses"]
+        }
+
+    def test_warm_navbar_needs_no_queries(self):
+        tree = navbar_tree()
+        with self.assertNumQueries(0):
+            self.assertEqual(navbar_tree(), tree)
+        # Sider, der ikke ændrer noget, bygger heller ikke træet igen
+        self.client.get(reverse("homepage"))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("homepage"))
+        self.assertFalse(
+            [q for q in queries if "skole_schoolclass" in q["sql"]],
+            queries.captured_queries,
+        )
+
+    def test_change_invalidates_after_commit(self):
+        self.names()
+        version = get_version(NAVBAR_VERSION)
+        with self.captureOnCommitCallbacks() as callbacks:
+            SchoolClass.objects.create(name="Ny klasse", team_id=self.data.team)
+        # Indtil commit kan en samtidig læser kun se de gamle data
+        self.assertEqual(get_version(NAVBAR_VERSION), version)
+        for callback in callbacks:
+            callback()
+        self.assertIn("Ny klasse", self.names())
+
+    def test_rolled_back_change_keeps_version(self):
+        self.names()
+        version = get_version(NAVBAR_VERSION)
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                SchoolClass.objects.create(name="Ny klasse", team_id=self.data.team)
+                transaction.set_rollback(True)
+        self.assertEqual(get_version(NAVBAR_VERSION), version)
+        self.assertNotIn("Ny klasse", self.names())
+
+
+class RouteBenchmarkTests(TestCase):
+    scale = Scale(departments=1, teams=2, classes=2, students=3, lessons=2, staff=4)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_every_route_is_measured(self):
+        measured = {name for name, _ in benchmark.ROUTES}
+        measured |= {name for name, _, _ in benchmark.QUERY_ROUTES}
+        for pattern in skole_urls.urlpatterns + slider_urls.urlpatterns:
+            self.assertIn(pattern.name, measured)
+
+    def test_routes_respond(self):
+        results = benchmark.run(generate(self.scale))
+        for key, measurement in results.items():
+            self.assertEqual(measurement.status, 200, key)
+
+    def test_query_counts_are_flat(self):
+        small = benchmark.run(generate(self.scale))
+        large = benchmark.run(generate(self.scale.scaled(3)))
+        self.assertEqual(benchmark.growing_routes(small, large), [])
+
+    def test_no_regression_against_baseline(self):
+        results = {"x1": benchmark.run(generate(self.scale))}
+        self.assertEqual(benchmark.regressions(results, benchmark.load_baseline()), [])
+
+
+class ClassNumberTests(TestCase):
+    NAMES = ("10A", "2B", "Modtageklassen", "0B", "9C", "1A")
+
+    def setUp(self):
+        school = School.objects.create(name="Skole")
+        department = Department.objects.create(name="Afdeling", school=school)
+        team = Team.objects.create(name="Team", department=department)
+        for name in self.NAMES:
+            SchoolClass.objects.create(name=name, team=team)
+
+    def test_parse_class_number(self):
+        for name, number in [
+            ("0B", 0),
+            ("3A", 3),
+            ("10A", 10),
+            ("10. klasse", 10),
+            ("Modtageklassen", 0),
+            ("", 0),
+            (None, 0),
+        ]:
+            self.assertEqual(SchoolClass.parse_class_number(name), number, name)
+
+    def test_manager_orders_by_class_number(self):
+        self.assertEqual(
+            list(SchoolClass.objects.values_list("name", "class_number")),
+            [
+                ("0B", 0),
+                ("Modtageklassen", 0),
+                ("1A", 1),
+                ("2B", 2),
+                ("9C", 9),
+                ("10A", 10),
+            ],
+        )
+
+    def test_backfill_migration(self):
+        before = dict(SchoolClass.objects.values_list("name", "class_number"))
+        SchoolClass.objects.update(class_number=-1)
+        migration = importlib.import_module(
+            "skole.migrations.0016_schoolclass_class_number"
+        )
+        migration.backfill_class_number(apps, None)
+        self.assertEqual(
+            dict(SchoolClass.objects.values_list("name", "class_number")), before
+        )
+
+    def test_rename_updates_class_number(self):
+        schoolclass = SchoolClass.objects.get(name="9C")
+        schoolclass.name = "10C"
+        schoolclass.save(update_fields=["name"])
+        schoolclass.refresh_from_db()
+        self.assertEqual(schoolclass.class_number, 10)
+
+
+class KeysetPaginationTests(TestCase):
+    def walk(self, queryset, page_size):
+        objects, cursor = [], None
+        while True:
+            page = paginate(queryset, cursor, page_size)
+            objects += page.object_list
+            if not page.has_next:
+                return objects
+            cursor = page.cursor
+
+    def test_pages_follow_ordering(self):
+        generate(Scale(departments=2, teams=2, classes=5, students=1, lessons=1))
+        queryset = SchoolClass.objects.all()
+        self.assertEqual(
+            self.walk(queryset, 3),
+            list(queryset.order_by(*queryset.query.order_by, "pk")),
+        )
+
+    def test_nullable_ordering(self):
+        for level, name in [(1, None), (1, "B"), (1, None), (2, "A"), (1, "A")]:
+            SchoolFee.objects.create(level=level, name=name, amount=1)
+        fees = self.walk(SchoolFee.objects.all(), 2)
+        self.assertEqual(
+            [(fee.level, fee.name) for fee in fees],
+            [(1, None), (1, None), (1, "A"), (1, "B"), (2, "A")],
+        )
+
+    def test_load_more_returns_rows_only(self):
+        generate(Scale(students=30))
+        response = self.client.get(reverse("student_list"))
+        self.assertContains(response, 'hx-trigger="revealed"')
+        next_query = response.context["next_query"]
+        response = self.client.get(
+            f"{reverse('student_list')}?{next_query}", headers={"hx-request": "true"}
+        )
+        self.assertEqual(len(response.context["rows"]), 50)
+        self.assertNotContains(response, "<table")
+
+
+class ImportTests(TestCase):
+    def setUp(self):
+        self.data = generate(Scale(departments=1, teams=2, classes=1, students=1))
+        self.teams = list(Team.objects.order_by("pk"))
+        # Samme klassenavn i begge teams
+        self.classes = [
+            SchoolClass.objects.create(name="3A", team=team) for team in self.teams
+        ]
+
+    def run_import(self, kind, text, **options):
+        rows = read_rows(io.StringIO(text), f"{kind}.csv")
+        with self.captureOnCommitCallbacks(execute=True):
+            return IMPORTERS[kind](**options).run(rows)
+
+    def test_dry_run_writes_nothing(self):
+        text = "name;schoolclass;team\n" + "".join(
+            f"Ny elev {i};3A;{self.teams[0].name}\n" for i in range(3)
+        )
+        report = self.run_import("students", text, dry_run=True)
+        self.assertEqual((report.created, report.errors), (3, []))
+        self.assertFalse(Student.objects.filter(name__startswith="Ny elev").exists())
+
+    def test_chunked_import(self):
+        text = "name,schoolclass,team,school_fee\n" + "".join(
+            f"Ny elev {i},3A,{self.teams[1].name},2\n" for i in range(5)
+        )
+        with CaptureQueriesContext(connection) as queries:
+            report = self.run_import("students", text, chunk_size=2)
+        self.assertEqual(report.created, 5)
+        inserts = [
+            q for q in queries if q["sql"].startswith('INSERT INTO "skole_student"')
+        ]
+        self.assertEqual(len(inserts), 3)
+
+        schoolclass = self.classes[1]
+        self.assertEqual(schoolclass.students.count(), 5)
+        summary = ClassBudgetSummary.objects.get(schoolclass=schoolclass)
+        self.assertEqual(summary.school_fee, 5 * SchoolFee.objects.get(level=2).amount)
+        self.assertEqual(
+            SearchEntry.objects.filter(kind="student", context="3A").count(), 5
+        )
+
+        # En ny import af de samme rækker opretter intet
+        report = self.run_import("students", text, chunk_size=2)
+        self.assertEqual((report.created, report.existing), (0, 5))
+
+    def test_duplicate_class_name_needs_team(self):
+        staff = Staff.objects.first()
+        text = (
+            "schoolclass;team;subject;classroom;teachers\n"
+            "3A;;Dansk;Lokale 1;\n"
+            f"3A;{self.teams[0].name};Dansk;Lokale 1;{staff.name}\n"
+            "3A;Ukendt team;Dansk;Lokale 1;\n"
+        )
+        report = self.run_import("lessons", text)
+        self.assertEqual(report.created, 1)
+        self.assertEqual([line for line, _ in report.errors], [2, 4], report.errors)
+        self.assertIn("ikke entydigt", report.errors[0][1])
+        lesson = Lesson.objects.get(schoolclass=self.classes[0])
+        self.assertEqual(list(lesson.teachers.all()), [staff])
+        self.assertEqual(lesson.cost, staff.employment_category.price_pr_lesson)
+
+    def test_repeated_lessons(self):
+        staff = Staff.objects.first()
+        team = self.teams[0].name
+        line = f"3A;{team};Matematik;B12;{staff.name}\n"
+        text = "schoolclass;team;subject;classroom;teachers\n" + 3 * line
+        report = self.run_import("lessons", text)
+        self.assertEqual((report.created, report.existing), (3, 0))
+        summary = ClassBudgetSummary.objects.get(schoolclass=self.classes[0])
+        self.assertEqual(summary.num_lessons, 3)
+        self.assertEqual(summary.cost, 3 * staff.employment_category.price_pr_lesson)
+
+        # Kun rækkerne ud over de eksisterende lektioner oprettes
+        report = self.run_import("lessons", text + line)
+        self.assertEqual((report.created, report.existing), (1, 3))
+        self.assertEqual(self.classes[0].lessons.count(), 4)
+
+
+class ListFilterTests(TestCase):
+    def test_student_filter(self):
+        data = generate(Scale(students=12))
+        response = self.client.get(
+            reverse("student_list"), {"team": data.team, "born_from": 2010}
+        )
+        students = response.context["object_list"]
+        self.assertEqual(len(students), 3 * 12)
+        self.assertTrue(all(s.schoolclass.team_id == data.team for s in students))
+
+        response = self.client.get(reverse("student_list"), {"born_from": 2011})
+        self.assertEqual(response.context["rows"], [])
+
+        for params in ({"born_from": 0}, {"born_from": 99999}, {"born_to": -5}):
+            response = self.client.get(reverse("student_list"), params)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.context["filter"].errors)
+
+    def test_class_and_teacher_filters_use_typeahead(self):
+        data = generate(Scale(classes=3, lessons=2, staff=5))
+        other = SchoolClass.objects.exclude(pk=data.schoolclass).first()
+        response = self.client.get(
+            reverse("lesson_list"), {"schoolclass": data.schoolclass}
+        )
+        html = response.content.decode()
+        # Kun den valgte klasse står på siden, ikke en <option> pr. klasse
+        self.assertIn(f'name="schoolclass" value="{data.schoolclass}"', html)
+        self.assertNotIn(f'<option value="{other.pk}"', html)
+        self.assertNotIn(f'<option value="{data.staff}"', html)
+        lessons = response.context["object_list"]
+        self.assertTrue(lessons)
+        self.assertTrue(
+            all(lesson.schoolclass_id == data.schoolclass for lesson in lessons)
+        )
+
+        response = self.client.get(reverse("lesson_list"), {"teacher": data.staff})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'name="teacher" value="{data.staff}"', response.content.decode())
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.data = generate(Scale(departments=1, teams=2, classes=2, students=3))
+
+    def content(self, name, **kwargs):
+        response = self.client.get(reverse(name, kwargs=kwargs))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content)
+
+    def test_csv_export(self):
+        content = self.content("export_list", kind="students", fmt="csv")
+        rows = list(csv.reader(io.StringIO(content.decode("utf-8-sig")), delimiter=";"))
+        self.assertEqual(rows[0][:4], ["Navn", "Afdeling", "Team", "Klasse"])
+        self.assertEqual(len(rows) - 1, Student.objects.count())
+
+        content = self.content("export", kind="school", pk=self.data.school, fmt="csv")
+        rows = list(csv.reader(io.StringIO(content.decode("utf-8-sig")), delimiter=";"))
+        self.assertEqual(rows[0][:3], ["Afdeling", "Team", "Klasse"])
+        self.assertEqual(len(rows) - 1, SchoolClass.objects.count())
+
+    def test_export_streams_asynchronously_under_asgi(self):
+        async def fetch(url):
+            response = await self.async_client.get(url)
+            self.assertTrue(response.is_async)
+            return b"".join([chunk async for chunk in response.streaming_content])
+
+        url = reverse("export_list", kwargs={"kind": "students", "fmt": "csv"})
+        with self.assertNumQueries(1):
+            content = async_to_sync(fetch)(url)
+        self.assertEqual(
+            content, self.content("export_list", kind="students", fmt="csv")
+        )
+
+        url = reverse("export_list", kwargs={"kind": "lessons", "fmt": "xlsx"})
+        content = async_to_sync(fetch)(url)
+        sheet = load_workbook(io.BytesIO(content), read_only=True).active
+        self.assertEqual(len(list(sheet.iter_rows())) - 1, Lesson.objects.count())
+
+    def test_xlsx_export(self):
+        content = self.content("export_list", kind="lessons", fmt="xlsx")
+        sheet = load_workbook(io.BytesIO(content), read_only=True).active
+        rows = list(sheet.iter_rows(values_only=True))
+        self.assertEqual(rows[0], ("Klasse", "Fag", "Lokale", "Lærere"))
+        self.assertEqual(len(rows) - 1, Lesson.objects.count())
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        school = School.objects.create(name="Kløver-Skolen")
+        department = Department.objects.create(name="Afdeling 1", school=school)
+        self.team = Team.objects.create(name="Team A", department=department)
+        self.schoolclass = SchoolClass.objects.create(name="1A", team=self.team)
+        Student.objects.create(name="Anne Hansen", schoolclass=self.schoolclass)
+        Lesson.objects.create(
+            schoolclass=self.schoolclass, subject="Dansk", classroom="B12"
+        )
+
+    def labels(self, query):
+        return {
+            heading: [(entry.label, entry.context) for entry in entries]
+            for heading, entries in search(query)
+        }
+
+    def test_prefix_and_typo(self):
+        self.assertEqual(self.labels("ann han"), {"Elever": [("Anne Hansen", "1A")]})
+        self.assertEqual(self.labels("b12"), {"Lektioner": [("Dansk, B12", "1A")]})
+        self.assertEqual(self.labels("hamsen"), {"Elever": [("Anne Hansen", "1A")]})
+        self.assertEqual(self.labels("xyz"), {})
+
+    def test_index_follows_changes(self):
+        self.schoolclass.name = "1B"
+        self.schoolclass.save()
+        self.assertEqual(self.labels("anne"), {"Elever": [("Anne Hansen", "1B")]})
+
+        self.schoolclass.delete()
+        self.assertEqual(self.labels("anne"), {})
+        self.assertEqual(self.labels("team"), {"Teams": [("Team A", "Afdeling 1")]})
+
+    def test_backfill_migration(self):
+        before = self.labels("ann") | self.labels("b12") | self.labels("1a")
+        fields = ("kind", "object_id", "label", "context", "url")
+        entries = set(SearchEntry.objects.values_list(*fields))
+        SearchEntry.objects.all().delete()
+        self.assertEqual(self.labels("ann"), {})
+        migration = importlib.import_module(
+            "skole.migrations.0024_backfill_search_index"
+        )
+        migration.build_search_index(apps, None)
+        after = self.labels("ann") | self.labels("b12") | self.labels("1a")
+        self.assertEqual(after, before)
+        self.assertIn("Klasser", after)
+        # Migrationens kopi af kilderne giver de samme indgange som skole.search
+        self.assertEqual(set(SearchEntry.objects.values_list(*fields)), entries)
+
+
+class LessonCostTests(TestCase):
+    def setUp(self):
+        school = School.objects.create(name="Kløver-Skolen")
+        department = Department.objects.create(name="Afdeling 1", school=school)
+        team = Team.objects.create(name="Team A", department=department)
+        self.schoolclass = SchoolClass.objects.create(name="1A", team=team)
+        self.teacher_category = EmploymentCategory.objects.create(
+            name="Lærer", type="Lærer", price_pr_lesson=Decimal("500")
+        )
+        self.pedagogue_category = EmploymentCategory.objects.create(
+            name="Pædagog", type="Pædagog", price_pr_lesson=Decimal("300")
+        )
+        self.teacher = Staff.objects.create(
+            name="Anne", employment_category=self.teacher_category
+        )
+        self.pedagogue = Staff.objects.create(
+            name="Bo", employment_category=self.pedagogue_category
+        )
+        self.lesson = Lesson.objects.create(
+            schoolclass=self.schoolclass, subject="Dansk", classroom="B12"
+        )
+
+    def assertCost(self, cost, teacher_count):
+        self.lesson.refresh_from_db()
+        self.assertEqual(self.lesson.cost, Decimal(cost))
+        self.assertEqual(self.lesson.teacher_count, teacher_count)
+
+    def test_cost_follows_teachers_and_prices(self):
+        self.lesson.teachers.add(self.teacher, self.pedagogue)
+        self.assertCost(800, 2)
+
+        self.pedagogue.taught_lessons.remove(self.lesson)
+        self.assertCost(500, 1)
+
+        self.teacher.employment_category = self.pedagogue_category
+        self.teacher.save()
+        self.assertCost(300, 1)
+
+        self.pedagogue_category.price_pr_lesson = Decimal("350")
+        self.pedagogue_category.save()
+        self.assertCost(350, 1)
+
+        self.teacher.taught_lessons.clear()
+        self.assertCost(0, 0)
+
+    def test_deleting_teacher(self):
+        self.lesson.teachers.add(self.teacher, self.pedagogue)
+        self.teacher.delete()
+        self.assertCost(300, 1)
+
+
+class LessonCountTests(TestCase):
+    def setUp(self):
+        generate(Scale(classes=2, lessons=3, teachers=2, staff=4))
+        self.schoolclasses = list(SchoolClass.objects.all())
+        self.staff = list(Staff.objects.all())
+
+    def test_lessons_per_category_in_one_query(self):
+        with self.assertNumQueries(1):
+            per_class = SchoolClass.lessons_per_category(self.schoolclasses)
+        for schoolclass in self.schoolclasses:
+            # Den gamle beregning, lektion for lektion
+            expected = Counter(
+                teacher.employment_category.name
+                for lesson in schoolclass.lessons.all()
+                for teacher in lesson.teachers.all()
+            )
+            self.assertEqual(per_class[schoolclass.pk], expected)
+            self.assertEqual(schoolclass.total_lessons_per_category(), expected)
+
+    def test_lessons_taught(self):
+        with self.assertNumQueries(1):
+            per_class = Staff.total_lessons_taught_in_classes(self.schoolclasses)
+        for schoolclass in self.schoolclasses:
+            self.assertEqual(per_class[schoolclass.pk], 3 * 2)
+            self.assertEqual(Staff.total_lessons_taught_in_class(schoolclass), 3 * 2)
+        self.assertEqual(Staff.total_lessons_taught_in_class(0), 0)
+
+        with self.assertNumQueries(1):
+            per_staff = Staff.lessons_taught_by(self.staff)
+        for staff in self.staff:
+            self.assertEqual(per_staff.get(staff.pk, 0), staff.taught_lessons.count())
+
+
+class WorkloadTests(TestCase):
+    def setUp(self):
+        generate(Scale(classes=3, lessons=10, teachers=2, staff=60))
+        # Én ansat med lavt timetal bliver overbooket
+        self.busy = Staff.objects.order_by("pk").first()
+        self.busy.employment_grade = 1
+        self.busy.save()
+
+    def fetch_all(self, params):
+        url = reverse("staff_workload")
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        staff = list(response.context["object_list"])
+        while "next_query" in response.context:
+            response = self.client.get(f"{url}?{response.context['next_query']}")
+            staff += response.context["object_list"]
+        return staff
+
+    def test_figures_and_sorting(self):
+        staff = self.fetch_all({"sort": "-lessons"})
+        self.assertEqual(len(staff), 60)
+        self.assertEqual(len({s.pk for s in staff}), 60)
+        lessons = [s.lessons for s in staff]
+        self.assertEqual(lessons, sorted(lessons, reverse=True))
+        self.assertEqual(
+            {s.pk: s.lessons for s in staff if s.lessons},
+            Staff.lessons_taught_by(staff),
+        )
+        for member in staff:
+            price = member.employment_category.price_pr_lesson
+            self.assertEqual(member.cost, member.lessons * price)
+            self.assertAlmostEqual(
+                member.utilization, member.lessons * 100 / member.employment_grade
+            )
+
+        # Standardsorteringen er højeste udnyttelse først
+        self.assertEqual(self.fetch_all({})[0], self.busy)
+
+    def test_allocation_filter(self):
+        self.assertEqual(self.fetch_all({"allocation": "over"}), [self.busy])
+        under = self.fetch_all(
+            {
+                "allocation": "under",
+                "employment_category": self.busy.employment_category_id,
+            }
+        )
+        self.assertEqual(len(under), 29)
+        self.assertNotIn(self.busy, under)
+
+    def test_archived_classes_are_left_out(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            report = rollover(final_class_number=2)
+        self.assertTrue(report.archived)
+        current = Lesson.teachers.through.objects.exclude(
+            lesson__schoolclass__in=report.archived
+        ).values_list("staff", "lesson__schoolclass")
+        lessons = Counter(staff for staff, _ in current)
+        classes = Counter(staff for staff, _ in set(current))
+        staff = self.fetch_all({})
+        self.assertEqual({s.pk: s.lessons for s in staff if s.lessons}, lessons)
+        self.assertEqual({s.pk: s.classes for s in staff if s.classes}, classes)
+        self.assertEqual(Staff.lessons_taught_by(staff), lessons)
+
+
+class BudgetSnapshotTests(TestCase):
+    def setUp(self):
+        self.data = generate(Scale(lessons=2))
+        self.school = School.objects.get(pk=self.data.school)
+
+    def test_snapshot_survives_price_change(self):
+        last_year, this_year = BudgetSnapshot.objects.filter(
+            school=self.school
+        ).order_by("school_year__start_date")
+        cost_before = sum(row.cost for row in snapshot_classes(last_year))
+        self.assertEqual(
+            cost_before, ClassBudgetSummary.objects.aggregate(cost=Sum("cost"))["cost"]
+        )
+
+        category = EmploymentCategory.objects.get(pk=self.data.employment_category)
+        category.price_pr_lesson += 100
+        category.save()
+        added = (
+            100
+            * Lesson.teachers.through.objects.filter(
+                staff__employment_category=category
+            ).count()
+        )
+        snapshot = take_snapshot(self.school, this_year.school_year)
+
+        # Det gamle øjebliksbillede er uændret, det nye har de nye priser
+        self.assertEqual(
+            sum(row.cost for row in snapshot_classes(last_year)), cost_before
+        )
+        comparison = compare(last_year, snapshot)
+        self.assertEqual(comparison.total.cost_change, added)
+        self.assertEqual(
+            [change.name for change in comparison.price_changes], [category.name]
+        )
+        self.assertEqual(comparison.fee_changes, ())
+
+        response = self.client.get(
+            reverse("budget_compare", args=[self.school.pk]),
+            {"before": last_year.pk, "after": snapshot.pk},
+        )
+        self.assertEqual(response.context["comparison"].after, snapshot)
+
+    def test_snapshots_are_append_only(self):
+        snapshot = BudgetSnapshot.objects.first()
+        with self.assertRaises(ValueError):
+            snapshot.save()
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.data = generate(Scale(classes=2, students=3, lessons=2))
+        self.other_class = (
+            SchoolClass.objects.filter(team=self.data.team)
+            .exclude(pk=self.data.schoolclass)
+            .get()
+        )
+        self.other_team = Team.objects.exclude(pk=self.data.team).first()
+
+    def get(self, name, pk):
+        return self.client.get(reverse(name, args=[pk]))
+
+    def versions(self):
+        return {
+            "class": fragments.fragment_version("schoolclass", self.data.schoolclass),
+            "other_class": fragments.fragment_version(
+                "schoolclass", self.other_class.pk
+            ),
+            "team": fragments.fragment_version("team", self.data.team),
+            "other_team": fragments.fragment_version("team", self.other_team.pk),
+            "department": fragments.fragment_version(
+                "department", self.data.department
+            ),
+            "school": fragments.fragment_version("school", self.data.school),
+        }
+
+    def test_cached_page_skips_queries(self):
+        self.get("schoolclass_detail", self.data.schoolclass)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get("schoolclass_detail", self.data.schoolclass)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(
+            [q for q in queries if "skole_student" in q["sql"]],
+            queries.captured_queries,
+        )
+        self.assertEqual(self.get("schoolclass_detail", 0).status_code, 404)
+        self.assertEqual(self.get("team_detail", 0).status_code, 404)
+        self.assertEqual(self.get("department_detail", 0).status_code, 404)
+
+    @override_settings(
+        CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+                "LOCATION": "test_cache",
+            }
+        }
+    )
+    def test_detail_pages_with_database_cache(self):
+        # Standarden uden DEBUG; cachen må ikke kaldes synkront fra de async views
+        call_command("createcachetable", verbosity=0)
+        pages = [
+            ("schoolclass_detail", self.data.schoolclass),
+            ("team_detail", self.data.team),
+            ("department_detail", self.data.department),
+        ]
+        for name, pk in pages:
+            first = self.get(name, pk)
+            self.assertEqual(first.status_code, 200, name)
+            self.assertEqual(self.get(name, pk).content, first.content)
+
+    def test_evicted_fragment_is_rendered_with_data(self):
+        for name in ("schoolclass_detail", "team_detail"):
+            pk = (
+                self.data.schoolclass
+                if name == "schoolclass_detail"
+                else self.data.team
+            )
+            before = self.get(name, pk).content
+            # Et fragment, der forsvinder fra cachen, efter at siden er
+            # begyndt at renderes, må ikke blive gemt tomt
+            kind = name.removesuffix("_detail")
+            version = fragments.fragment_version(kind, pk)
+            cache.delete(make_template_fragment_key(f"{kind}_header", [pk, version]))
+            self.assertEqual(self.get(name, pk).content, before)
+            self.assertEqual(self.get(name, pk).content, before)
+
+    def test_student_edit_invalidates_class_and_ancestors(self):
+        self.get("schoolclass_detail", self.data.schoolclass)
+        before = self.versions()
+
+        student = Student.objects.get(pk=self.data.student)
+        student.name = "Omdøbt Elev"
+        with self.captureOnCommitCallbacks(execute=True):
+            student.save()
+
+        after = self.versions()
+        changed = {name for name in before if before[name] != after[name]}
+        self.assertEqual(changed, {"class", "team", "department", "school"})
+        self.assertContains(
+            self.get("schoolclass_detail", self.data.schoolclass), "Omdøbt Elev"
+        )
+
+    def test_team_rename_updates_breadcrumbs(self):
+        self.get("schoolclass_detail", self.data.schoolclass)
+        team = Team.objects.get(pk=self.data.team)
+        team.name = "Nyt teamnavn"
+        with self.captureOnCommitCallbacks(execute=True):
+            team.save()
+        self.assertContains(
+            self.get("schoolclass_detail", self.data.schoolclass), "Nyt teamnavn"
+        )
+
+
+class StaticAssetTests(TestCase):
+    def test_pages_load_assets_from_own_origin(self):
+        generate(Scale(departments=1, teams=1, classes=1, students=1, lessons=1))
+        response = self.client.get(reverse("homepage"))
+        urls = re.findall(
+            r'(?:src|href)="([^"]+\.(?:css|js)[^"]*)"', response.content.decode()
+        )
+        self.assertTrue(urls)
+        for url in urls:
+            self.assertTrue(url.startswith("/static/"), url)
+
+    def test_collectstatic_hashes_and_compresses(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(
+            STATIC_ROOT=root,
+            STORAGES={
+                "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+                "staticfiles": {
+                    "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"
+                },
+            },
+        ):
+            call_command("collectstatic", interactive=False, verbosity=0)
+            [bundle] = Path(root, "vendor").glob("vendor.min.*.css")
+            self.assertTrue(bundle.with_name(bundle.name + ".gz").exists())
+            self.assertTrue(bundle.with_name(bundle.name + ".br").exists())
+            # Skrifttyperne, CSS'en henviser til, har også fået hash i navnet
+            for url in re.findall(r'url\("(fonts/[^")?]+)', bundle.read_text()):
+                self.assertRegex(url, r"\.[0-9a-f]{12}\.woff2?$")
+                self.assertTrue(Path(root, "vendor", url).exists(), url)
+
+
+class AdminTests(TestCase):
+    scale = Scale(departments=1, teams=2, classes=2, students=3, lessons=2, staff=4)
+
+    def setUp(self):
+        self.client.force_login(
+            User.objects.create_superuser("admin", "admin@example.com", "x")
+        )
+
+    def changelist_queries(self):
+        counts = {}
+        for model in admin.site._registry:
+            if model._meta.app_label != "skole":
+                continue
+            url = reverse(f"admin:skole_{model._meta.model_name}_changelist")
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            counts[model._meta.model_name] = len(queries)
+        return counts
+
+    def test_changelist_queries_are_flat(self):
+        generate(self.scale)
+        small = self.changelist_queries()
+        generate(self.scale.scaled(3))
+        self.assertEqual(self.changelist_queries(), small)
+
+    def bulk_action(self, action, students, **target):
+        url = reverse("admin:skole_student_changelist")
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                url,
+                {
+                    "action": action,
+                    "_selected_action": [student.pk for student in students],
+                    **target,
+                },
+            )
+
+    def test_move_students(self):
+        data = generate(self.scale)
+        students = list(Student.objects.filter(schoolclass=data.schoolclass))
+        target = SchoolClass.objects.exclude(pk=data.schoolclass).first()
+
+        self.bulk_action("move_to_schoolclass", students, schoolclass=target.pk)
+
+        self.assertEqual(
+            Student.objects.filter(schoolclass=target).count(), 2 * len(students)
+        )
+        summaries = dict(
+            ClassBudgetSummary.objects.filter(
+                schoolclass__in=[data.schoolclass, target.pk]
+            ).values_list("schoolclass", "num_students")
+        )
+        self.assertEqual(summaries[data.schoolclass], 0)
+        self.assertEqual(summaries[target.pk], 2 * len(students))
+        self.assertEqual(
+            set(
+                SearchEntry.objects.filter(
+                    kind="student", object_id__in=[s.pk for s in students]
+                ).values_list("context", flat=True)
+            ),
+            {target.name},
+        )
+
+    def test_change_school_fee_requires_target(self):
+        data = generate(self.scale)
+        students = list(Student.objects.filter(schoolclass=data.schoolclass))
+        fee = SchoolFee.objects.exclude(pk=data.school_fee).get()
+
+        # Uden en valgt takst ændres intet
+        selected = Student.objects.filter(pk__in=[s.pk for s in students])
+        self.bulk_action("change_school_fee", students)
+        self.assertEqual(selected.filter(school_fee=fee).count(), 1)
+
+        self.bulk_action("change_school_fee", students, school_fee=fee.pk)
+        self.assertEqual(selected.filter(school_fee=fee).count(), 3)
+        summary = ClassBudgetSummary.objects.get(schoolclass=data.schoolclass)
+        self.assertEqual(summary.school_fee, 3 * fee.amount)
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        self.data = generate(Scale(staff=30))
+
+    def test_lookup_is_limited_prefix_match(self):
+        results = autocomplete.lookup("staff", "ansat 1", limit=5)
+        self.assertEqual(len(results), 5)
+        for pk, label in results:
+            self.assertTrue(label.startswith("Ansat 1"), label)
+        self.assertEqual(autocomplete.lookup("staff", "xyz"), [])
+        self.assertEqual(
+            autocomplete.lookup("schoolfee", "special"),
+            [(fee.pk, str(fee)) for fee in SchoolFee.objects.filter(level=2)],
+        )
+
+    def test_lookup_without_search_index(self):
+        # Fx lige efter en migrering, før indekset er bygget
+        SearchEntry.objects.all().delete()
+        schoolclass = SchoolClass.objects.get(pk=self.data.schoolclass)
+        self.assertIn(
+            (schoolclass.pk, f"{schoolclass.name} ({schoolclass.team.name})"),
+            autocomplete.lookup("schoolclass", schoolclass.name[:2]),
+        )
+        results = autocomplete.lookup("staff", "ansat 1", limit=5)
+        self.assertEqual(len(results), 5)
+        self.assertEqual(
+            autocomplete.selected("staff", [results[1][0], results[0][0]]),
+            [results[1], results[0]],
+        )
+        self.assertEqual(autocomplete.lookup("staff", "xyz"), [])
+
+    def test_pick_and_remove(self):
+        url = reverse("autocomplete")
+        params = {"kind": "staff", "field": "teachers", "multiple": "1"}
+        response = self.client.get(
+            url, {**params, "teachers": [1, 2], "pick": 3, "id": "id_teachers"}
+        )
+        html = response.content.decode()
+        for pk in (1, 2, 3):
+            self.assertIn(f'name="teachers" value="{pk}"', html)
+
+        response = self.client.get(url, {**params, "teachers": [1, 2], "remove": 1})
+        self.assertNotIn('name="teachers" value="1"', response.content.decode())
+        self.assertEqual(self.client.get(url, {"kind": "x"}).status_code, 404)
+
+    def test_form_validates_submitted_ids_only(self):
+        data = {
+            "schoolclass": self.data.schoolclass,
+            "subject": "Dansk",
+            "classroom": "A1",
+            "teachers": [self.data.staff],
+        }
+        with CaptureQueriesContext(connection) as queries:
+            form = LessonForm(data)
+            self.assertTrue(form.is_valid(), form.errors)
+        # Klassen og lærerne slås op på id, og modelvalideringen tjekker
+        # fremmednøglen, uanset hvor mange klasser og ansatte der er
+        self.assertEqual(len(queries), 3)
+
+        form = LessonForm({**data, "teachers": [self.data.staff, 0]})
+        self.assertIn("teachers", form.errors)
+
+
+class SchoolClassGridTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.data = generate(Scale(students=30, lessons=3))
+        self.url = reverse("schoolclass_grid", args=[self.data.schoolclass])
+
+    def post_data(self, response, change=lambda prefix, row: row):
+        """POST-data med tabellens nuværende værdier, ændret af `change`."""
+        data = {}
+        for name in ("student_grid", "lesson_grid"):
+            grid = response.context[name]
+            management = grid.management_form
+            for field in management:
+                data[field.html_name] = management[field.name].value()
+            for i, form in enumerate(grid):
+                row = {
+                    key: "" if value is None else value
+                    for key, value in form.initial.items()
+                }
+                for key, value in change(grid.prefix, row).items():
+                    data[f"{grid.prefix}-{i}-{key}"] = value
+        return data
+
+    def test_bulk_edit(self):
+        fee = SchoolFee.objects.get(level=2)
+        other = SchoolClass.objects.filter(team=self.data.team).exclude(
+            pk=self.data.schoolclass
+        )[0]
+        moved = Student.objects.filter(schoolclass=self.data.schoolclass).first()
+
+        def change(prefix, row):
+            if prefix == "students":
+                row["school_fee"] = fee.pk
+                if row["id"] == moved.pk:
+                    row["schoolclass"] = other.pk
+            elif prefix == "lessons":
+                row["classroom"] = "Nyt lokale"
+            return row
+
+        data = self.post_data(self.client.get(self.url), change)
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(self.url, data)
+        self.assertRedirects(
+            response,
+            reverse("schoolclass_detail", args=[self.data.schoolclass]),
+            fetch_redirect_response=False,
+        )
+        # Et fast antal forespørgsler, uanset hvor mange rækker der ændres
+        self.assertLess(len(queries), 35)
+
+        summary = ClassBudgetSummary.objects.get(schoolclass=self.data.schoolclass)
+        self.assertEqual(summary.num_students, 29)
+        self.assertEqual(summary.school_fee, 29 * fee.amount)
+        moved.refresh_from_db()
+        self.assertEqual(moved.schoolclass, other)
+        self.assertEqual(
+            SearchEntry.objects.get(kind="student", object_id=moved.pk).context,
+            other.name,
+        )
+        self.assertEqual(
+            set(
+                Lesson.objects.filter(schoolclass=self.data.schoolclass).values_list(
+                    "classroom", flat=True
+                )
+            ),
+            {"Nyt lokale"},
+        )
+
+    def test_rows_from_another_class_are_rejected(self):
+        stranger = Student.objects.exclude(schoolclass=self.data.schoolclass).first()
+
+        def change(prefix, row):
+            if prefix == "students" and row["name"].endswith("-1"):
+                row["id"] = stranger.pk
+                row["name"] = "Overtaget"
+            return row
+
+        data = self.post_data(self.client.get(self.url), change)
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["student_grid"].non_form_errors())
+        stranger.refresh_from_db()
+        self.assertNotEqual(stranger.name, "Overtaget")
+
+    def test_stale_grid(self):
+        response = self.client.get(self.url)
+        first = response.context["student_grid"].forms[0].initial
+        renamed = response.context["student_grid"].forms[1].initial
+
+        def change(prefix, row):
+            if prefix == "students" and row["id"] == renamed["id"]:
+                row["name"] = "Omdøbt"
+            return row
+
+        data = self.post_data(response, change)
+        # En elev, der sorteres først, er kommet til, siden tabellen blev hentet
+        Student.objects.create(name="Aaa", schoolclass_id=self.data.schoolclass)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            list(Student.objects.filter(name="Omdøbt").values_list("pk", flat=True)),
+            [renamed["id"]],
+        )
+        self.assertEqual(Student.objects.get(pk=first["id"]).name, first["name"])
+
+        # En elev i tabellen er slettet i mellemtiden
+        Student.objects.filter(pk=first["id"]).delete()
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["student_grid"].non_form_errors())
+
+
+class RolloverTests(TestCase):
+    def setUp(self):
+        self.data = generate(
+            Scale(departments=1, teams=1, classes=10, students=2, lessons=1)
+        )
+        self.reception = SchoolClass.objects.create(
+            name="Modtageklassen", team_id=self.data.team, age_number=5
+        )
+
+    def classes(self):
+        return {
+            schoolclass.name.split()[0]: schoolclass
+            for schoolclass in SchoolClass.objects.exclude(pk=self.reception.pk)
+        }
+
+    def test_dry_run_changes_nothing(self):
+        before = list(SchoolClass.objects.values_list("name", "age_number"))
+        report = rollover(dry_run=True)
+        self.assertEqual(
+            list(SchoolClass.objects.values_list("name", "age_number")), before
+        )
+        self.assertEqual(len(report.promoted), 9)
+        self.assertEqual(len(report.archived), 1)
+        self.assertEqual([c.name for c in report.skipped], ["Modtageklassen"])
+        self.assertEqual(report.students, 18)
+        change = next(c for c in report.changes if c.name.startswith("3A"))
+        self.assertEqual(
+            (change.new_name.split()[0], change.new_group), ("4A", SchoolClass.MEL)
+        )
+
+    def test_rollover(self):
+        student = Student.objects.filter(schoolclass__name__startswith="6A").first()
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                report = rollover()
+        self.assertEqual(report.students, 18)
+        # Oprykningen selv er tre UPDATE-sætninger, uanset antallet af klasser
+        updates = [
+            q["sql"]
+            for q in queries
+            if q["sql"].startswith(
+                ('UPDATE "skole_schoolclass"', 'UPDATE "skole_student"')
+            )
+        ]
+        self.assertEqual(len(updates), 3, updates)
+
+        classes = self.classes()
+        self.assertEqual(sorted(classes), [f"{n}A" for n in range(1, 10)])
+        self.assertEqual(
+            [
+                (c.class_number, c.age_number, c.class_group)
+                for c in (classes["1A"], classes["4A"], classes["7A"])
+            ],
+            [(1, 1, SchoolClass.IND), (4, 4, SchoolClass.MEL), (7, 7, SchoolClass.UDS)],
+        )
+        graduated = SchoolClass.all_objects.get(archived=True)
+        self.assertTrue(graduated.name.startswith("9A"))
+        self.assertFalse(SchoolClass.objects.filter(pk=graduated.pk).exists())
+        self.assertFalse(
+            ClassBudgetSummary.objects.filter(schoolclass=graduated).exists()
+        )
+        self.assertNotIn(graduated.pk, class_figures())
+        self.assertFalse(
+            SearchEntry.objects.filter(kind="schoolclass", object_id=graduated.pk)
+        )
+        self.reception.refresh_from_db()
+        self.assertEqual(
+            (self.reception.name, self.reception.age_number), ("Modtageklassen", 5)
+        )
+
+        student.refresh_from_db()
+        self.assertEqual(student.age_number, 7)
+        self.assertEqual(student.schoolclass.name, classes["7A"].name)
+        self.assertEqual(
+            SearchEntry.objects.get(kind="student", object_id=student.pk).context,
+            student.schoolclass.name,
+        )
+        self.assertEqual(
+            SearchEntry.objects.get(
+                kind="schoolclass", object_id=student.schoolclass_id
+            ).label,
+            student.schoolclass.name,
+        )
+
+    def test_command_and_admin_action(self):
+        out = io.StringIO()
+        call_command("rollover_school_year", "--dry-run", stdout=out)
+        self.assertIn(
+            "Tørkørsel: ville rykke 9 klasser og 18 elever op", out.getvalue()
+        )
+        self.assertFalse(SchoolClass.all_objects.filter(archived=True).exists())
+
+        self.client.force_login(
+            User.objects.create_superuser("admin", "admin@example.com", "x")
+        )
+        url = reverse("admin:skole_school_changelist")
+        action = {
+            "action": "rollover_school_year",
+            "_selected_action": [self.data.school],
+        }
+        # Første POST viser kun, hvad der vil ske
+        response = self.client.post(url, action)
+        self.assertTemplateUsed(
+            response, "admin/skole/school/rollover_confirmation.html"
+        )
+        self.assertContains(response, "9 klasser og 18 elever")
+        self.assertFalse(SchoolClass.all_objects.filter(archived=True).exists())
+
+        school_year = SchoolYear.objects.first()
+        confirmed = {**action, "post": "yes", "school_year": school_year.pk}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, confirmed)
+        self.assertEqual(SchoolClass.all_objects.filter(archived=True).count(), 1)
+        self.assertEqual(
+            School.objects.get(pk=self.data.school).school_year, school_year
+        )
+
+        # En oprykning til samme skoleår igen afvises
+        names = sorted(SchoolClass.objects.values_list("name", flat=True))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, confirmed, follow=True)
+        self.assertContains(response, "Allerede rykket op til")
+        self.assertEqual(
+            sorted(SchoolClass.objects.values_list("name", flat=True)), names
+        )
+        self.assertEqual(SchoolClass.all_objects.filter(archived=True).count(), 1)
+
+        response = self.client.get(
+            reverse("admin:skole_schoolclass_changelist"), {"archived__exact": "1"}
+        )
+        self.assertContains(response, "9A")
 
-# Create your tests here.
+        # Autocomplete til fremmednøglerne tilbyder ikke de arkiverede klasser
+        response = self.client.get(
+            reverse("admin:autocomplete"),
+            {
+                "app_label": "skole",
+                "model_name": "lesson",
+                "field_name": "schoolclass",
+                "term": "9A",
+            },
+        )
+        # Kun den nye 9A (tidligere 8A), ikke den arkiverede
+        self.assertEqual(
+            [int(result["id"]) for result in response.json()["results"]],
+            [SchoolClass.objects.get(name__startswith="9A").pk],
+        )
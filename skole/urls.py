@@ -35,11 +35,21 @@ from .views import (
     TeamDetailView,
     TeamEditView,
     TeamListView,
+    WorkloadListView,
+    autocomplete_view,
+    budget_compare,
+    budget_overview,
+    department_budget,
     department_detail,
     department_edit,
+    export_view,
     homepage,
+    import_upload,
+    school_budget,
     schoolclass_detail,
     schoolclass_edit,
+    schoolclass_grid,
+    search_view,
     student_detail,
     student_edit,
     team_detail,
@@ -49,10 +59,38 @@ from .views import (
 urlpatterns = [
     # Home
     path("", homepage, name="homepage"),
+    # Søgning
+    path("search/", search_view, name="search"),
+    path("autocomplete/", autocomplete_view, name="autocomplete"),
+    # Import og eksport
+    path("import/", import_upload, name="import_upload"),
+    path(
+        "export/<str:kind>/<int:pk>.<str:fmt>",
+        export_view,
+        name="export",
+    ),
+    path(
+        "export/<str:kind>.<str:fmt>",
+        export_view,
+        name="export_list",
+    ),
     # School
     path("schools/", SchoolListView.as_view(), name="school_list"),
     path("school/<int:pk>/", SchoolDetailView.as_view(), name="school_detail"),
     path("school/<int:pk>/edit/", SchoolEditView.as_view(), name="school_edit"),
+    # Budget
+    path("budget/", budget_overview, name="budget_overview"),
+    path("school/<int:school_id>/budget/", school_budget, name="school_budget"),
+    path(
+        "school/<int:school_id>/budget/compare/",
+        budget_compare,
+        name="budget_compare",
+    ),
+    path(
+        "department/<int:department_id>/budget/",
+        department_budget,
+        name="department_budget",
+    ),
     # Department
     path("departments/", DepartmentListView.as_view(), name="department_list"),
     path(
@@ -79,12 +117,21 @@ urlpatterns = [
         schoolclass_detail,
         name="schoolclass_detail",
     ),
-    path("schoolclass/create/", SchoolClassCreateView.as_view(), name="schoolclass_create"),
+    path(
+        "schoolclass/create/",
+        SchoolClassCreateView.as_view(),
+        name="schoolclass_create",
+    ),
     path(
         "schoolclass/<int:class_id>/edit/",
         schoolclass_edit,
         name="schoolclass_edit",
     ),
+    path(
+        "schoolclass/<int:class_id>/grid/",
+        schoolclass_grid,
+        name="schoolclass_grid",
+    ),
     path("schoolclasses/", SchoolClassListView.as_view(), name="schoolclass_list"),
     # Lesson
     path("lessons/", LessonListView.as_view(), name="lesson_list"),
@@ -131,4 +178,5 @@ urlpatterns = [
     path("staff/create/", StaffCreateView.as_view(), name="staff_create"),
     path("staff/<int:pk>/", StaffDetailView.as_view(), name="staff_detail"),
     path("staff/<int:pk>/edit/", StaffEditView.as_view(), name="staff_edit"),
+    path("staff/workload/", WorkloadListView.as_view(), name="staff_workload"),
 ]
@@ -1,25 +1,53 @@
-from collections import defaultdict
+import asyncio
+from functools import partial
+from operator import attrgetter
 
+from asgiref.sync import sync_to_async
 from django.contrib import messages
-from django.db.models import CharField, Count, F, Prefetch, Sum, Value
-from django.db.models.functions import Concat
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import Http404, HttpResponse, HttpResponseBadRequest
 from django.shortcuts import get_object_or_404, redirect, render
-from django.urls import reverse_lazy
+from django.template.loader import render_to_string
+from django.urls import reverse, reverse_lazy
 from django.views.generic import DetailView, ListView
 from django.views.generic.edit import CreateView, UpdateView
 
+from .budget import ClassBudget, TeamBudget, alist, rollup
+from .exports import (
+    FORMATS,
+    class_budget_rows,
+    classes_budget_rows,
+    export_response,
+    lesson_rows,
+    student_rows,
+    team_budget_rows,
+)
+from . import autocomplete, fragments, workload
+from .filters import LessonFilter, StaffFilter, StudentFilter, WorkloadFilter
 from .forms import (
     DepartmentForm,
     EmploymentCategoryForm,
+    ImportForm,
     LessonForm,
+    LessonGrid,
     SchoolClassForm,
     SchoolFeeForm,
     SchoolForm,
     StaffForm,
     StudentForm,
+    StudentGrid,
     TeamForm,
 )
+from .importers import IMPORTERS, read_rows
+from .pagination import InvalidCursor, paginate
+from .search import index_objects, search
+from .signals import schoolclasses_changed
+from .snapshots import compare
+from .widgets import TypeaheadSelect, TypeaheadSelectMultiple
 from .models import (
+    BudgetSnapshot,
+    ClassBudgetSummary,
     Department,
     EmploymentCategory,
     Lesson,
@@ -32,78 +60,34 @@ from .models import (
 )
 
 
-def schoolclass_detail(request, class_id):
-    schoolclass = SchoolClass.objects.annotate(
-        total_school_fee=Sum("students__school_fee__amount")
-    ).get(pk=class_id)
-    lessons = (
-        Lesson.objects.filter(schoolclass=schoolclass)
-        .annotate(
-            teacher_name=Concat("teachers__name", Value(""), output_field=CharField()),
-            total_lessons=Count("id"),
-            employment_category=F("teachers__employment_category__name"),
-            price_per_lesson=F("teachers__employment_category__price_pr_lesson"),
-        )
-        .values(
-            "teacher_name",
-            "employment_category",
-            "subject",
-            "classroom",
-            "price_per_lesson",
-        )
-        .annotate(total_lessons_per_teacher=Count("id"))
-        .order_by("teacher_name", "subject")
-    )
-
-    # Calculate total hours per employment category
-    total_hours = defaultdict(int)
-    for lesson in lessons:
-        total_hours[lesson["employment_category"]] += lesson[
-            "total_lessons_per_teacher"
-        ]
+async def arender(request, template_name, context):
+    """
+    render() fra et async view. Skabelonen og kontekstprocessorerne
+    (navigation, brugeren, beskeder) kan slå op i databasen og køres derfor
+    som synkron kode.
+    """
+    return await sync_to_async(render)(request, template_name, context)
 
-    # Convert total_hours to a list of tuples
-    total_hours_list = [(category, hours) for category, hours in total_hours.items()]
 
-    # Calculate total sum
-    total_sum = sum(total_hours.values())
+async def _schoolclass_context(class_id):
+    try:
+        budget = await ClassBudget.afor_class(class_id)
+    except SchoolClass.DoesNotExist:
+        raise Http404("Klassen findes ikke")
+    return {"schoolclass": budget.schoolclass, "budget": budget}
 
-    # Calculate total number of lessons in the class
-    total_lessons_in_class = Lesson.objects.filter(schoolclass=schoolclass).count()
 
-    # Beregn totalprisen for hver lektion baseret på prisen per lektion og antallet af lektioner
-    for lesson in lessons:
-        lesson["total_price"] = (
-            lesson["total_lessons_per_teacher"] * lesson["price_per_lesson"]
+async def schoolclass_detail(request, class_id):
+    # Siden består af fragmenter cachet under klassens version (se
+    # skole.fragments); budgettet hentes kun, hvis et af dem mangler
+    version = await fragments.afragment_version("schoolclass", class_id)
+    context = {"class_id": class_id, "version": version, "timeout": fragments.TIMEOUT}
+    context.update(
+        fragments.lazy_context(
+            partial(_schoolclass_context, class_id), ["schoolclass", "budget"]
         )
-
-    # Beregn den samlede pris for klassen ved at summere prisen for hver lektion
-    total_price_for_class = sum(lesson["total_price"] for lesson in lessons)
-
-    # Overskud? og forbrugs%
-    surplus = 0
-    percentage_used = 0
-    if schoolclass.total_school_fee and total_price_for_class:
-        if schoolclass.total_school_fee > 0 and total_price_for_class > 0:
-            surplus = int(schoolclass.total_school_fee - total_price_for_class)
-            percentage_used = round(
-                (total_price_for_class / schoolclass.total_school_fee) * 100, 1
-            )
-
-    return render(
-        request,
-        "skole/schoolclass_detail.html",
-        {
-            "schoolclass": schoolclass,
-            "lessons": lessons,
-            "total_hours": total_hours_list,
-            "total_sum": total_sum,
-            "total_lessons_in_class": total_lessons_in_class,
-            "total_price_for_class": total_price_for_class,
-            "surplus": surplus,
-            "percentage_used": percentage_used,
-        },
     )
+    return await arender(request, "skole/schoolclass_detail.html", context)
 
 
 def schoolclass_edit(request, class_id):
@@ -130,153 +114,162 @@ def schoolclass_edit(request, class_id):
     )
 
 
-def homepage(request):
+async def homepage(request):
     schoolclasses = SchoolClass.objects.all()
     teams = Team.objects.all()
     departments = Department.objects.all()
 
-    return render(
+    return await arender(
         request,
         "skole/homepage.html",
         {"schoolclasses": schoolclasses, "teams": teams, "departments": departments},
     )
 
 
-def team_detail(request, team_id):
-    team = get_object_or_404(Team, pk=team_id)
+async def _team_context(team_id):
+    try:
+        budget = await TeamBudget.afor_team(team_id)
+    except Team.DoesNotExist:
+        raise Http404("Teamet findes ikke")
+    return {
+        "team": budget.team,
+        "budget": budget,
+        # Formatting of numbers as DKK
+        "total_school_fee_for_team_formatted": f"{budget.school_fee:.0f} DKK",
+        "total_price_for_team_formatted": f"{budget.total_price_for_team:.0f} DKK",
+        "surplus_formatted": f"{budget.surplus:.0f} DKK",
+    }
 
-    # Prefetch students, school fees, lessons, and teachers with employment categories
-    schoolclasses = (
-        SchoolClass.objects.filter(team=team)
-        .prefetch_related(
-            Prefetch(
-                "students",
-                queryset=Student.objects.select_related("school_fee"),
-            ),
-            Prefetch(
-                "lessons",
-                queryset=Lesson.objects.select_related("schoolclass").prefetch_related(
-                    Prefetch(
-                        "teachers",
-                        queryset=Staff.objects.select_related("employment_category"),
-                    )
-                ),
-            ),
+
+async def team_detail(request, team_id):
+    version = await fragments.afragment_version("team", team_id)
+    context = {"team_id": team_id, "version": version, "timeout": fragments.TIMEOUT}
+    context.update(
+        fragments.lazy_context(
+            partial(_team_context, team_id),
+            [
+                "team",
+                "budget",
+                "total_school_fee_for_team_formatted",
+                "total_price_for_team_formatted",
+                "surplus_formatted",
+            ],
         )
-        .select_related("team")
     )
+    return await arender(request, "skole/team_detail.html", context)
 
-    employment_categories = list(EmploymentCategory.objects.all())
-
-    summary_data = []
-    totals = {
-        "num_students": 0,
-        "school_fee": 0,
-        "num_lessons": 0,
-    }
-    total_price_for_team = 0
-    total_hours_by_category = defaultdict(int)
-    total_school_fee_for_team = 0
-
-    lessons_data = []  # Collect all lessons for efficient aggregation
-
-    for schoolclass in schoolclasses:
-        # Collect all lessons data for aggregation
-        for lesson in schoolclass.lessons.all():
-            lessons_data.append(
-                {
-                    "teacher_name": (
-                        lesson.teachers.first().name if lesson.teachers.exists() else ""
-                    ),
-                    "employment_category": (
-                        lesson.teachers.first().employment_category.name
-                        if lesson.teachers.exists()
-                        else ""
-                    ),
-                    "price_per_lesson": (
-                        lesson.teachers.first().employment_category.price_pr_lesson
-                        if lesson.teachers.exists()
-                        else 0
-                    ),
-                    "schoolclass_id": lesson.schoolclass_id,
-                }
-            )
 
-        # Calculate total school fee for this class
-        students = schoolclass.students.all()
-        total_school_fee_for_class = sum(
-            student.school_fee.amount for student in students if student.school_fee
-        )
-        total_school_fee_for_team += total_school_fee_for_class
+def budget_overview(request):
+    summaries = ClassBudgetSummary.objects.select_related(
+        "schoolclass__team__department__school"
+    ).order_by("schoolclass__team__department__school__name")
+    rows, total = rollup(summaries, lambda s: s.schoolclass.team.department.school)
 
-        # Calculate number of students in the class
-        num_students = len(students)
-        totals["num_students"] += num_students
+    return render(
+        request,
+        "skole/budget_rollup.html",
+        {
+            "title": "Alle skoler",
+            "rows": rows,
+            "total": total,
+            "row_url_name": "school_budget",
+        },
+    )
 
-        # Calculate total school_fee for the class
-        sum_school_fee = sum(
-            student.school_fee.amount for student in students if student.school_fee
-        )
-        totals["school_fee"] += sum_school_fee
-
-        # Number of lessons is already prefetched
-        num_lessons = schoolclass.lessons.count()
-        totals["num_lessons"] += num_lessons
-
-        # Add summary data for this class
-        summary_data.append(
-            {
-                "class_name": schoolclass.name,
-                "num_students": num_students,
-                "sum_school_fee": sum_school_fee,
-                "total_price_for_class": 0,  # Calculate later
-                "num_lessons": num_lessons,
-                "employment_categories": employment_categories,
-            }
-        )
 
-    # Aggregate lessons data efficiently
-    total_price_for_team = sum(lesson["price_per_lesson"] for lesson in lessons_data)
+def school_budget(request, school_id):
+    school = get_object_or_404(School, pk=school_id)
+    summaries = (
+        ClassBudgetSummary.objects.filter(schoolclass__team__department__school=school)
+        .select_related("schoolclass__team__department")
+        .order_by("schoolclass__team__department__name")
+    )
+    rows, total = rollup(summaries, lambda s: s.schoolclass.team.department)
 
-    # Convert total_hours_by_category to a list of tuples
-    total_hours_list = [
-        (category, hours) for category, hours in total_hours_by_category.items()
-    ]
+    return render(
+        request,
+        "skole/budget_rollup.html",
+        {
+            "title": school.name,
+            "school": school,
+            "rows": rows,
+            "total": total,
+            "row_url_name": "department_budget",
+        },
+    )
 
-    # Calculate total surplus for the team
-    surplus = total_school_fee_for_team - total_price_for_team
 
-    # Calculate percentage of school fee used
-    percentage_used = (
-        round((total_price_for_team / total_school_fee_for_team) * 100, 1)
-        if total_school_fee_for_team > 0
-        else 0
+def department_budget(request, department_id):
+    department = get_object_or_404(
+        Department.objects.select_related("school"), pk=department_id
     )
-
-    # Formatting of numbers as DKK
-    total_school_fee_for_team_formatted = f"{total_school_fee_for_team:.0f} DKK"
-    total_price_for_team_formatted = f"{total_price_for_team:.0f} DKK"
-    surplus_formatted = f"{surplus:.0f} DKK"
+    summaries = (
+        ClassBudgetSummary.objects.filter(schoolclass__team__department=department)
+        .select_related("schoolclass__team")
+        .order_by("schoolclass__team__name")
+    )
+    rows, total = rollup(summaries, lambda s: s.schoolclass.team)
 
     return render(
         request,
-        "skole/team_detail.html",
+        "skole/budget_rollup.html",
         {
-            "team": team,
-            "summary_data": summary_data,
-            "totals": totals,
-            "total_hours": total_hours_list,
-            "total_price_for_team": total_price_for_team,
-            "total_school_fee_for_team": total_school_fee_for_team,
-            "total_school_fee_for_team_formatted": total_school_fee_for_team_formatted,
-            "total_price_for_team_formatted": total_price_for_team_formatted,
-            "surplus_formatted": surplus_formatted,
-            "surplus": surplus,
-            "percentage_used": percentage_used,
+            "title": department.name,
+            "school": department.school,
+            "department": department,
+            "rows": rows,
+            "total": total,
+            "row_url_name": "team_detail",
         },
     )
 
 
+def _default_snapshots(snapshots):
+    """Det nyeste øjebliksbillede og det nyeste fra et andet skoleår før det."""
+    after = snapshots[0]
+    before = next(
+        (s for s in snapshots if s.school_year_id != after.school_year_id),
+        snapshots[1],
+    )
+    return before.pk, after.pk
+
+
+def budget_compare(request, school_id):
+    school = get_object_or_404(School, pk=school_id)
+    # Listen til valgfelterne henter ikke selve dataene
+    snapshots = list(
+        BudgetSnapshot.objects.filter(school=school)
+        .select_related("school_year")
+        .defer("data")
+        .order_by("-school_year__start_date", "-created_at")
+    )
+    context = {"school": school, "snapshots": snapshots}
+    if len(snapshots) >= 2:
+        before_id, after_id = _default_snapshots(snapshots)
+        try:
+            before_id = int(request.GET.get("before", before_id))
+            after_id = int(request.GET.get("after", after_id))
+        except ValueError:
+            return HttpResponseBadRequest("Ugyldigt øjebliksbillede")
+        selected = BudgetSnapshot.objects.select_related("school_year").in_bulk(
+            [before_id, after_id]
+        )
+        before, after = selected.get(before_id), selected.get(after_id)
+        if any(s is None or s.school_id != school.pk for s in (before, after)):
+            raise Http404("Øjebliksbilledet findes ikke")
+        comparison = compare(before, after)
+        context["comparison"] = comparison
+        context["pickers"] = [
+            ("before", "Fra", before),
+            ("after", "Til", after),
+        ]
+        context["price_sections"] = [
+            ("Ændrede takster", comparison.fee_changes),
+            ("Ændrede lektionspriser", comparison.price_changes),
+        ]
+    return render(request, "skole/budget_compare.html", context)
+
+
 def team_edit(request, team_id):
     team = get_object_or_404(Team, pk=team_id)
 
@@ -298,28 +291,34 @@ def team_edit(request, team_id):
     )
 
 
-def department_detail(request, department_id):
-    # Prefetch related teams and their related objects
-    department = Department.objects.prefetch_related(
-        Prefetch(
-            "teams",
-            queryset=Team.objects.prefetch_related(
-                Prefetch(
-                    "schoolclasses",
-                    queryset=SchoolClass.objects.prefetch_related("students"),
-                )
-            ),
-        )
-    ).get(pk=department_id)
+async def _department_context(department_id):
+    # Afdelingen og dens teams med klasser hentes samtidig
+    department, teams = await asyncio.gather(
+        Department.objects.filter(pk=department_id).afirst(),
+        alist(
+            Team.objects.filter(department_id=department_id).prefetch_related(
+                "schoolclasses"
+            )
+        ),
+    )
+    if department is None:
+        raise Http404("Afdelingen findes ikke")
+    return {"department": department, "teams": teams}
 
-    return render(
-        request,
-        "skole/department_detail.html",
-        {
-            "department": department,
-            "teams": department.teams.all(),  # Already prefetched
-        },
+
+async def department_detail(request, department_id):
+    version = await fragments.afragment_version("department", department_id)
+    context = {
+        "department_id": department_id,
+        "version": version,
+        "timeout": fragments.TIMEOUT,
+    }
+    context.update(
+        fragments.lazy_context(
+            partial(_department_context, department_id), ["department", "teams"]
+        )
     )
+    return await arender(request, "skole/department_detail.html", context)
 
 
 from django.shortcuts import get_object_or_404, redirect, render
@@ -351,6 +350,68 @@ def department_edit(request, department_id):
     )
 
 
+def schoolclass_grid(request, class_id):
+    """
+    Klassens elever og lektioner som en redigerbar tabel. Alle ændrede rækker
+    gemmes med én POST og én bulk_update pr. model i én transaktion, hvorefter
+    klassernes budget genberegnes én gang.
+    """
+    schoolclass = get_object_or_404(
+        SchoolClass.objects.select_related("team__department"), pk=class_id
+    )
+    students = list(schoolclass.students.order_by("name"))
+    lessons = list(schoolclass.lessons.all())
+    choices = {
+        "school_fee": [
+            ("", "---------"),
+            *(
+                (fee.pk, str(fee))
+                for fee in SchoolFee.objects.order_by("level", "name")
+            ),
+        ],
+        # Elever kan flyttes til en anden klasse i samme team
+        "schoolclass": list(
+            SchoolClass.objects.filter(team=schoolclass.team_id).values_list(
+                "pk", "name"
+            )
+        ),
+    }
+    data = request.POST if request.method == "POST" else None
+    student_grid = StudentGrid(
+        data, objects=students, choices=choices, prefix="students"
+    )
+    lesson_grid = LessonGrid(data, objects=lessons, prefix="lessons")
+
+    if data is not None and student_grid.is_valid() and lesson_grid.is_valid():
+        with transaction.atomic():
+            changed_students = student_grid.save()
+            changed_lessons = lesson_grid.save()
+            # bulk_update springer signalerne over
+            schoolclasses_changed(
+                [
+                    schoolclass.pk,
+                    *(student.schoolclass_id for student in changed_students),
+                ]
+            )
+            index_objects(Student, student_grid.changed_pks("name", "schoolclass"))
+            index_objects(Lesson, lesson_grid.changed_pks("subject", "classroom"))
+        messages.success(
+            request,
+            f"{len(changed_students)} elever og {len(changed_lessons)} lektioner opdateret.",
+        )
+        return redirect("schoolclass_detail", class_id=schoolclass.pk)
+
+    return render(
+        request,
+        "skole/schoolclass_grid.html",
+        {
+            "schoolclass": schoolclass,
+            "student_grid": student_grid,
+            "lesson_grid": lesson_grid,
+        },
+    )
+
+
 from django.shortcuts import get_object_or_404, redirect, render
 
 from .forms import StudentForm
@@ -382,6 +443,112 @@ def student_edit(request, pk):
     )
 
 
+def import_upload(request):
+    report = None
+    if request.method == "POST":
+        form = ImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data["file"]
+            importer = IMPORTERS[form.cleaned_data["kind"]](
+                dry_run=form.cleaned_data["dry_run"]
+            )
+            try:
+                report = importer.run(read_rows(upload, upload.name))
+            except (UnicodeDecodeError, ValueError) as error:
+                form.add_error("file", str(error))
+    else:
+        form = ImportForm()
+
+    return render(
+        request,
+        "skole/import.html",
+        {
+            "form": form,
+            "report": report,
+        },
+    )
+
+
+def search_view(request):
+    query = request.GET.get("q", "").strip()
+    results = search(query) if query else []
+    # Søgefeltet i navigationen henter kun resultatlisten
+    template = (
+        "skole/search_results.html"
+        if request.headers.get("HX-Request")
+        else "skole/search.html"
+    )
+    return render(request, template, {"query": query, "results": results})
+
+
+async def autocomplete_view(request):
+    """
+    Forslag til et typeahead-felt (se skole.widgets), eller feltet renderet
+    på ny med et objekt valgt (`pick`) eller fjernet (`remove`).
+    """
+    params = request.GET
+    kind = params.get("kind")
+    if kind not in autocomplete.SOURCES:
+        raise Http404("Ukendt opslag")
+
+    if "pick" in params or "remove" in params:
+        field = params.get("field", "")
+        widget = (
+            TypeaheadSelectMultiple(kind)
+            if params.get("multiple")
+            else TypeaheadSelect(kind)
+        )
+        values = params.getlist(field) if widget.allow_multiple_selected else []
+        if "pick" in params and params["pick"] not in values:
+            values.append(params["pick"])
+        values = [value for value in values if value != params.get("remove")]
+        html = await sync_to_async(widget.render)(
+            field, values, {"id": params.get("id", "")}
+        )
+        return HttpResponse(html)
+
+    query = params.get("q", "").strip()
+    results = await sync_to_async(autocomplete.lookup)(kind, query) if query else []
+    # Uden request, så navigationens kontekstprocessorer ikke køres for et fragment
+    html = render_to_string(
+        "skole/widgets/typeahead_results.html", {"query": query, "results": results}
+    )
+    return HttpResponse(html)
+
+
+def export_view(request, kind, fmt, pk=None):
+    if fmt not in FORMATS:
+        raise Http404("Ukendt format")
+    try:
+        if kind == "schoolclass":
+            filename, header, rows = class_budget_rows(pk)
+        elif kind == "team":
+            filename, header, rows = team_budget_rows(pk)
+        elif kind == "department":
+            department = get_object_or_404(Department, pk=pk)
+            filename, header, rows = classes_budget_rows(
+                department.name, team__department=department
+            )
+        elif kind == "school":
+            school = get_object_or_404(School, pk=pk)
+            filename, header, rows = classes_budget_rows(
+                school.name, team__department__school=school
+            )
+        elif kind == "students":
+            filename, header, rows = student_rows()
+        elif kind == "lessons":
+            filename, header, rows = lesson_rows()
+        else:
+            raise Http404("Ukendt eksport")
+        return export_response(
+            fmt, filename, header, rows, asynchronous=isinstance(request, ASGIRequest)
+        )
+    except (SchoolClass.DoesNotExist, Team.DoesNotExist):
+        raise Http404("Findes ikke")
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+
+
 def organization_overview(request):
     all_departments = Department.objects.prefetch_related("teams__schoolclasses").all()
     return render(
@@ -415,6 +582,107 @@ class BaseCreateView(CreateView):
         return context
 
 
+class BaseListView(ListView):
+    """
+    Fælles listevisning med keyset-paginering (se pagination.py).
+
+    Hver liste erklærer de relaterede objekter, den viser, i `select_related`
+    og `prefetch_related`, så en side altid koster det samme antal
+    forespørgsler. Kolonnerne er (overskrift, attributsti eller funktion) med
+    et valgfrit tredje element, der er feltet eller annoteringen, kolonnen kan
+    sorteres efter (?sort=felt eller ?sort=-felt).
+    Forespørgsler fra htmx får kun de nye rækker tilbage ("hent flere").
+    """
+
+    template_name = "skole/list_view.html"
+    rows_template_name = "skole/list_rows.html"
+    page_size = 50
+    select_related = ()
+    prefetch_related = ()
+    filterset_class = None
+    columns = ()
+    detail_url = None
+    detail_kwarg = "pk"
+    create_url = None
+    title = None
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        self.filterset = None
+        if self.filterset_class:
+            self.filterset = self.filterset_class(self.request.GET, queryset=queryset)
+            queryset = self.filterset.qs
+        return queryset
+
+    def get_sort(self):
+        sort = self.request.GET.get("sort", "")
+        sortable = {column[2] for column in self.columns if len(column) > 2}
+        return sort if sort.lstrip("-") in sortable else None
+
+    def get_ordering(self):
+        sort = self.get_sort()
+        return [sort] if sort else super().get_ordering()
+
+    def get_headers(self):
+        """[(overskrift, query-streng til sortering eller None)]"""
+        sort = self.get_sort()
+        headers = []
+        for label, _, *sorting in self.columns:
+            query = None
+            if sorting:
+                params = self.request.GET.copy()
+                params.pop("after", None)
+                params["sort"] = (
+                    sorting[0] if sort == f"-{sorting[0]}" else f"-{sorting[0]}"
+                )
+                query = params.urlencode()
+            headers.append((label, query))
+        return headers
+
+    def get_template_names(self):
+        if self.request.headers.get("HX-Request"):
+            return [self.rows_template_name]
+        return [self.template_name]
+
+    def get_row(self, obj):
+        cells = []
+        for _, column, *_ in self.columns:
+            value = column(obj) if callable(column) else attrgetter(column)(obj)
+            cells.append("" if value is None else value)
+        url = None
+        if self.detail_url:
+            url = reverse(self.detail_url, kwargs={self.detail_kwarg: obj.pk})
+        return url, cells
+
+    def get_context_data(self, **kwargs):
+        try:
+            page = paginate(
+                self.object_list, self.request.GET.get("after"), self.page_size
+            )
+        except InvalidCursor:
+            raise Http404("Ugyldig side")
+        context = super().get_context_data(object_list=page.object_list, **kwargs)
+        context["title"] = self.title or self.model._meta.verbose_name_plural
+        context["headers"] = self.get_headers()
+        context["sort"] = self.get_sort()
+        context["rows"] = [self.get_row(obj) for obj in page.object_list]
+        context["create_url"] = self.create_url
+        context["filter"] = self.filterset
+        if page.has_next:
+            params = self.request.GET.copy()
+            params["after"] = page.cursor
+            context["next_query"] = params.urlencode()
+        return context
+
+
+def teacher_names(obj, attribute="teachers"):
+    return ", ".join(teacher.name for teacher in getattr(obj, attribute).all())
+
+
 class SchoolCreateView(BaseCreateView):
     model = School
     form_class = SchoolForm
@@ -482,10 +750,10 @@ from .models import (
 
 
 # School
-class SchoolListView(ListView):
+class SchoolListView(BaseListView):
     model = School
-    template_name = "skole/school_list.html"
-    context_object_name = "schools"
+    columns = [("Navn", "name")]
+    detail_url = "school_detail"
 
 
 class SchoolDetailView(DetailView):
@@ -517,10 +785,17 @@ class DepartmentEditView(BaseEditView):
     success_url = reverse_lazy("department_list")
 
 
-class TeamListView(ListView):
+class TeamListView(BaseListView):
     model = Team
-    template_name = "skole/team_list.html"
-    context_object_name = "teams"
+    select_related = ["department__school"]
+    columns = [
+        ("Navn", "name"),
+        ("Afdeling", "department.name"),
+        ("Skole", "department.school.name"),
+    ]
+    detail_url = "team_detail"
+    detail_kwarg = "team_id"
+    create_url = "team_create"
 
 
 class TeamDetailView(DetailView):
@@ -536,10 +811,23 @@ class TeamEditView(BaseEditView):
     success_url = reverse_lazy("team_list")
 
 
-class SchoolClassListView(ListView):
+class SchoolClassListView(BaseListView):
     model = SchoolClass
-    template_name = "skole/schoolclass_list.html"
-    context_object_name = "schoolclasses"
+    select_related = ["team__department"]
+    prefetch_related = ["class_teachers"]
+    columns = [
+        ("Navn", "name"),
+        ("Team", "team.name"),
+        ("Afdeling", "team.department.name"),
+        ("Aldersgruppe", "class_group"),
+        (
+            "Klasselærere",
+            lambda schoolclass: teacher_names(schoolclass, "class_teachers"),
+        ),
+    ]
+    detail_url = "schoolclass_detail"
+    detail_kwarg = "class_id"
+    create_url = "schoolclass_create"
 
 
 class SchoolClassDetailView(DetailView):
@@ -561,17 +849,29 @@ class StudentEditView(BaseEditView):
 
 
 # Department Views
-class DepartmentListView(ListView):
+class DepartmentListView(BaseListView):
     model = Department
-    template_name = "skole/department_list.html"
-    context_object_name = "departments"
+    select_related = ["school"]
+    columns = [("Navn", "name"), ("Skole", "school.name")]
+    detail_url = "department_detail"
+    detail_kwarg = "department_id"
+    create_url = "department_create"
 
 
 # Student Views
-class StudentListView(ListView):
+class StudentListView(BaseListView):
     model = Student
-    template_name = "skole/student_list.html"
-    context_object_name = "students"
+    select_related = ["schoolclass", "school_fee"]
+    filterset_class = StudentFilter
+    columns = [
+        ("Navn", "name"),
+        ("Klasse", "schoolclass.name"),
+        ("Klassetrin", "age_number"),
+        ("Fødselsdato", "date_of_birth"),
+        ("Takst", "school_fee"),
+    ]
+    detail_url = "student_detail"
+    create_url = "student_create"
 
 
 class StudentDetailView(DetailView):
@@ -581,10 +881,19 @@ class StudentDetailView(DetailView):
 
 
 # Lesson Views
-class LessonListView(ListView):
+class LessonListView(BaseListView):
     model = Lesson
-    template_name = "skole/lesson_list.html"
-    context_object_name = "lessons"
+    select_related = ["schoolclass"]
+    prefetch_related = ["teachers"]
+    filterset_class = LessonFilter
+    columns = [
+        ("Klasse", "schoolclass.name"),
+        ("Fag", "subject"),
+        ("Lokale", "classroom"),
+        ("Lærere", teacher_names),
+    ]
+    detail_url = "lesson_detail"
+    create_url = "lesson_create"
 
 
 class LessonDetailView(DetailView):
@@ -601,10 +910,15 @@ class LessonEditView(BaseEditView):
 
 
 # EmploymentCategory Views
-class EmploymentCategoryListView(ListView):
+class EmploymentCategoryListView(BaseListView):
     model = EmploymentCategory
-    template_name = "skole/employmentcategory_list.html"
-    context_object_name = "employmentcategories"
+    columns = [
+        ("Navn", "name"),
+        ("Type", "type"),
+        ("Pris pr. lektion", "price_pr_lesson"),
+    ]
+    detail_url = "employmentcategory_detail"
+    create_url = "employmentcategory_create"
 
 
 class EmploymentCategoryDetailView(DetailView):
@@ -621,10 +935,11 @@ class EmploymentCategoryEditView(BaseEditView):
 
 
 # SchoolFee Views
-class SchoolFeeListView(ListView):
+class SchoolFeeListView(BaseListView):
     model = SchoolFee
-    template_name = "skole/schoolfee_list.html"
-    context_object_name = "schoolfees"
+    columns = [("Niveau", "level"), ("Navn", "name"), ("Beløb", "amount")]
+    detail_url = "schoolfee_detail"
+    create_url = "schoolfee_create"
 
 
 class SchoolFeeDetailView(DetailView):
@@ -641,10 +956,45 @@ class SchoolFeeEditView(BaseEditView):
 
 
 # Staff Views
-class StaffListView(ListView):
+class StaffListView(BaseListView):
     model = Staff
-    template_name = "skole/staff_list.html"
-    context_object_name = "staff"
+    select_related = ["employment_category"]
+    filterset_class = StaffFilter
+    columns = [
+        ("Navn", "name"),
+        ("Personalekategori", "employment_category.name"),
+        ("Timetal", "employment_grade"),
+    ]
+    detail_url = "staff_detail"
+    create_url = "staff_create"
+
+
+class WorkloadListView(BaseListView):
+    """Lektioner, klasser og lønforbrug pr. ansat holdt op mod timetallet."""
+
+    model = Staff
+    queryset = workload.annotate_workload(Staff.objects.all())
+    ordering = ["-utilization", "name"]
+    select_related = ["employment_category"]
+    filterset_class = WorkloadFilter
+    title = "Arbejdsbyrde"
+    columns = [
+        ("Navn", "name", "name"),
+        ("Personalekategori", "employment_category.name"),
+        ("Timetal", "employment_grade", "employment_grade"),
+        ("Lektioner", "lessons", "lessons"),
+        ("Klasser", "classes", "classes"),
+        ("Lønforbrug", lambda staff: f"{staff.cost:.0f} DKK", "cost"),
+        (
+            "Udnyttelse",
+            lambda staff: (
+                "" if staff.utilization is None else f"{staff.utilization:.0f} %"
+            ),
+            "utilization",
+        ),
+        ("Belægning", workload.allocation),
+    ]
+    detail_url = "staff_detail"
 
 
 class StaffDetailView(DetailView):
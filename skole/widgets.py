@@ -0,0 +1,57 @@
+"""
+Typeahead-felter til fremmednøgler og mange-til-mange-felter med mange rækker.
+
+I stedet for en <select> med alle rækker viser feltet de valgte objekter som
+skjulte felter med deres id og et søgefelt. Søgefeltet henter forslag fra
+autocomplete-viewet med htmx, og et klik på et forslag eller på × for at
+fjerne et valgt objekt henter feltet på ny fra samme view. Feltets choices
+gennemløbes aldrig, så formularen validerer kun de indsendte id'er.
+"""
+
+from django import forms
+from django.urls import reverse
+
+from . import autocomplete
+
+
+class TypeaheadSelect(forms.Widget):
+    template_name = "skole/widgets/typeahead.html"
+    allow_multiple_selected = False
+
+    def __init__(self, kind, attrs=None):
+        super().__init__(attrs)
+        self.kind = kind
+
+    def format_value(self, value):
+        if value is None or value == "":
+            return []
+        if not isinstance(value, (list, tuple)):
+            value = [value]
+        return [str(getattr(item, "pk", item)) for item in value]
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context["widget"].update(
+            kind=self.kind,
+            url=reverse("autocomplete"),
+            multiple=self.allow_multiple_selected,
+            selected=autocomplete.selected(self.kind, context["widget"]["value"]),
+        )
+        return context
+
+    def value_from_datadict(self, data, files, name):
+        if self.allow_multiple_selected:
+            # Som SelectMultiple: data kan også være en almindelig dict
+            getter = getattr(data, "getlist", data.get)
+            return getter(name)
+        return data.get(name)
+
+    def value_omitted_from_data(self, data, files, name):
+        # Ingen valgte objekter sender intet med
+        if self.allow_multiple_selected:
+            return False
+        return super().value_omitted_from_data(data, files, name)
+
+
+class TypeaheadSelectMultiple(TypeaheadSelect):
+    allow_multiple_selected = True
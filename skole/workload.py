@@ -0,0 +1,72 @@
+"""
+Arbejdsbyrde pr. ansat: lektioner, klasser og lønforbrug holdt op mod
+timetallet (Staff.employment_grade).
+
+Tallene er aggregater over lærertabellen (Lesson.teachers) grupperet pr.
+ansat, så hele oversigten er én forespørgsel, der både kan sorteres og
+filtreres på de beregnede kolonner og pagineres med keyset-paginering.
+"""
+
+from django.db.models import (
+    Count,
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    Q,
+    Value,
+)
+from django.db.models.functions import Cast, NullIf
+
+# Udnyttelse i procent af timetallet, hvor en ansat regnes som over- eller
+# underbooket
+OVER_ALLOCATED = 100
+UNDER_ALLOCATED = 75
+
+OVER = "over"
+UNDER = "under"
+ALLOCATION_CHOICES = [(OVER, "Overbooket"), (UNDER, "Underbooket")]
+
+
+def annotate_workload(queryset):
+    """
+    Tilføj `lessons`, `classes`, `cost` og `utilization` (procent af
+    timetallet, None ved timetal 0) til et queryset af ansatte.
+    """
+    # Arkiverede klasser (afgangsklasser efter oprykning) tæller ikke med
+    current = Q(taught_lessons__schoolclass__archived=False)
+    return queryset.annotate(
+        lessons=Count("taught_lessons", filter=current),
+        classes=Count("taught_lessons__schoolclass", distinct=True, filter=current),
+    ).annotate(
+        cost=ExpressionWrapper(
+            F("lessons") * F("employment_category__price_pr_lesson"),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+        utilization=ExpressionWrapper(
+            Cast("lessons", FloatField())
+            * Value(100.0)
+            / NullIf(F("employment_grade"), 0),
+            output_field=FloatField(),
+        ),
+    )
+
+
+def filter_allocation(queryset, allocation):
+    """Begræns et annoteret queryset til over- eller underbookede ansatte."""
+    if allocation == OVER:
+        return queryset.filter(utilization__gt=OVER_ALLOCATED)
+    if allocation == UNDER:
+        return queryset.filter(utilization__lt=UNDER_ALLOCATED)
+    return queryset
+
+
+def allocation(staff):
+    """Etiket til en annoteret ansat: "Overbooket", "Underbooket" eller ""."""
+    if staff.utilization is None:
+        return ""
+    if staff.utilization > OVER_ALLOCATED:
+        return "Overbooket"
+    if staff.utilization < UNDER_ALLOCATED:
+        return "Underbooket"
+    return ""
@@ -0,0 +1,189 @@
+"""
+Hvad-nu-hvis-beregninger af tildelingsmodellen.
+
+Grunddata for et team, en afdeling eller en skole læses én gang ind i en
+AllocationModel: lektioner pr. klasse × personalekategori og elever pr.
+klasse × takst. Et slidertræk er derefter kun et par prikprodukter over disse
+rækker, og intet skrives til databasen.
+
+Modellen caches under omfangets fragmentversion (skole.fragments). Den tælles
+op, når elever, lektioner, lærere, priser eller takster i omfanget ændres,
+også ved masseopdateringer, så en ændring giver en ny model ved næste træk.
+"""
+
+import time
+from dataclasses import dataclass
+
+from django.core.cache import cache
+from django.db.models import Count, F
+
+from skole.fragments import fragment_version
+from skole.models import EmploymentCategory, Lesson, SchoolClass, SchoolFee, Student
+
+SCOPES = {
+    "school": "team__department__school_id",
+    "department": "team__department_id",
+    "team": "team_id",
+}
+MODEL_TIMEOUT = 300
+
+
+def dot(vector, weights):
+    return sum(value * weight for value, weight in zip(vector, weights))
+
+
+@dataclass(frozen=True)
+class ClassResult:
+    name: str
+    income: float
+    cost: float
+    surplus: float
+    percentage_used: float
+
+
+@dataclass(frozen=True)
+class Simulation:
+    classes: tuple
+    income: float
+    cost: float
+    surplus: float
+    percentage_used: float
+
+
+def _percentage(cost, income):
+    return round(cost / income * 100, 1) if income > 0 else 0
+
+
+class AllocationModel:
+    def __init__(self, classes, categories, fees, hours, students):
+        # [(id, navn)] for klasserne i rækkefølge
+        self.classes = classes
+        # [(id, navn, pris pr. lektion)] og [(id, navn, beløb)]
+        self.categories = categories
+        self.fees = fees
+        # hours[i][k]: lektioner i klasse i med en lærer i kategori k
+        # students[i][j]: elever i klasse i med takst j
+        self.hours = hours
+        self.students = students
+        # Kolonnesummer, så totalerne kun kræver ét prikprodukt pr. træk
+        self.total_hours = [sum(k) for k in zip(*hours)] or [0] * len(categories)
+        self.total_students = [sum(j) for j in zip(*students)] or [0] * len(fees)
+        # Skifter når modellen læses igen, så gamle ETags ikke genbruges
+        self.version = time.time_ns()
+
+    @property
+    def base_prices(self):
+        return [price for _, _, price in self.categories]
+
+    @property
+    def base_fees(self):
+        return [amount for _, _, amount in self.fees]
+
+    @classmethod
+    def load(cls, scope, pk):
+        """Byg modellen for klasserne i et team, en afdeling eller en skole."""
+        lookup = {SCOPES[scope]: pk}
+        classes = list(SchoolClass.objects.filter(**lookup).values_list("pk", "name"))
+        categories = [
+            (category_id, name, float(price))
+            for category_id, name, price in EmploymentCategory.objects.values_list(
+                "pk", "name", "price_pr_lesson"
+            )
+        ]
+        fees = [
+            (fee.pk, str(fee), float(fee.amount)) for fee in SchoolFee.objects.all()
+        ]
+
+        row = {class_id: i for i, (class_id, _) in enumerate(classes)}
+        column = {category_id: k for k, (category_id, _, _) in enumerate(categories)}
+        hours = [[0] * len(categories) for _ in classes]
+        teachings = (
+            Lesson.teachers.through.objects.filter(
+                lesson__schoolclass__archived=False,
+                **{
+                    f"lesson__schoolclass__{key}": value
+                    for key, value in lookup.items()
+                },
+            )
+            .values(
+                schoolclass_id=F("lesson__schoolclass_id"),
+                category_id=F("staff__employment_category_id"),
+            )
+            .annotate(count=Count("id"))
+            .order_by()
+        )
+        for entry in teachings:
+            i, k = row[entry["schoolclass_id"]], column[entry["category_id"]]
+            hours[i][k] = entry["count"]
+
+        column = {fee_id: j for j, (fee_id, _, _) in enumerate(fees)}
+        students = [[0] * len(fees) for _ in classes]
+        fee_counts = (
+            Student.objects.filter(
+                school_fee__isnull=False,
+                schoolclass__archived=False,
+                **{f"schoolclass__{key}": value for key, value in lookup.items()},
+            )
+            .values("schoolclass_id", "school_fee_id")
+            .annotate(count=Count("id"))
+            .order_by()
+        )
+        for entry in fee_counts:
+            i, j = row[entry["schoolclass_id"]], column[entry["school_fee_id"]]
+            students[i][j] = entry["count"]
+
+        return cls(classes, categories, fees, hours, students)
+
+    @classmethod
+    def cached(cls, scope, pk):
+        key = f"allocation-model:{scope}:{pk}:{fragment_version(scope, pk)}"
+        model = cache.get(key)
+        if model is None:
+            model = cls.load(scope, pk)
+            cache.set(key, model, MODEL_TIMEOUT)
+        return model
+
+    def simulate(
+        self,
+        prices=None,
+        fees=None,
+        lesson_factor=1.0,
+        class_factors=None,
+        per_class=True,
+    ):
+        """
+        Beregn indtægt, udgift, overskud og forbrugs-% med de givne priser pr.
+        lektion, takstbeløb, en faktor på antallet af lektioner i alle klasser
+        og evt. en faktor pr. klasse ({klasse-id: faktor}).
+        """
+        prices = self.base_prices if prices is None else prices
+        fees = self.base_fees if fees is None else fees
+        factors = [
+            lesson_factor * (class_factors or {}).get(class_id, 1.0)
+            for class_id, _ in self.classes
+        ]
+
+        income = dot(self.total_students, fees)
+        if class_factors:
+            cost = sum(dot(row, prices) * f for row, f in zip(self.hours, factors))
+        else:
+            cost = dot(self.total_hours, prices) * lesson_factor
+        classes = ()
+        if per_class:
+            classes = tuple(
+                ClassResult(
+                    name,
+                    class_income,
+                    class_cost,
+                    class_income - class_cost,
+                    _percentage(class_cost, class_income),
+                )
+                for (_, name), class_income, class_cost in zip(
+                    self.classes,
+                    (dot(row, fees) for row in self.students),
+                    (dot(row, prices) * f for row, f in zip(self.hours, factors)),
+                )
+            )
+        return Simulation(
+            classes, income, cost, income - cost, _percentage(cost, income)
+        )
@@ -1,3 +1,102 @@
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from skole.models import Lesson
+from skole.rollover import rollover
+from skole.synthetic import Scale, generate
+
+from .simulator import AllocationModel
+
+
+class SliderTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.data = generate(Scale(departments=1, teams=1, classes=2, lessons=2))
+        self.url = reverse("update_result")
+        self.params = {"scope": "team", "id": self.data.team}
+
+    def test_simulation_matches_base_data(self):
+        model = AllocationModel.load("team", self.data.team)
+        simulation = model.simulate()
+        # 2 klasser x 2 lektioner x 2 lærere; hver anden ansat er pædagog
+        self.assertEqual(simulation.cost, 4 * 500 + 4 * 300)
+        self.assertEqual(model.simulate(lesson_factor=0.5).cost, simulation.cost / 2)
+
+    def test_lessons_per_class(self):
+        model = AllocationModel.load("team", self.data.team)
+        (first, _), (second, _) = model.classes
+        simulation = model.simulate(class_factors={first: 0.5, second: 2.0})
+        base = model.simulate()
+        self.assertEqual(
+            [c.cost for c in simulation.classes],
+            [base.classes[0].cost * 0.5, base.classes[1].cost * 2.0],
+        )
+        self.assertEqual(simulation.cost, sum(c.cost for c in simulation.classes))
+
+        response = self.client.get(
+            self.url, {**self.params, "seq": 1, f"lessons_{first}": 50}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.context["simulation"].cost,
+            model.simulate(class_factors={first: 0.5}).cost,
+        )
+
+    def test_archived_classes_are_left_out(self):
+        # Afgangsklassen arkiveres, men beholder sine elever og lektioner
+        with self.captureOnCommitCallbacks(execute=True):
+            report = rollover(final_class_number=1)
+        (graduated,) = report.archived
+        for scope, pk in (("team", self.data.team), ("school", self.data.school)):
+            model = AllocationModel.load(scope, pk)
+            self.assertNotIn(graduated, [class_id for class_id, _ in model.classes])
+            self.assertEqual(model.simulate().cost, 2 * 500 + 2 * 300)
+            response = self.client.get(self.url, {"scope": scope, "id": pk, "seq": 1})
+            self.assertEqual(response.status_code, 200)
+
+    def test_cached_model_follows_changes(self):
+        model = AllocationModel.cached("team", self.data.team)
+        cached = AllocationModel.cached("team", self.data.team)
+        self.assertEqual(cached.version, model.version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Lesson.objects.filter(schoolclass__team=self.data.team).first().delete()
+        changed = AllocationModel.cached("team", self.data.team)
+        self.assertNotEqual(changed.version, model.version)
+        self.assertEqual(changed.simulate().cost, model.simulate().cost - (500 + 300))
+
+    def test_only_released_slider_is_saved(self):
+        key = f"sliders:team:{self.data.team}"
+        response = self.client.get(self.url, {**self.params, "seq": 1, "lessons": 50})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Slider-Seq"], "1")
+        self.assertNotIn(key, self.client.session)
+
+        self.client.get(
+            self.url, {**self.params, "seq": 2, "lessons": 60, "persist": 1}
+        )
+        self.assertEqual(
+            self.client.session[key], {"values": {"lessons": 60.0}, "seq": 2}
+        )
+
+    def test_superseded_request_gets_no_content(self):
+        response = self.client.get(
+            self.url, {**self.params, "seq": 2, "lessons": 50, "persist": 1}
+        )
+        self.assertEqual(response.status_code, 200)
+        # Et træk, der når frem efter det gemte scenarie, må ikke overskrive det
+        for params in ({"seq": 1, "lessons": 80}, {"seq": 1, "persist": 1}):
+            response = self.client.get(self.url, {**self.params, **params})
+            self.assertEqual(response.status_code, 204)
+        scenario = self.client.session[f"sliders:team:{self.data.team}"]
+        self.assertEqual(scenario["values"], {"lessons": 50.0})
+
+    def test_unchanged_scenario_is_not_modified(self):
+        response = self.client.get(self.url, {**self.params, "seq": 1, "lessons": 50})
+        response = self.client.get(
+            self.url,
+            {**self.params, "seq": 2, "lessons": 50},
+            headers={"if-none-match": response["ETag"]},
+        )
+        self.assertEqual(response.status_code, 304)
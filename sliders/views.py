@@ -1,13 +1,122 @@
+import hashlib
+import json
+
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+
+from .simulator import SCOPES, AllocationModel
+
+LESSONS = "lessons"
+
+
+def get_model(request):
+    scope = request.GET.get("scope")
+    try:
+        pk = int(request.GET.get("id", ""))
+    except ValueError:
+        return None, None, None
+    if scope not in SCOPES:
+        return None, None, None
+    return scope, pk, AllocationModel.cached(scope, pk)
+
+
+def slider_names(model):
+    return (
+        [LESSONS]
+        + [f"{LESSONS}_{pk}" for pk, _ in model.classes]
+        + [f"price_{pk}" for pk, _, _ in model.categories]
+        + [f"fee_{pk}" for pk, _, _ in model.fees]
+    )
+
+
+def get_scenario(request, scope, pk):
+    """
+    Det gemte scenarie (sliderværdier) for sessionen. `seq` er
+    sekvensnummeret for den forespørgsel, der gemte det.
+    """
+    return request.session.get(f"sliders:{scope}:{pk}", {"values": {}, "seq": 0})
+
+
+def save_scenario(request, scope, pk, scenario):
+    request.session[f"sliders:{scope}:{pk}"] = scenario
+
+
+def simulate(model, values):
+    def read(prefix, items):
+        return [values.get(f"{prefix}_{pk}", base) for pk, _, base in items]
+
+    return model.simulate(
+        prices=read("price", model.categories),
+        fees=read("fee", model.fees),
+        lesson_factor=values.get(LESSONS, 100) / 100,
+        class_factors={
+            pk: values[f"{LESSONS}_{pk}"] / 100
+            for pk, _ in model.classes
+            if f"{LESSONS}_{pk}" in values
+        },
+    )
+
 
 def index(request):
-    return render(request, 'sliders/index.html')
+    scope, pk, model = get_model(request)
+    context = {"scope": scope, "id": pk, "model": model}
+    if model is not None:
+        values = get_scenario(request, scope, pk)["values"]
+        context["simulation"] = simulate(model, values)
+        context["lessons"] = values.get(LESSONS, 100)
+        context["classes"] = [
+            (class_id, name, values.get(f"{LESSONS}_{class_id}", 100))
+            for class_id, name in model.classes
+        ]
+        context["categories"] = [
+            (category_id, name, price, values.get(f"price_{category_id}", price))
+            for category_id, name, price in model.categories
+        ]
+        context["fees"] = [
+            (fee_id, name, amount, values.get(f"fee_{fee_id}", amount))
+            for fee_id, name, amount in model.fees
+        ]
+    return render(request, "sliders/index.html", context)
+
 
 def update_result(request):
-    slider1 = request.GET.get('slider1', 0)
-    slider2 = request.GET.get('slider2', 0)
-    slider3 = request.GET.get('slider3', 0)
-    
-    result = int(slider1) + int(slider2) + int(slider3)
-    return JsonResponse({'result': result, 'slider1': slider1, 'slider2': slider2, 'slider3': slider3})
+    """
+    Klienten sender alle sliderværdierne og et stigende sekvensnummer. Under
+    et træk regnes der kun på de sendte værdier; først når slideren slippes
+    (persist=1), gemmes scenariet i sessionen, så der højst skrives én gang
+    pr. træk. Er et nyere scenarie allerede gemt, svares 204, så htmx ikke
+    bytter et forældet resultat ind. Svar, der når frem i forkert rækkefølge,
+    sorteres fra i klienten ud fra X-Slider-Seq.
+    """
+    scope, pk, model = get_model(request)
+    if model is None:
+        raise Http404("Vælg et team, en afdeling eller en skole")
+
+    scenario = get_scenario(request, scope, pk)
+    try:
+        seq = int(request.GET.get("seq", 0))
+    except ValueError:
+        seq = 0
+    if seq < scenario["seq"]:
+        return HttpResponse(status=204)
+
+    values = dict(scenario["values"])
+    for name in slider_names(model):
+        try:
+            values[name] = float(request.GET[name])
+        except (KeyError, ValueError):
+            continue
+    if request.GET.get("persist") == "1":
+        save_scenario(request, scope, pk, {"values": values, "seq": seq})
+
+    state = json.dumps([model.version, values], sort_keys=True)
+    etag = f'"{hashlib.md5(state.encode()).hexdigest()}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = render(
+            request, "sliders/result.html", {"simulation": simulate(model, values)}
+        )
+    response["ETag"] = etag
+    response["X-Slider-Seq"] = seq
+    return response